@@ -0,0 +1,189 @@
+"""
+Modo de servir assíncrono (ASGI) do Mood Recommender
+
+Mesma engine e mesmo armazém de histórico do app Flask, com handlers
+async para /api/recomendar, /api/recomendar/mais, /api/eventos, /api/moods,
+/health e /metrics. O trabalho de CPU (seleção e serialização) roda em threads para
+não travar o event loop.
+
+    uvicorn asgi:app --workers 4
+"""
+
+import asyncio
+import json
+import secrets
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional, Tuple
+
+from itsdangerous import BadSignature
+
+from metricas import AmostradorPilhas, amostrador_pedido, gravar_perfil, metricas
+from mood_recommender import (app as flask_app, dados_health, dados_moods, processar_eventos, processar_pagina,
+                              processar_recomendacao, texto_metricas)
+
+TAMANHO_MAXIMO_CORPO = 64 * 1024
+
+
+class CorpoGrandeDemais(Exception):
+    """Corpo da requisição passou de TAMANHO_MAXIMO_CORPO"""
+
+# O cookie de sessão é o mesmo do Flask, então WSGI e ASGI compartilham o sid
+_serializador = flask_app.session_interface.get_signing_serializer(flask_app)
+_nome_cookie = flask_app.config['SESSION_COOKIE_NAME']
+
+
+def _codificar(corpo) -> bytes:
+    if isinstance(corpo, str):
+        return corpo.encode('utf-8')  # resposta compacta, já em JSON
+    return json.dumps(corpo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _cabecalho(headers: List[Tuple[bytes, bytes]], nome: bytes) -> Optional[str]:
+    for chave, valor in headers:
+        if chave == nome:
+            return valor.decode('latin-1')
+    return None
+
+
+def _ler_sid(headers: List[Tuple[bytes, bytes]]) -> Optional[str]:
+    for nome, valor in headers:
+        if nome == b'cookie':
+            cookie = SimpleCookie(valor.decode('latin-1'))
+            if _nome_cookie in cookie:
+                try:
+                    return _serializador.loads(cookie[_nome_cookie].value).get('sid')
+                except BadSignature:
+                    return None
+    return None
+
+
+def _cookie_sessao(sid: str) -> bytes:
+    valor = _serializador.dumps({'sid': sid})
+    return f'{_nome_cookie}={valor}; HttpOnly; Path=/; SameSite=Lax'.encode('latin-1')
+
+
+async def _ler_corpo(receive) -> bytes:
+    partes = []
+    tamanho = 0
+    while True:
+        mensagem = await receive()
+        parte = mensagem.get('body', b'')
+        tamanho += len(parte)
+        if tamanho > TAMANHO_MAXIMO_CORPO:
+            raise CorpoGrandeDemais()
+        partes.append(parte)
+        if not mensagem.get('more_body'):
+            return b''.join(partes)
+
+
+async def _responder(send, status: int, corpo: bytes, cabecalhos: List[Tuple[bytes, bytes]] = (),
+                     tipo: bytes = b'application/json'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', tipo),
+                    (b'content-length', str(len(corpo)).encode()), *cabecalhos],
+    })
+    await send({'type': 'http.response.body', 'body': corpo})
+
+
+async def _atender(scope, receive, send, processar, rota: str):
+    """Pedido JSON com sessão: processar(data, sid) roda numa thread"""
+    cabecalhos = []
+    sid = _ler_sid(scope['headers'])
+    if not sid:
+        sid = secrets.token_urlsafe(16)
+        cabecalhos.append((b'set-cookie', _cookie_sessao(sid)))
+    try:
+        bruto = await _ler_corpo(receive)
+    except CorpoGrandeDemais:
+        metricas.contar_erro(rota, 413)
+        await _responder(send, 413, _codificar({'erro': 'Corpo da requisição grande demais'}), cabecalhos)
+        return
+    try:
+        data = json.loads(bruto) if bruto else None
+    except ValueError:
+        metricas.contar_erro(rota, 400)
+        await _responder(send, 400, _codificar({'erro': 'JSON inválido'}), cabecalhos)
+        return
+    pedido_perfil = _cabecalho(scope['headers'], b'x-mood-perfil')
+    try:
+        # Seleção, histórico e encode JSON saem do event loop
+        def trabalho():
+            perfil = amostrador_pedido(pedido_perfil)
+            with metricas.etapa('requisicao'), perfil:
+                corpo, status = processar(data, sid)
+                with metricas.etapa('json'):
+                    corpo = _codificar(corpo)
+            if isinstance(perfil, AmostradorPilhas):
+                cabecalhos.append((b'x-mood-perfil', gravar_perfil(perfil, rota).encode()))
+            return corpo, status
+        corpo, status = await asyncio.to_thread(trabalho)
+    except Exception:
+        # O detalhe fica no log; o cliente só recebe o erro genérico
+        flask_app.logger.exception('Erro em %s', rota)
+        corpo, status = _codificar({'erro': 'Erro interno'}), 500
+    if status >= 400:
+        metricas.contar_erro(rota, status)
+    await _responder(send, status, corpo, cabecalhos)
+
+
+async def _recomendar(scope, receive, send):
+    await _atender(scope, receive, send, processar_recomendacao, '/api/recomendar')
+
+
+async def _recomendar_mais(scope, receive, send):
+    await _atender(scope, receive, send, processar_pagina, '/api/recomendar/mais')
+
+
+async def _eventos(scope, receive, send):
+    await _atender(scope, receive, send, processar_eventos, '/api/eventos')
+
+
+async def _moods(scope, receive, send):
+    await _responder(send, 200, _MOODS)
+
+
+async def _health(scope, receive, send):
+    await _responder(send, 200, _codificar(dados_health()))
+
+
+async def _metrics(scope, receive, send):
+    if not metricas.ativo:
+        await _responder(send, 404, _codificar({'erro': 'Rota não encontrada'}))
+        return
+    await _responder(send, 200, texto_metricas().encode('utf-8'), tipo=b'text/plain; version=0.0.4')
+
+
+_MOODS = _codificar(dados_moods())
+
+ROTAS: Dict[Tuple[str, str], object] = {
+    ('POST', '/api/recomendar'): _recomendar,
+    ('POST', '/api/recomendar/mais'): _recomendar_mais,
+    ('POST', '/api/eventos'): _eventos,
+    ('GET', '/api/moods'): _moods,
+    ('GET', '/health'): _health,
+    ('GET', '/metrics'): _metrics,
+}
+
+
+async def app(scope, receive, send):
+    """Aplicação ASGI"""
+    if scope['type'] == 'lifespan':
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    rota = ROTAS.get((scope['method'], scope['path']))
+    if rota is None:
+        metodo_permitido = any(caminho == scope['path'] for _, caminho in ROTAS)
+        status = 405 if metodo_permitido else 404
+        await _responder(send, status, _codificar({'erro': 'Rota não encontrada' if status == 404 else 'Método não permitido'}))
+        return
+    await rota(scope, receive, send)
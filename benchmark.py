@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do Mood Recommender
+
+Uso:
+    python benchmark.py engine [--tamanhos 1000,10000,100000] [--chamadas 2000] [--saida resultados.json]
+    python benchmark.py http [--local] [--itens 10000] [--url http://localhost:5000] [--clientes 16] [--requisicoes 200]
+    python benchmark.py memoria [--itens 100000]
+    python benchmark.py comparar base.json novo.json [--tolerancia 0.10]
+
+Todos os comandos de medição aceitam --saida para gravar os resultados em
+JSON; `comparar` aponta as métricas que pioraram além da tolerância.
+"""
+
+import argparse
+import gc
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from dataclasses import MISSING, fields, make_dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from mood_recommender import MoodRecommenderWithMedia, Musica, Filme, Jogo, MOODS
+
+GENEROS = ['Rock', 'Pop', 'Jazz', 'Ambient', 'Funk', 'Drama', 'Sci-Fi', 'Comédia', 'Aventura', 'RPG']
+SESSOES = 100
+TAMANHO_HISTORICO = 15
+# Vetores de pesos do caso combinado; poucos, como os presets de uma interface
+COMBINACOES = [{'ansioso': 0.6, 'relaxado': 0.4}, {'feliz': 0.5, 'energizado': 0.5},
+               {'triste': 0.7, 'pensativo': 0.3}, {'relaxado': 0.5, 'pensativo': 0.3, 'feliz': 0.2}]
+
+
+def _mood_scores(rng: random.Random) -> Dict[str, int]:
+    principal, *secundarios = rng.sample(MOODS, 3)
+    scores = {principal: rng.randint(6, 10)}
+    for mood in secundarios:
+        scores[mood] = rng.randint(2, 9)
+    return scores
+
+
+CLASSES = {'musicas': Musica, 'filmes': Filme, 'jogos': Jogo}
+
+
+def gerar_item(tipo: str, item_id: int, rng: random.Random, classes: Dict[str, type] = CLASSES):
+    """Item sintético com 3 moods pontuados"""
+    genero = rng.choice(GENEROS)
+    scores = _mood_scores(rng)
+    imagem = f"https://example.com/img/{tipo}/{item_id}.jpg"
+    link = f"https://example.com/{tipo}/{item_id}"
+    classe = classes[tipo]
+    if tipo == 'musicas':
+        return classe(item_id, f"Música {item_id}", scores, imagem, link,
+                      f"Artista {item_id % 5000}", f"{item_id % 4 + 2}:30", genero)
+    if tipo == 'filmes':
+        return classe(item_id, f"Filme {item_id}", scores, imagem, link,
+                      f"Diretor {item_id % 2000}", 1980 + item_id % 45, genero, f"{90 + item_id % 60} min")
+    return classe(item_id, f"Jogo {item_id}", scores, imagem, link,
+                  "PC/Console", genero, item_id % 3 == 0)
+
+
+def gerar_catalogo(tamanho: int, tipos=('musicas', 'filmes', 'jogos'), semente: int = 42) -> Dict[str, List]:
+    """Catálogo sintético com `tamanho` itens por categoria"""
+    rng = random.Random(semente)
+    return {tipo: [gerar_item(tipo, i, rng) for i in range(1, tamanho + 1)] for tipo in tipos}
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _resumo(latencias: List[float]) -> Dict[str, float]:
+    """Média e percentis de uma lista de latências em ms"""
+    ordenados = sorted(latencias)
+    return {
+        'media_ms': round(sum(ordenados) / len(ordenados), 4) if ordenados else 0.0,
+        'p50_ms': round(_percentil(ordenados, 50), 4),
+        'p95_ms': round(_percentil(ordenados, 95), 4),
+        'p99_ms': round(_percentil(ordenados, 99), 4),
+    }
+
+
+def _medir_chamadas(funcao, argumentos: List[Tuple]) -> List[float]:
+    """Latência de cada chamada, em ms"""
+    latencias = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcao(*args)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def bench_engine(tamanhos: List[int], chamadas: int) -> List[Dict]:
+    """Microbenchmarks de recomendar_com_variedade, recomendar_tudo_com_variedade e similares
+
+    As chamadas se revezam entre SESSOES sessões sintéticas, cada uma com seu
+    histórico, para que o descarte do histórico entre na medida.
+    """
+    rng = random.Random(7)
+    resultados = []
+    print(f"{'itens':>8} | {'operação':<34} | {'média':>8} | {'p50':>8} | {'p95':>8} | {'p99':>8} | {'cache':>6}")
+    print("-" * 92)
+    for tamanho in tamanhos:
+        recommender = MoodRecommenderWithMedia(categorias=gerar_catalogo(tamanho))
+        historicos = [rng.sample(range(1, tamanho + 1), min(TAMANHO_HISTORICO, tamanho)) for _ in range(SESSOES)]
+        sessoes = [{} for _ in range(SESSOES)]
+        tipos = list(recommender.categorias)
+
+        casos = {
+            'recomendar_com_variedade': (
+                recommender.recomendar_com_variedade,
+                [(rng.choice(MOODS), rng.choice(tipos), 3, historicos[i % SESSOES]) for i in range(chamadas)]),
+            'recomendar_com_variedade_combinado': (
+                recommender.recomendar_com_variedade,
+                [(COMBINACOES[i % len(COMBINACOES)], rng.choice(tipos), 3, historicos[i % SESSOES])
+                 for i in range(chamadas)]),
+            'recomendar_tudo_com_variedade': (
+                recommender.recomendar_tudo_com_variedade,
+                [(rng.choice(MOODS), sessoes[i % SESSOES]) for i in range(chamadas)]),
+            # Ids aleatórios: quase toda chamada calcula os vizinhos do item pela primeira vez
+            'similares': (
+                recommender.similares,
+                [(rng.choice(tipos), rng.randint(1, tamanho), 5) for _ in range(chamadas)]),
+        }
+        for nome, (funcao, argumentos) in casos.items():
+            recommender.cache_buckets.limpar()
+            for args in argumentos[:min(50, len(argumentos))]:
+                funcao(*args)  # aquecimento
+            antes = recommender.cache_buckets.estatisticas()
+            resumo = _resumo(_medir_chamadas(funcao, argumentos))
+            depois = recommender.cache_buckets.estatisticas()
+            acertos = depois['acertos'] - antes['acertos']
+            consultas = acertos + depois['falhas'] - antes['falhas']
+            taxa = acertos / consultas if consultas else 0.0
+            resultados.append({'chave': f'engine/{nome}/{tamanho}', 'itens': tamanho, 'chamadas': chamadas,
+                               'taxa_acerto_cache': round(taxa, 4), **resumo})
+            print(f"{tamanho:>8} | {nome:<34} | {resumo['media_ms']:>8.3f} | {resumo['p50_ms']:>8.3f}"
+                  f" | {resumo['p95_ms']:>8.3f} | {resumo['p99_ms']:>8.3f} | {taxa:>6.0%}")
+    return resultados
+
+
+def _classe_legada(classe: type) -> type:
+    """Mesmos campos no layout antigo: dataclass comum, com __dict__ e dict de scores"""
+    campos = [(f.name, object) if f.default is MISSING else (f.name, object, f.default) for f in fields(classe)]
+    return make_dataclass(f'{classe.__name__}Legado', campos)
+
+
+def _medir_memoria(tamanho: int, tipo: str, classes: Dict[str, type]) -> float:
+    """Bytes alocados por item ao gerar `tamanho` itens"""
+    rng = random.Random(42)
+    gc.collect()
+    tracemalloc.start()
+    itens = [gerar_item(tipo, i, rng, classes) for i in range(1, tamanho + 1)]
+    alocado, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del itens
+    return alocado / tamanho
+
+
+def bench_memoria(tamanho: int) -> List[Dict]:
+    """Bytes por item: layout antigo (dataclass + dict) vs itens com __slots__ e scores em bytes"""
+    legadas = {tipo: _classe_legada(classe) for tipo, classe in CLASSES.items()}
+    resultados = []
+    print(f"{'categoria':>10} | {'antes (B/item)':>14} | {'depois (B/item)':>15} | {'redução':>7}")
+    print("-" * 58)
+    for tipo in CLASSES:
+        antes = _medir_memoria(tamanho, tipo, legadas)
+        depois = _medir_memoria(tamanho, tipo, CLASSES)
+        print(f"{tipo:>10} | {antes:>14.0f} | {depois:>15.0f} | {1 - depois / antes:>6.0%}")
+        resultados.append({'chave': f'memoria/{tipo}/{tamanho}', 'itens': tamanho,
+                           'legado_bytes_item': round(antes, 1), 'bytes_item': round(depois, 1)})
+    return resultados
+
+
+def bench_http(url: str, clientes: int, requisicoes: int, tipo: str = 'tudo') -> Dict:
+    """Carga em POST /api/recomendar: cada cliente é uma sessão com conexão keep-alive"""
+    partes = urllib.parse.urlsplit(url)
+    latencias: List[float] = []
+    erros = [0]
+    lock = threading.Lock()
+
+    def cliente(semente: int):
+        rng = random.Random(semente)
+        conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+        cookie = None
+        minhas = []
+        for _ in range(requisicoes):
+            corpo = json.dumps({'mood': rng.choice(MOODS), 'tipo': tipo})
+            cabecalhos = {'Content-Type': 'application/json'}
+            if cookie:
+                cabecalhos['Cookie'] = cookie
+            inicio = time.perf_counter()
+            try:
+                conexao.request('POST', '/api/recomendar', corpo, cabecalhos)
+                resposta = conexao.getresponse()
+                resposta.read()
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    erros[0] += 1
+                conexao.close()
+                conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+                continue
+            minhas.append((time.perf_counter() - inicio) * 1000)
+            if resposta.status != 200:
+                with lock:
+                    erros[0] += 1
+            novo_cookie = resposta.getheader('Set-Cookie')
+            if novo_cookie:
+                cookie = novo_cookie.split(';', 1)[0]
+        conexao.close()
+        with lock:
+            latencias.extend(minhas)
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'url': url,
+        'clientes': clientes,
+        'requisicoes': len(latencias),
+        'erros': erros[0],
+        'duracao_s': round(duracao, 3),
+        'throughput_rps': round(len(latencias) / duracao, 1) if duracao else 0.0,
+        'p50_ms': round(_percentil(latencias, 50), 3),
+        'p95_ms': round(_percentil(latencias, 95), 3),
+        'p99_ms': round(_percentil(latencias, 99), 3),
+    }
+
+
+def servidor_local(itens: Optional[int] = None):
+    """Sobe o app Flask numa thread (werkzeug, multi-thread) em porta livre; devolve (servidor, url)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import mood_recommender
+
+    class SemLog(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    if itens:
+        # As rotas usam o recommender global do módulo
+        mood_recommender.recommender = MoodRecommenderWithMedia(categorias=gerar_catalogo(itens))
+    servidor = make_server('127.0.0.1', 0, mood_recommender.app, threaded=True, request_handler=SemLog)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_port}'
+
+
+def _imprimir_http(resultado: Dict):
+    print(f"🌐 {resultado['url']} | {resultado['clientes']} clientes | {resultado['requisicoes']} requisições"
+          f" | {resultado['erros']} erros")
+    print(f"   throughput: {resultado['throughput_rps']} req/s")
+    print(f"   p50: {resultado['p50_ms']} ms | p95: {resultado['p95_ms']} ms | p99: {resultado['p99_ms']} ms")
+
+
+def _metadados() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'argv': sys.argv[1:],
+    }
+
+
+def salvar_resultados(caminho: str, comando: str, resultados: List[Dict]):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({'comando': comando, 'meta': _metadados(), 'resultados': resultados},
+                  arquivo, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados gravados em {caminho}")
+
+
+def _maior_e_melhor(metrica: str) -> Optional[bool]:
+    """True/False para métricas comparáveis; None para as que não medem desempenho"""
+    if metrica.endswith('_rps') or metrica.startswith('taxa_'):
+        return True
+    if metrica.endswith('_ms') or metrica == 'bytes_item':
+        return False
+    return None
+
+
+def comparar(base: Dict, novo: Dict, tolerancia: float) -> List[Dict]:
+    """Variação de cada métrica em comum; marca regressões acima da tolerância"""
+    anteriores = {r['chave']: r for r in base['resultados']}
+    linhas = []
+    for atual in novo['resultados']:
+        anterior = anteriores.get(atual['chave'])
+        if anterior is None:
+            continue
+        for metrica, valor in atual.items():
+            sentido = _maior_e_melhor(metrica)
+            valor_base = anterior.get(metrica)
+            if sentido is None or not isinstance(valor_base, (int, float)) or not valor_base:
+                continue
+            variacao = (valor - valor_base) / valor_base
+            piora = -variacao if sentido else variacao
+            linhas.append({'chave': atual['chave'], 'metrica': metrica, 'base': valor_base, 'novo': valor,
+                           'variacao': round(variacao, 4), 'regressao': piora > tolerancia})
+    return linhas
+
+
+def _comando_comparar(caminho_base: str, caminho_novo: str, tolerancia: float) -> int:
+    with open(caminho_base, encoding='utf-8') as arquivo:
+        base = json.load(arquivo)
+    with open(caminho_novo, encoding='utf-8') as arquivo:
+        novo = json.load(arquivo)
+    linhas = comparar(base, novo, tolerancia)
+    print(f"base: {base['meta'].get('commit')} ({base['meta']['data']}) | "
+          f"novo: {novo['meta'].get('commit')} ({novo['meta']['data']}) | tolerância {tolerancia:.0%}")
+    print(f"{'chave':<45} | {'métrica':<18} | {'base':>10} | {'novo':>10} | {'variação':>9}")
+    print("-" * 104)
+    for linha in linhas:
+        marca = '  ❌' if linha['regressao'] else ''
+        print(f"{linha['chave']:<45} | {linha['metrica']:<18} | {linha['base']:>10} | {linha['novo']:>10}"
+              f" | {linha['variacao']:>+8.1%}{marca}")
+    regressoes = sum(linha['regressao'] for linha in linhas)
+    print(f"\n{regressoes} regressões em {len(linhas)} métricas")
+    return 1 if regressoes else 0
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    engine = sub.add_parser('engine', help='latência de recomendar_com_variedade, recomendar_tudo_com_variedade e similares')
+    engine.add_argument('--tamanhos', default='1000,10000,100000', help='itens por categoria')
+    engine.add_argument('--chamadas', type=int, default=2000)
+
+    memoria = sub.add_parser('memoria', help='bytes por item, layout antigo vs compacto')
+    memoria.add_argument('--itens', type=int, default=100_000)
+
+    carga = sub.add_parser('http', help='teste de carga em /api/recomendar (WSGI ou ASGI)')
+    carga.add_argument('--url', action='append', help='pode repetir para comparar servidores')
+    carga.add_argument('--local', action='store_true', help='sobe o app Flask neste processo')
+    carga.add_argument('--itens', type=int, help='com --local: catálogo sintético com N itens por categoria')
+    carga.add_argument('--clientes', type=int, default=16)
+    carga.add_argument('--requisicoes', type=int, default=200, help='por cliente')
+    carga.add_argument('--tipo', default='tudo')
+
+    for subparser in (engine, memoria, carga):
+        subparser.add_argument('--saida', help='grava os resultados neste arquivo JSON')
+
+    compara = sub.add_parser('comparar', help='compara dois arquivos de resultados')
+    compara.add_argument('base')
+    compara.add_argument('novo')
+    compara.add_argument('--tolerancia', type=float, default=0.10, help='piora relativa aceita (0.10 = 10%%)')
+
+    args = parser.parse_args(argv)
+    if args.comando == 'comparar':
+        return _comando_comparar(args.base, args.novo, args.tolerancia)
+
+    if args.comando == 'engine':
+        resultados = bench_engine([int(t) for t in args.tamanhos.split(',')], args.chamadas)
+    elif args.comando == 'memoria':
+        resultados = bench_memoria(args.itens)
+    else:
+        alvos = [(url, url) for url in args.url or []]
+        servidor = None
+        if args.local:
+            servidor, url = servidor_local(args.itens)
+            alvos.append(('local', url))
+        resultados = []
+        try:
+            for nome, url in alvos or [('http://localhost:5000', 'http://localhost:5000')]:
+                resultado = bench_http(url, args.clientes, args.requisicoes, args.tipo)
+                _imprimir_http(resultado)
+                resultados.append({'chave': f'http/{nome}/{args.tipo}', **resultado})
+        finally:
+            if servidor:
+                servidor.shutdown()
+
+    if args.saida:
+        salvar_resultados(args.saida, args.comando, resultados)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Catálogo em disco - formato colunar binário, lido via mmap
+
+Layout do arquivo (little-endian, seções alinhadas em 8 bytes):
+
+    MAGIC | seções... | cabeçalho JSON | offset do cabeçalho (u64) | tamanho (u32) | MAGIC
+
+Seções por categoria:
+    ids        int32[n]                 id de cada linha
+    scores     uint8[n * n_moods]       matriz de mood scores (linha x mood)
+    offsets    uint64[n + 1]            início de cada linha em `dados`
+    dados      utf-8                    demais campos da linha como array JSON
+    ordem      int32[n]                 linhas ordenadas por id (busca binária)
+    postings   int32[...]               ids agrupados por mood e score (10..5)
+    limites    uint64[n_moods * 6 + 1]  início de cada grupo em `postings`
+
+Como o arquivo é só leitura e mapeado com mmap, workers criados por fork
+(Gunicorn) compartilham as mesmas páginas do page cache.
+"""
+
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from dataclasses import fields
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+
+MAGIC = b'MOODCAT1'
+FORMATO = 1
+ALINHAMENTO = 8
+SCORE_MAXIMO = 10
+SCORES_INDEXADOS = (10, 9, 8, 7, 6, 5)
+_SCORES_VALIDOS = bytes(range(SCORE_MAXIMO + 1))
+RODAPE = struct.Struct('<QI')
+# Linhas ordenadas em memória por vez ao montar `ordem` com ids fora de ordem (ordenação externa)
+LINHAS_RUN = 1 << 18
+
+if sys.byteorder != 'little':
+    raise ImportError('catalogo.py requer uma plataforma little-endian')
+
+
+class CatalogoInvalido(ValueError):
+    """Arquivo de catálogo corrompido ou em formato desconhecido"""
+
+
+class _Coluna:
+    """Buffer de array com transbordo para arquivo temporário"""
+
+    LIMITE_BUFFER = 1 << 16
+
+    def __init__(self, codigo: str, diretorio: str):
+        self.codigo = codigo
+        self._buffer = array(codigo)
+        self._arquivo = tempfile.TemporaryFile(dir=diretorio)
+        self.total = 0
+
+    def append(self, valor: int):
+        self._buffer.append(valor)
+        self.total += 1
+        if len(self._buffer) >= self.LIMITE_BUFFER:
+            self.flush()
+
+    def extend(self, valores):
+        antes = len(self._buffer)
+        self._buffer.extend(valores)
+        self.total += len(self._buffer) - antes
+        if len(self._buffer) >= self.LIMITE_BUFFER:
+            self.flush()
+
+    def flush(self):
+        self._buffer.tofile(self._arquivo)
+        self._buffer = array(self.codigo)
+
+    def copiar_para(self, destino):
+        self.flush()
+        self._arquivo.seek(0)
+        while True:
+            bloco = self._arquivo.read(1 << 20)
+            if not bloco:
+                break
+            destino.write(bloco)
+
+    def blocos(self, itens: int) -> Iterator[array]:
+        """Lê a coluna em blocos de até `itens` valores"""
+        self.flush()
+        self._arquivo.seek(0)
+        tamanho = itens * self._buffer.itemsize
+        while True:
+            bruto = self._arquivo.read(tamanho)
+            if not bruto:
+                return
+            bloco = array(self.codigo)
+            bloco.frombytes(bruto)
+            yield bloco
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+def _ler_run(arquivo) -> Iterator[Tuple[int, int]]:
+    """Pares (id, linha) de uma run da ordenação externa, lidos aos poucos"""
+    arquivo.seek(0)
+    while True:
+        bruto = arquivo.read(8 * _Coluna.LIMITE_BUFFER)
+        if not bruto:
+            return
+        pares = array('i')
+        pares.frombytes(bruto)
+        yield from zip(pares[::2], pares[1::2])
+
+
+class _EscritorCategoria:
+    """Acumula as colunas de uma categoria em arquivos temporários"""
+
+    def __init__(self, classe: type, moods: List[str], diretorio: str):
+        self.classe = classe
+        self.moods = moods
+        self.campos = [f.name for f in fields(classe) if f.name not in ('id', 'mood_scores')]
+        self.ids = _Coluna('i', diretorio)
+        self.scores = _Coluna('B', diretorio)
+        self.offsets = _Coluna('Q', diretorio)
+        self.dados = tempfile.TemporaryFile(dir=diretorio)
+        self.tamanho_dados = 0
+        self.postings = {(mood, score): _Coluna('i', diretorio) for mood in moods for score in SCORES_INDEXADOS}
+        self.ordenado = True
+        self._ultimo_id = None
+        self.offsets.append(0)
+
+    def adicionar(self, item):
+        if self._ultimo_id is not None and item.id <= self._ultimo_id:
+            self.ordenado = False
+        self._ultimo_id = item.id
+        self.ids.append(item.id)
+        # Um dict por item em vez de um get() por mood no Mapping
+        presentes = dict(item.mood_scores.items())
+        linha = [presentes.get(mood, 0) for mood in self.moods]
+        for mood, score in zip(self.moods, linha):
+            if not 0 <= score <= SCORE_MAXIMO:
+                raise ValueError(f'score fora do intervalo em {item.id}: {mood}={score}')
+            if score >= SCORES_INDEXADOS[-1]:
+                self.postings[(mood, score)].append(item.id)
+        self.scores.extend(linha)
+        linha = json.dumps([getattr(item, campo) for campo in self.campos],
+                           ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.dados.write(linha)
+        self.tamanho_dados += len(linha)
+        self.offsets.append(self.tamanho_dados)
+
+    def fechar(self):
+        for coluna in (self.ids, self.scores, self.offsets, *self.postings.values()):
+            coluna.fechar()
+        self.dados.close()
+
+
+class EscritorCatalogo:
+    """Grava um catálogo em disco item a item, com memória constante"""
+
+    def __init__(self, caminho: str, moods: List[str], versao: Optional[str] = None):
+        self.caminho = caminho
+        self.moods = list(moods)
+        self.versao = versao or datetime.now().strftime('%Y%m%d%H%M%S')
+        self._diretorio = os.path.dirname(os.path.abspath(caminho))
+        self._categorias: Dict[str, _EscritorCategoria] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_exc, exc, tb):
+        if tipo_exc is None:
+            self.finalizar()
+        else:
+            self._descartar()
+
+    def categoria(self, tipo: str, classe: type):
+        if tipo not in self._categorias:
+            self._categorias[tipo] = _EscritorCategoria(classe, self.moods, self._diretorio)
+
+    def adicionar(self, tipo: str, item):
+        if tipo not in self._categorias:
+            self.categoria(tipo, type(item))
+        self._categorias[tipo].adicionar(item)
+
+    def finalizar(self):
+        """Monta o arquivo final e o publica com rename atômico"""
+        temporario = f'{self.caminho}.tmp{os.getpid()}'
+        cabecalho = {'formato': FORMATO, 'versao': self.versao, 'moods': self.moods, 'categorias': {}}
+        try:
+            with open(temporario, 'wb') as destino:
+                destino.write(MAGIC)
+                for tipo, escritor in self._categorias.items():
+                    cabecalho['categorias'][tipo] = self._gravar_categoria(destino, escritor)
+                inicio = destino.tell()
+                bruto = json.dumps(cabecalho, ensure_ascii=False).encode('utf-8')
+                destino.write(bruto)
+                destino.write(RODAPE.pack(inicio, len(bruto)))
+                destino.write(MAGIC)
+            os.replace(temporario, self.caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            self._descartar()
+
+    def _gravar_categoria(self, destino, escritor: _EscritorCategoria) -> Dict:
+        secoes = {}
+
+        def secao(nome, gravar):
+            resto = destino.tell() % ALINHAMENTO
+            if resto:
+                destino.write(b'\0' * (ALINHAMENTO - resto))
+            inicio = destino.tell()
+            gravar()
+            secoes[nome] = [inicio, destino.tell() - inicio]
+
+        secao('ids', lambda: escritor.ids.copiar_para(destino))
+        secao('scores', lambda: escritor.scores.copiar_para(destino))
+        secao('offsets', lambda: escritor.offsets.copiar_para(destino))
+
+        def gravar_dados():
+            escritor.dados.seek(0)
+            while True:
+                bloco = escritor.dados.read(1 << 20)
+                if not bloco:
+                    break
+                destino.write(bloco)
+        secao('dados', gravar_dados)
+
+        secao('ordem', lambda: self._gravar_ordem(destino, escritor))
+
+        limites = array('Q', [0])
+        def gravar_postings():
+            for mood in escritor.moods:
+                for score in SCORES_INDEXADOS:
+                    coluna = escritor.postings[(mood, score)]
+                    coluna.copiar_para(destino)
+                    limites.append(limites[-1] + coluna.total)
+        secao('postings', gravar_postings)
+        secao('limites', lambda: limites.tofile(destino))
+
+        return {
+            'classe': escritor.classe.__name__,
+            'total': escritor.ids.total,
+            'campos': escritor.campos,
+            'secoes': secoes,
+        }
+
+    def _gravar_ordem(self, destino, escritor: _EscritorCategoria):
+        """Linhas ordenadas por id, com memória limitada a LINHAS_RUN linhas
+
+        Ids fora de ordem passam por uma ordenação externa: cada bloco de
+        LINHAS_RUN ids vira uma run ordenada de pares (id, linha) num arquivo
+        temporário, e as runs são intercaladas com heapq.merge.
+        """
+        total = escritor.ids.total
+        if escritor.ordenado:
+            for inicio in range(0, total, LINHAS_RUN):
+                array('i', range(inicio, min(inicio + LINHAS_RUN, total))).tofile(destino)
+            return
+        runs = []
+        try:
+            inicio = 0
+            for bloco in escritor.ids.blocos(LINHAS_RUN):
+                linhas = sorted(range(len(bloco)), key=bloco.__getitem__)
+                if len(bloco) == total:
+                    # Uma run só: não precisa de arquivo temporário nem de merge
+                    array('i', linhas).tofile(destino)
+                    return
+                pares = array('i', bytes(8 * len(linhas)))
+                pares[::2] = array('i', map(bloco.__getitem__, linhas))
+                pares[1::2] = array('i', map(inicio.__add__, linhas))
+                run = tempfile.TemporaryFile(dir=self._diretorio)
+                pares.tofile(run)
+                runs.append(run)
+                inicio += len(bloco)
+            saida = array('i')
+            for _, linha in heapq.merge(*(_ler_run(run) for run in runs)):
+                saida.append(linha)
+                if len(saida) >= _Coluna.LIMITE_BUFFER:
+                    saida.tofile(destino)
+                    saida = array('i')
+            saida.tofile(destino)
+        finally:
+            for run in runs:
+                run.close()
+
+    def _descartar(self):
+        for escritor in self._categorias.values():
+            escritor.fechar()
+        self._categorias = {}
+
+
+class CatalogoMapeado(Sequence):
+    """Visão somente-leitura de uma categoria do arquivo, item a item"""
+
+    def __init__(self, arquivo: 'ArquivoCatalogo', tipo: str, meta: Dict, classe: type):
+        self.tipo = tipo
+        self.classe = classe
+        self.campos = meta['campos']
+        self.moods = arquivo.moods
+        self._total = meta['total']
+        secoes = meta['secoes']
+        self._ids = arquivo.secao(secoes['ids'], 'i')
+        self._scores = arquivo.secao(secoes['scores'], 'B')
+        # As colunas empacotadas do índice contam com um score <= SCORE_MAXIMO por byte
+        if self._scores.tobytes().translate(None, _SCORES_VALIDOS):
+            raise CatalogoInvalido(f'{tipo}: score acima de {SCORE_MAXIMO} no arquivo')
+        self._offsets = arquivo.secao(secoes['offsets'], 'Q')
+        self._dados = arquivo.secao(secoes['dados'], 'B')
+        self._ordem = arquivo.secao(secoes['ordem'], 'i')
+        self._postings = arquivo.secao(secoes['postings'], 'i')
+        self._limites = arquivo.secao(secoes['limites'], 'Q')
+        self.por_id = _ItensPorId(self)
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(self._total))]
+        if pos < 0:
+            pos += self._total
+        if not 0 <= pos < self._total:
+            raise IndexError(pos)
+        valores = json.loads(bytes(self._dados[self._offsets[pos]:self._offsets[pos + 1]]))
+        campos = dict(zip(self.campos, valores))
+        n_moods = len(self.moods)
+        linha = self._scores[pos * n_moods:(pos + 1) * n_moods]
+        mood_scores = {mood: score for mood, score in zip(self.moods, linha) if score}
+        return self.classe(id=self._ids[pos], mood_scores=mood_scores, **campos)
+
+    @property
+    def ids(self) -> memoryview:
+        """Coluna de ids (int32), sem cópia"""
+        return self._ids
+
+    @property
+    def scores(self) -> memoryview:
+        """Matriz de scores (uint8, linha x mood) achatada, sem cópia"""
+        return self._scores
+
+    def id_em(self, pos: int) -> int:
+        return self._ids[pos]
+
+    def posicao(self, item_id: int) -> Optional[int]:
+        """Busca binária pelo id na seção `ordem`"""
+        baixo, alto = 0, self._total
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self._ids[self._ordem[meio]] < item_id:
+                baixo = meio + 1
+            else:
+                alto = meio
+        if baixo < self._total and self._ids[self._ordem[baixo]] == item_id:
+            return self._ordem[baixo]
+        return None
+
+    def buckets(self, mood: str) -> Dict[int, memoryview]:
+        """Ids por score (10..5) para um mood, sem copiar dados"""
+        try:
+            m = self.moods.index(mood)
+        except ValueError:
+            return {}
+        resultado = {}
+        base = m * len(SCORES_INDEXADOS)
+        for i, score in enumerate(SCORES_INDEXADOS):
+            inicio, fim = self._limites[base + i], self._limites[base + i + 1]
+            if fim > inicio:
+                resultado[score] = self._postings[inicio:fim]
+        return resultado
+
+
+class _ItensPorId(Mapping):
+    """Mapeamento id → item sobre um CatalogoMapeado"""
+
+    def __init__(self, catalogo: CatalogoMapeado):
+        self._catalogo = catalogo
+
+    def __getitem__(self, item_id: int):
+        pos = self._catalogo.posicao(item_id)
+        if pos is None:
+            raise KeyError(item_id)
+        return self._catalogo[pos]
+
+    def __iter__(self) -> Iterator[int]:
+        for pos in range(len(self._catalogo)):
+            yield self._catalogo.id_em(pos)
+
+    def __len__(self) -> int:
+        return len(self._catalogo)
+
+
+class ArquivoCatalogo:
+    """Arquivo de catálogo aberto via mmap"""
+
+    def __init__(self, caminho: str, classes: Dict[str, Type]):
+        self.caminho = caminho
+        with open(caminho, 'rb') as arquivo:
+            self._mmap = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        self._visao = memoryview(self._mmap)
+        tamanho = len(self._mmap)
+        fim_rodape = tamanho - len(MAGIC)
+        if tamanho < 2 * len(MAGIC) + RODAPE.size or self._mmap[:len(MAGIC)] != MAGIC \
+                or self._mmap[fim_rodape:] != MAGIC:
+            raise CatalogoInvalido(f'{caminho} não é um catálogo válido')
+        inicio, comprimento = RODAPE.unpack_from(self._mmap, fim_rodape - RODAPE.size)
+        cabecalho = json.loads(bytes(self._visao[inicio:inicio + comprimento]))
+        if cabecalho.get('formato') != FORMATO:
+            raise CatalogoInvalido(f'formato de catálogo não suportado: {cabecalho.get("formato")}')
+        self.versao = cabecalho['versao']
+        self.moods = cabecalho['moods']
+        self.categorias: Dict[str, CatalogoMapeado] = {}
+        for tipo, meta in cabecalho['categorias'].items():
+            self.categorias[tipo] = CatalogoMapeado(self, tipo, meta, classes[meta['classe']])
+
+    def secao(self, posicao: List[int], codigo: str) -> memoryview:
+        inicio, comprimento = posicao
+        return self._visao[inicio:inicio + comprimento].cast(codigo)
+
+
+def salvar_catalogo(caminho: str, categorias: Dict[str, Sequence], moods: List[str],
+                    versao: Optional[str] = None):
+    """Grava categorias (tipo → itens) em um arquivo de catálogo"""
+    with EscritorCatalogo(caminho, moods, versao) as escritor:
+        for tipo, itens in categorias.items():
+            for item in itens:
+                escritor.adicionar(tipo, item)
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) == 2 and argv[0] == 'exportar':
+        from mood_recommender import MoodRecommenderWithMedia, MOODS
+        recommender = MoodRecommenderWithMedia()
+        salvar_catalogo(argv[1], recommender.categorias, MOODS)
+        print(f"✅ Catálogo exportado para {argv[1]}")
+        return 0
+    if len(argv) == 2 and argv[0] == 'info':
+        from mood_recommender import CLASSES_CONTEUDO
+        arquivo = ArquivoCatalogo(argv[1], CLASSES_CONTEUDO)
+        print(f"Versão: {arquivo.versao}")
+        print(f"Moods: {', '.join(arquivo.moods)}")
+        for tipo, catalogo in arquivo.categorias.items():
+            print(f"  {tipo}: {len(catalogo)} itens")
+        return 0
+    print("Uso: python catalogo.py exportar <arquivo> | info <arquivo>")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
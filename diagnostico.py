@@ -66,11 +66,11 @@ print()
 # 4. Testa importação do módulo
 print("4️⃣ Testando importação do módulo...")
 try:
-    from mood_recommender import MoodRecommender
+    from mood_recommender import MoodRecommenderWithMedia
     print("   ✅ Módulo importado com sucesso")
     
     # Testa instanciação
-    rec = MoodRecommender()
+    rec = MoodRecommenderWithMedia()
     print(f"   ✅ Recommender instanciado")
     print(f"   📊 {len(rec.musicas)} músicas carregadas")
     print(f"   📊 {len(rec.filmes)} filmes carregados")
@@ -86,7 +86,7 @@ print()
 # 5. Testa recomendação
 print("5️⃣ Testando sistema de recomendação...")
 try:
-    resultado = rec.recomendar_tudo("feliz")
+    resultado = rec.recomendar_tudo_com_variedade("feliz")
     print(f"   ✅ Recomendações para 'feliz' geradas")
     print(f"   📊 {len(resultado['musicas'])} músicas recomendadas")
     print(f"   📊 {len(resultado['filmes'])} filmes recomendados")
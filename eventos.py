@@ -0,0 +1,199 @@
+"""
+Registro de impressões e cliques, fora do caminho da requisição
+
+A requisição só enfileira (put_nowait numa fila limitada); uma thread
+grava os eventos em lotes, em modo append. Com a fila cheia o evento é
+descartado e contado: o registro nunca segura a resposta.
+
+    arquivo:///var/log/mood     JSONL, um arquivo por dia e processo
+                                (eventos-AAAAMMDD-<pid>.jsonl)
+    sqlite:///caminho/arquivo   tabela `eventos`, um INSERT em lote por transação
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+CAPACIDADE_FILA = 10_000
+LOTE_MAXIMO = 500
+INTERVALO_GRAVACAO = 1.0
+
+TIPOS_EVENTO = ('impressao', 'clique')
+CAMPOS_EVENTO = ('ts', 'sessao', 'evento', 'tipo', 'item', 'mood', 'posicao')
+
+_FIM = object()
+
+
+class EscritorEventos(ABC):
+    """Destino dos lotes; chamado só pela thread de gravação"""
+
+    @abstractmethod
+    def gravar(self, eventos: List[Dict]):
+        """Grava um lote não vazio; uma exceção descarta o lote e conta como falha"""
+
+    @abstractmethod
+    def fechar(self):
+        pass
+
+
+class EscritorArquivo(EscritorEventos):
+    """JSONL append-only; cada processo tem o seu arquivo, então não há escrita intercalada"""
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        self._dia = None
+        self._arquivo = None
+
+    def _abrir(self, ts: float):
+        dia = time.strftime('%Y%m%d', time.gmtime(ts))
+        if dia != self._dia:
+            if self._arquivo:
+                self._arquivo.close()
+            nome = f'eventos-{dia}-{os.getpid()}.jsonl'
+            self._arquivo = open(os.path.join(self.diretorio, nome), 'a', encoding='utf-8')
+            self._dia = dia
+        return self._arquivo
+
+    def gravar(self, eventos: List[Dict]):
+        arquivo = self._abrir(eventos[-1]['ts'])
+        arquivo.write(''.join(json.dumps(evento, ensure_ascii=False, separators=(',', ':')) + '\n'
+                              for evento in eventos))
+        arquivo.flush()
+
+    def fechar(self):
+        if self._arquivo:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+class EscritorSQLite(EscritorEventos):
+    """Tabela `eventos` em SQLite (WAL), compartilhável entre workers"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        # Aberta na thread de gravação, que é a única a usá-la
+        self._conexao: Optional[sqlite3.Connection] = None
+
+    def _conectar(self) -> sqlite3.Connection:
+        if self._conexao is None:
+            self._conexao = sqlite3.connect(self.caminho, timeout=5)
+            self._conexao.execute('PRAGMA journal_mode=WAL')
+            self._conexao.execute('PRAGMA synchronous=NORMAL')
+            self._conexao.execute(
+                'CREATE TABLE IF NOT EXISTS eventos ('
+                'ts REAL NOT NULL, sessao TEXT, evento TEXT NOT NULL, tipo TEXT NOT NULL, '
+                'item INTEGER NOT NULL, mood TEXT, posicao INTEGER)'
+            )
+        return self._conexao
+
+    def gravar(self, eventos: List[Dict]):
+        conexao = self._conectar()
+        with conexao:
+            conexao.executemany(
+                'INSERT INTO eventos (ts, sessao, evento, tipo, item, mood, posicao) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [tuple(evento[campo] for campo in CAMPOS_EVENTO) for evento in eventos]
+            )
+
+    def fechar(self):
+        if self._conexao is not None:
+            self._conexao.close()
+            self._conexao = None
+
+
+class FilaEventos:
+    """Fila limitada com uma thread que grava em lotes de até LOTE_MAXIMO"""
+
+    def __init__(self, escritor: EscritorEventos, capacidade: int = CAPACIDADE_FILA,
+                 lote: int = LOTE_MAXIMO, intervalo: float = INTERVALO_GRAVACAO):
+        self.escritor = escritor
+        self.lote = lote
+        self.intervalo = intervalo
+        self.recebidos = 0
+        self.descartados = 0
+        self.gravados = 0
+        self.falhas = 0
+        self._fila: 'queue.Queue' = queue.Queue(capacidade)
+        self._thread = threading.Thread(target=self._gravar, name='gravador-eventos', daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    def publicar(self, eventos: Iterable[Dict]) -> int:
+        """Enfileira sem bloquear; devolve quantos couberam"""
+        aceitos = 0
+        for evento in eventos:
+            try:
+                self._fila.put_nowait(evento)
+                aceitos += 1
+            except queue.Full:
+                self.descartados += 1
+        self.recebidos += aceitos
+        return aceitos
+
+    def _gravar(self):
+        while True:
+            try:
+                primeiro = self._fila.get(timeout=self.intervalo)
+            except queue.Empty:
+                continue
+            fim = primeiro is _FIM
+            lote = [] if fim else [primeiro]
+            while not fim and len(lote) < self.lote:
+                try:
+                    evento = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if evento is _FIM:
+                    fim = True
+                else:
+                    lote.append(evento)
+            if lote:
+                try:
+                    self.escritor.gravar(lote)
+                    self.gravados += len(lote)
+                except Exception as e:
+                    # Perde o lote, mas a thread continua viva para os próximos
+                    self.falhas += len(lote)
+                    print(f"Erro ao gravar eventos: {e}")
+            if fim:
+                self.escritor.fechar()
+                return
+
+    def pendentes(self) -> int:
+        return self._fila.qsize()
+
+    def fechar(self, timeout: float = 5.0):
+        """Grava o que estiver na fila e encerra a thread"""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._fila.put(_FIM, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def estatisticas(self) -> Dict[str, int]:
+        return {
+            'pendentes': self.pendentes(),
+            'recebidos': self.recebidos,
+            'descartados': self.descartados,
+            'gravados': self.gravados,
+            'falhas': self.falhas,
+        }
+
+
+def criar_fila(url: Optional[str] = None) -> Optional[FilaEventos]:
+    """Cria a fila a partir de uma URL ('arquivo:///dir' ou 'sqlite:///caminho'); None desliga o registro"""
+    if not url:
+        return None
+    if url.startswith('arquivo://'):
+        return FilaEventos(EscritorArquivo(url[len('arquivo://'):]))
+    if url.startswith('sqlite:///'):
+        return FilaEventos(EscritorSQLite(url[len('sqlite:///'):]))
+    raise ValueError(f'destino de eventos desconhecido: {url}')
@@ -0,0 +1,306 @@
+"""
+Armazenamento do histórico de sessão no servidor
+
+O cookie carrega só o id da sessão; o histórico anti-repetição e o perfil
+de moods da sessão ficam aqui.
+
+    memoria                     LRU em processo, com TTL (padrão)
+    sqlite:///caminho/arquivo   SQLite compartilhado entre workers
+"""
+
+import json
+import math
+import sqlite3
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict, deque
+from operator import mul
+from typing import Dict, Iterable, Iterator, List, Optional
+
+TTL_PADRAO = 7 * 24 * 3600
+CAPACIDADE_PADRAO = 100_000
+JANELA_PADRAO = 100
+
+# Passo da média móvel do perfil: um clique pesa mais que um item só exibido
+ALFA_EXIBICAO = 0.05
+ALFA_CLIQUE = 0.2
+
+
+_MASCARA_64 = (1 << 64) - 1
+
+
+def misturar64(item_id: int) -> int:
+    """Hash de 64 bits bem espalhado (finalizador do splitmix64)"""
+    x = (item_id * 0x9E3779B97F4A7C15) & _MASCARA_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASCARA_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASCARA_64
+    return x ^ (x >> 31)
+
+
+class HistoricoCompacto:
+    """Janela circular dos ids recentes com teste de pertinência O(1)"""
+
+    __slots__ = ('_fila', '_contagem')
+
+    def __init__(self, ids: Iterable[int] = (), janela: int = JANELA_PADRAO):
+        self._fila = deque(maxlen=janela)
+        # Contagem em vez de set: o mesmo id pode aparecer mais de uma vez na janela
+        self._contagem: Dict[int, int] = {}
+        self.estender(ids)
+
+    @property
+    def janela(self) -> int:
+        return self._fila.maxlen
+
+    def adicionar(self, item_id: int):
+        if len(self._fila) == self._fila.maxlen:
+            antigo = self._fila[0]
+            restante = self._contagem[antigo] - 1
+            if restante:
+                self._contagem[antigo] = restante
+            else:
+                del self._contagem[antigo]
+        self._fila.append(item_id)
+        self._contagem[item_id] = self._contagem.get(item_id, 0) + 1
+
+    def estender(self, ids: Iterable[int]):
+        for item_id in ids:
+            self.adicionar(item_id)
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self._contagem
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._fila)
+
+    def __len__(self) -> int:
+        return len(self._fila)
+
+    def __eq__(self, outro) -> bool:
+        return isinstance(outro, HistoricoCompacto) and list(self._fila) == list(outro._fila)
+
+    def __repr__(self) -> str:
+        return f'HistoricoCompacto({list(self._fila)!r}, janela={self.janela})'
+
+    def para_bytes(self) -> bytes:
+        """janela (u32) + ids em int32, do mais antigo para o mais recente"""
+        return struct.pack('<I', self.janela) + array('i', self._fila).tobytes()
+
+    @classmethod
+    def de_bytes(cls, dados: bytes) -> 'HistoricoCompacto':
+        (janela,) = struct.unpack_from('<I', dados)
+        ids = array('i')
+        ids.frombytes(dados[4:])
+        return cls(ids, janela)
+
+
+class PerfilMood:
+    """Média móvel exponencial dos vetores de mood que a sessão viu ou abriu"""
+
+    __slots__ = ('_vetor', '_norma', 'eventos')
+
+    def __init__(self, n_moods: int, vetor: Iterable[float] = (), eventos: int = 0):
+        self._vetor = array('f', vetor) if vetor else array('f', bytes(4 * n_moods))
+        self._norma = math.hypot(*self._vetor)
+        self.eventos = eventos
+
+    @property
+    def vetor(self) -> array:
+        return self._vetor
+
+    def registrar(self, scores: bytes, alfa: float = ALFA_EXIBICAO):
+        """Aproxima o perfil de um vetor de scores (um byte por mood) em O(n_moods)"""
+        if not self.eventos:
+            alfa = 1.0  # o primeiro evento define o perfil inteiro
+        vetor = self._vetor
+        for i, score in enumerate(scores):
+            vetor[i] += alfa * (score - vetor[i])
+        self._norma = math.hypot(*vetor)
+        self.eventos += 1
+
+    def afinidade(self, scores: bytes) -> float:
+        """Cosseno entre o perfil e um vetor de scores; 0 sem eventos"""
+        return self.afinidades((scores,))[0]
+
+    def afinidades(self, vetores: Iterable[bytes]) -> List[float]:
+        """afinidade() de vários vetores de uma vez"""
+        vetor, norma, hypot = self._vetor, self._norma, math.hypot
+        if not norma:
+            return [0.0 for _ in vetores]
+        return [sum(map(mul, vetor, scores)) / ((hypot(*scores) or 1.0) * norma) for scores in vetores]
+
+    def __eq__(self, outro) -> bool:
+        return isinstance(outro, PerfilMood) and self._vetor == outro._vetor and self.eventos == outro.eventos
+
+    def __repr__(self) -> str:
+        return f'PerfilMood({[round(v, 2) for v in self._vetor]!r}, eventos={self.eventos})'
+
+    def para_bytes(self) -> bytes:
+        """eventos (u32) + vetor em float32"""
+        return struct.pack('<I', self.eventos) + self._vetor.tobytes()
+
+    @classmethod
+    def de_bytes(cls, dados: bytes) -> 'PerfilMood':
+        (eventos,) = struct.unpack_from('<I', dados)
+        vetor = array('f')
+        vetor.frombytes(dados[4:])
+        return cls(len(vetor), vetor, eventos)
+
+
+# Sessão serializada: sequência de (chave, tipo, valor) com tamanhos prefixados
+_CHAVE = struct.Struct('<B')
+_VALOR = struct.Struct('<BI')
+_TIPO_HISTORICO = 0
+_TIPO_JSON = 1
+_TIPO_PERFIL = 2
+
+
+def serializar_sessao(dados: Dict) -> bytes:
+    """Formato binário compacto; históricos viram arrays int32 e perfis, float32"""
+    partes = []
+    for chave, valor in dados.items():
+        chave_bytes = chave.encode('utf-8')
+        if isinstance(valor, HistoricoCompacto):
+            tipo, bruto = _TIPO_HISTORICO, valor.para_bytes()
+        elif isinstance(valor, PerfilMood):
+            tipo, bruto = _TIPO_PERFIL, valor.para_bytes()
+        else:
+            tipo, bruto = _TIPO_JSON, json.dumps(valor, separators=(',', ':')).encode('utf-8')
+        partes += [_CHAVE.pack(len(chave_bytes)), chave_bytes, _VALOR.pack(tipo, len(bruto)), bruto]
+    return b''.join(partes)
+
+
+def desserializar_sessao(dados: bytes) -> Dict:
+    resultado = {}
+    pos = 0
+    while pos < len(dados):
+        (tamanho,) = _CHAVE.unpack_from(dados, pos)
+        pos += _CHAVE.size
+        chave = dados[pos:pos + tamanho].decode('utf-8')
+        pos += tamanho
+        tipo, tamanho = _VALOR.unpack_from(dados, pos)
+        pos += _VALOR.size
+        bruto = dados[pos:pos + tamanho]
+        pos += tamanho
+        if tipo == _TIPO_HISTORICO:
+            resultado[chave] = HistoricoCompacto.de_bytes(bruto)
+        elif tipo == _TIPO_PERFIL:
+            resultado[chave] = PerfilMood.de_bytes(bruto)
+        else:
+            resultado[chave] = json.loads(bruto)
+    return resultado
+
+
+class ArmazemHistorico(ABC):
+    """Interface dos armazéns de histórico por sessão"""
+
+    @abstractmethod
+    def carregar(self, sid: str) -> Dict:
+        """Dados da sessão ({} se não existir); alterá-los não muda o armazém até salvar()"""
+
+    @abstractmethod
+    def salvar(self, sid: str, dados: Dict):
+        pass
+
+    @abstractmethod
+    def remover(self, sid: str):
+        pass
+
+
+class HistoricoMemoria(ArmazemHistorico):
+    """LRU em processo com expiração por TTL; guarda a sessão serializada, como o SQLite"""
+
+    def __init__(self, capacidade: int = CAPACIDADE_PADRAO, ttl: float = TTL_PADRAO):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._sessoes: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def carregar(self, sid: str) -> Dict:
+        with self._lock:
+            entrada = self._sessoes.get(sid)
+            if entrada is None:
+                return {}
+            expira, dados = entrada
+            if expira < time.monotonic():
+                del self._sessoes[sid]
+                return {}
+            self._sessoes.move_to_end(sid)
+        # Cópia nova a cada carga: quem altera o histórico precisa chamar salvar()
+        return desserializar_sessao(dados)
+
+    def salvar(self, sid: str, dados: Dict):
+        bruto = serializar_sessao(dados)
+        with self._lock:
+            self._sessoes[sid] = (time.monotonic() + self.ttl, bruto)
+            self._sessoes.move_to_end(sid)
+            while len(self._sessoes) > self.capacidade:
+                self._sessoes.popitem(last=False)
+
+    def remover(self, sid: str):
+        with self._lock:
+            self._sessoes.pop(sid, None)
+
+    def __len__(self) -> int:
+        return len(self._sessoes)
+
+
+class HistoricoSQLite(ArmazemHistorico):
+    """Histórico em SQLite, compartilhado por todos os workers da máquina"""
+
+    LIMPEZA_A_CADA = 1000
+
+    def __init__(self, caminho: str, ttl: float = TTL_PADRAO):
+        self.caminho = caminho
+        self.ttl = ttl
+        self._local = threading.local()
+        self._escritas = 0
+        with self._conexao() as conexao:
+            conexao.execute(
+                'CREATE TABLE IF NOT EXISTS sessoes ('
+                'sid TEXT PRIMARY KEY, dados BLOB NOT NULL, expira REAL NOT NULL)'
+            )
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao = conexao
+        return conexao
+
+    def carregar(self, sid: str) -> Dict:
+        linha = self._conexao().execute(
+            'SELECT dados FROM sessoes WHERE sid = ? AND expira >= ?', (sid, time.time())
+        ).fetchone()
+        if not linha:
+            return {}
+        if isinstance(linha[0], str):
+            return json.loads(linha[0])  # linhas gravadas antes do formato binário
+        return desserializar_sessao(linha[0])
+
+    def salvar(self, sid: str, dados: Dict):
+        conexao = self._conexao()
+        conexao.execute(
+            'INSERT OR REPLACE INTO sessoes (sid, dados, expira) VALUES (?, ?, ?)',
+            (sid, serializar_sessao(dados), time.time() + self.ttl)
+        )
+        self._escritas += 1
+        if self._escritas % self.LIMPEZA_A_CADA == 0:
+            conexao.execute('DELETE FROM sessoes WHERE expira < ?', (time.time(),))
+
+    def remover(self, sid: str):
+        self._conexao().execute('DELETE FROM sessoes WHERE sid = ?', (sid,))
+
+
+def criar_armazem(url: Optional[str] = None) -> ArmazemHistorico:
+    """Cria o armazém a partir de uma URL ('memoria' ou 'sqlite:///caminho')"""
+    if not url or url == 'memoria':
+        return HistoricoMemoria()
+    if url.startswith('sqlite:///'):
+        return HistoricoSQLite(url[len('sqlite:///'):])
+    raise ValueError(f'armazém de histórico desconhecido: {url}')
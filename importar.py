@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Importação em lote de catálogo a partir de dumps CSV ou JSONL
+
+Lê os arquivos em streaming, valida cada linha contra os campos da classe
+da categoria (Musica, Filme, Jogo), os moods de Mood e o intervalo 0–10 dos
+scores, descarta ids repetidos na categoria e grava o catálogo em disco
+(com postings e ordem por id) via EscritorCatalogo.
+
+    CSV     uma coluna por campo e uma por mood (vazia = 0):
+            tipo,id,titulo,artista,duracao,genero,imagem_url,link_url,feliz,relaxado
+    JSONL   um objeto por linha, com os scores em "mood_scores":
+            {"tipo": "filmes", "id": 3, "titulo": "...", "mood_scores": {"feliz": 9}, ...}
+
+A coluna `tipo` pode ser omitida com --tipo. Arquivos .gz são lidos
+descomprimidos. A leitura é um gerador de lotes; os lotes são validados num
+pool de processos, com no máximo dois lotes por processo em andamento, e
+gravados na ordem de leitura: em ids repetidos vale a primeira linha. A
+memória fica constante, fora o conjunto de ids vistos (um bitmap esparso).
+
+    python importar.py musicas.csv filmes.jsonl.gz catalogo.bin
+    python importar.py dump.csv catalogo.bin --tipo jogos --estrito
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+import typing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from catalogo import SCORE_MAXIMO, EscritorCatalogo
+
+TAMANHO_LOTE = 5_000
+ERROS_LISTADOS = 20
+ID_MAXIMO = (1 << 31) - 1  # ids são int32 no arquivo
+
+VERDADEIRO = ('1', 'true', 'sim', 's')
+FALSO = ('0', 'false', 'nao', 'não', 'n')
+
+# campo -> (conversor, obrigatório), por categoria
+Esquema = Dict[str, Dict[str, Tuple[str, bool]]]
+# (origem, tipo padrão, formato, cabeçalho, [(número da linha, dados)])
+Lote = Tuple[str, Optional[str], str, Optional[List[str]], List[Tuple[int, object]]]
+
+
+class ErroImportacao(ValueError):
+    """Entrada que não pode ser importada (formato ou cabeçalho inválido, ou linha rejeitada com --estrito)"""
+
+
+def esquema(categorias: Dict[str, type]) -> Esquema:
+    """Campos de cada categoria a partir das dataclasses, como dados simples para os processos do pool"""
+    resultado = {}
+    for tipo, classe in categorias.items():
+        campos = {}
+        for campo in fields(classe):
+            if campo.name in ('id', 'mood_scores'):
+                continue
+            anotacao = campo.type
+            argumentos = typing.get_args(anotacao)
+            opcional = typing.get_origin(anotacao) is typing.Union and type(None) in argumentos
+            base = next(a for a in argumentos if a is not type(None)) if opcional else anotacao
+            campos[campo.name] = ({int: 'int', bool: 'bool'}.get(base, 'str'), not opcional)
+        resultado[tipo] = campos
+    return resultado
+
+
+# Configuração de cada processo do pool (ver _configurar)
+_ESQUEMA: Esquema = {}
+_MOODS: frozenset = frozenset()
+
+
+def _configurar(esquema_categorias: Esquema, moods: Iterable[str]):
+    global _ESQUEMA, _MOODS
+    _ESQUEMA = esquema_categorias
+    _MOODS = frozenset(moods)
+
+
+def _inteiro(valor) -> int:
+    if isinstance(valor, bool):
+        raise ValueError
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str):
+        return int(valor.strip())
+    raise ValueError
+
+
+def _converter(valor, conversor: str):
+    if conversor == 'int':
+        return _inteiro(valor)
+    if conversor == 'bool':
+        if isinstance(valor, bool):
+            return valor
+        texto = valor.strip().lower() if isinstance(valor, str) else None
+        if texto in VERDADEIRO:
+            return True
+        if texto in FALSO:
+            return False
+        raise ValueError
+    if not isinstance(valor, str):
+        raise ValueError
+    return valor.strip()
+
+
+def _validar(registro: Dict, tipo_padrao: Optional[str]) -> Tuple[str, int, Dict[str, int], Dict]:
+    """(tipo, id, scores, campos) de um registro; ValueError com a mensagem se for inválido"""
+    tipo = registro.pop('tipo', None) or tipo_padrao
+    campos_tipo = _ESQUEMA.get(tipo) if isinstance(tipo, str) else None
+    if campos_tipo is None:
+        raise ValueError(f'tipo inválido: {tipo!r}')
+    try:
+        item_id = _inteiro(registro.pop('id', None))
+    except ValueError:
+        raise ValueError('id inválido') from None
+    if not 0 < item_id <= ID_MAXIMO:
+        raise ValueError(f'id fora do intervalo: {item_id}')
+
+    brutos = registro.pop('mood_scores', None)
+    if not isinstance(brutos, dict):
+        raise ValueError('mood_scores ausente')
+    scores = {}
+    for mood, valor in brutos.items():
+        if mood not in _MOODS:
+            raise ValueError(f'mood desconhecido: {mood!r}')
+        if valor is None or valor == '':
+            continue
+        try:
+            score = _inteiro(valor)
+        except ValueError:
+            raise ValueError(f'score inválido em {mood}: {valor!r}') from None
+        if not 0 <= score <= SCORE_MAXIMO:
+            raise ValueError(f'score fora do intervalo em {mood}: {score}')
+        if score:
+            scores[mood] = score
+    if not scores:
+        raise ValueError('nenhum mood com score')
+
+    campos = {}
+    for campo, (conversor, obrigatorio) in campos_tipo.items():
+        valor = registro.pop(campo, None)
+        if valor is None or valor == '':
+            if obrigatorio:
+                raise ValueError(f'campo obrigatório ausente: {campo}')
+            campos[campo] = None
+            continue
+        try:
+            campos[campo] = _converter(valor, conversor)
+        except ValueError:
+            raise ValueError(f'valor inválido em {campo}: {valor!r}') from None
+    # Colunas de outras categorias vêm vazias no CSV; qualquer outra coisa é erro de digitação
+    sobras = [campo for campo, valor in registro.items() if valor not in (None, '')]
+    if sobras:
+        raise ValueError(f'campos desconhecidos para {tipo}: {", ".join(sorted(sobras))}')
+    return tipo, item_id, scores, campos
+
+
+def _validar_lote(lote: Lote) -> Tuple[str, List[Tuple], List[Tuple[str, int, str]]]:
+    """Origem, itens válidos (linha, tipo, id, scores, campos) e erros (origem, linha, mensagem) de um lote"""
+    origem, tipo_padrao, formato, cabecalho, linhas = lote
+    validos, erros = [], []
+    for numero, dados in linhas:
+        try:
+            if formato == 'csv':
+                if len(dados) != len(cabecalho):
+                    raise ValueError(f'{len(dados)} colunas, esperadas {len(cabecalho)}')
+                registro, scores = {}, {}
+                for coluna, valor in zip(cabecalho, dados):
+                    (scores if coluna in _MOODS else registro)[coluna] = valor
+                registro['mood_scores'] = scores
+            else:
+                try:
+                    registro = json.loads(dados)
+                except ValueError:
+                    raise ValueError('JSON inválido') from None
+                if not isinstance(registro, dict):
+                    raise ValueError('linha não é um objeto JSON')
+            validos.append((numero,) + _validar(registro, tipo_padrao))
+        except ValueError as e:
+            erros.append((origem, numero, str(e)))
+    return origem, validos, erros
+
+
+def _abrir(caminho: str, binario: bool):
+    abrir = gzip.open if caminho.endswith('.gz') else open
+    if binario:
+        return abrir(caminho, 'rb')
+    return abrir(caminho, 'rt', encoding='utf-8', newline='')
+
+
+def _formato(caminho: str) -> str:
+    nome = caminho[:-3] if caminho.endswith('.gz') else caminho
+    extensao = os.path.splitext(nome)[1].lower()
+    if extensao == '.csv':
+        return 'csv'
+    if extensao in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ErroImportacao(f'{caminho}: formato desconhecido (use .csv, .jsonl ou .ndjson)')
+
+
+def ler_lotes(caminho: str, esquema_categorias: Esquema, moods: Iterable[str], tipo: Optional[str] = None,
+              tamanho: int = TAMANHO_LOTE) -> Iterator[Lote]:
+    """Lotes de linhas ainda não validadas; o CSV tem o cabeçalho conferido aqui, uma vez"""
+    formato = _formato(caminho)
+    if formato == 'jsonl':
+        with _abrir(caminho, binario=True) as arquivo:
+            linhas = []
+            for numero, linha in enumerate(arquivo, 1):
+                if linha.strip():
+                    linhas.append((numero, linha))
+                    if len(linhas) == tamanho:
+                        yield caminho, tipo, formato, None, linhas
+                        linhas = []
+            if linhas:
+                yield caminho, tipo, formato, None, linhas
+        return
+
+    with _abrir(caminho, binario=False) as arquivo:
+        leitor = csv.reader(arquivo)
+        cabecalho = [coluna.strip() for coluna in next(leitor, [])]
+        conhecidas = {'tipo', 'id', *moods, *(c for campos in esquema_categorias.values() for c in campos)}
+        desconhecidas = [coluna for coluna in cabecalho if coluna not in conhecidas]
+        if desconhecidas:
+            raise ErroImportacao(f'{caminho}: colunas desconhecidas: {", ".join(desconhecidas)}')
+        if 'id' not in cabecalho or ('tipo' not in cabecalho and tipo is None):
+            raise ErroImportacao(f'{caminho}: o cabeçalho precisa de "id" e de "tipo" (ou use --tipo)')
+        if len(set(cabecalho)) != len(cabecalho):
+            raise ErroImportacao(f'{caminho}: colunas repetidas no cabeçalho')
+        linhas = []
+        for dados in leitor:
+            if dados:
+                linhas.append((leitor.line_num, dados))
+                if len(linhas) == tamanho:
+                    yield caminho, tipo, formato, cabecalho, linhas
+                    linhas = []
+        if linhas:
+            yield caminho, tipo, formato, cabecalho, linhas
+
+
+def validar_em_paralelo(lotes: Iterable[Lote], esquema_categorias: Esquema, moods: Iterable[str],
+                        processos: Optional[int] = None) -> Iterator[Tuple[str, List[Tuple], List[Tuple]]]:
+    """Resultados de _validar_lote na ordem dos lotes, com no máximo 2 lotes por processo em andamento"""
+    moods = list(moods)
+    if processos == 1:
+        _configurar(esquema_categorias, moods)
+        yield from map(_validar_lote, lotes)
+        return
+    janela = 2 * (processos or os.cpu_count() or 1)
+    with ProcessPoolExecutor(processos, initializer=_configurar, initargs=(esquema_categorias, moods)) as executor:
+        pendentes = deque()
+        for lote in lotes:
+            pendentes.append(executor.submit(_validar_lote, lote))
+            if len(pendentes) >= janela:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+
+class IdsVistos:
+    """Conjunto de ids int32 positivos em páginas de bitmap de 64K ids, criadas sob demanda"""
+
+    BITS_PAGINA = 16
+
+    def __init__(self):
+        self._paginas: Dict[int, bytearray] = {}
+
+    def adicionar(self, item_id: int) -> bool:
+        """Marca o id; False se ele já estava marcado"""
+        pagina = self._paginas.get(item_id >> self.BITS_PAGINA)
+        if pagina is None:
+            pagina = self._paginas[item_id >> self.BITS_PAGINA] = bytearray(1 << (self.BITS_PAGINA - 3))
+        deslocamento = item_id & ((1 << self.BITS_PAGINA) - 1)
+        mascara = 1 << (deslocamento & 7)
+        if pagina[deslocamento >> 3] & mascara:
+            return False
+        pagina[deslocamento >> 3] |= mascara
+        return True
+
+    def memoria(self) -> int:
+        return len(self._paginas) << (self.BITS_PAGINA - 3)
+
+
+def importar(entradas: Iterable[str], saida: str, categorias: Dict[str, type], moods: List[str],
+             tipo: Optional[str] = None, versao: Optional[str] = None, processos: Optional[int] = None,
+             estrito: bool = False) -> Dict:
+    """Importa as entradas para o catálogo em `saida`; devolve contagens e os primeiros erros"""
+    esquema_categorias = esquema(categorias)
+    if tipo is not None and tipo not in categorias:
+        raise ErroImportacao(f'tipo inválido: {tipo}')
+    vistos = {nome: IdsVistos() for nome in categorias}
+    relatorio = {'linhas': 0, 'importados': dict.fromkeys(categorias, 0), 'rejeitados': 0,
+                 'duplicados': 0, 'erros': []}
+
+    def registrar_erro(origem: str, numero: int, mensagem: str):
+        if estrito:
+            raise ErroImportacao(f'{origem}:{numero}: {mensagem}')
+        relatorio['rejeitados'] += 1
+        if len(relatorio['erros']) < ERROS_LISTADOS:
+            relatorio['erros'].append((origem, numero, mensagem))
+
+    def lotes():
+        for entrada in entradas:
+            yield from ler_lotes(entrada, esquema_categorias, moods, tipo)
+
+    with EscritorCatalogo(saida, moods, versao) as escritor:
+        for nome, classe in categorias.items():
+            escritor.categoria(nome, classe)
+        for origem, validos, erros in validar_em_paralelo(lotes(), esquema_categorias, moods, processos):
+            relatorio['linhas'] += len(validos) + len(erros)
+            for erro in erros:
+                registrar_erro(*erro)
+            for numero, nome, item_id, scores, campos in validos:
+                if not vistos[nome].adicionar(item_id):
+                    relatorio['duplicados'] += 1
+                    registrar_erro(origem, numero, f'id {item_id} repetido em {nome}')
+                    continue
+                escritor.adicionar(nome, categorias[nome](id=item_id, mood_scores=scores, **campos))
+                relatorio['importados'][nome] += 1
+    return relatorio
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entradas', nargs='+', help='arquivos .csv/.jsonl/.ndjson (ou .gz); o último é a saída')
+    parser.add_argument('--tipo', help='categoria das linhas sem coluna "tipo" (musicas, filmes, jogos)')
+    parser.add_argument('--versao', help='versão do catálogo gerado (padrão: data e hora)')
+    parser.add_argument('--processos', type=int, help='processos de validação (padrão: um por núcleo)')
+    parser.add_argument('--estrito', action='store_true', help='aborta sem gravar na primeira linha rejeitada')
+    args = parser.parse_args(argv)
+    if len(args.entradas) < 2:
+        parser.error('informe ao menos um arquivo de entrada e o arquivo de saída')
+    *entradas, saida = args.entradas
+
+    from mood_recommender import CATEGORIAS_CONTEUDO, MOODS
+    inicio = time.perf_counter()
+    try:
+        relatorio = importar(entradas, saida, CATEGORIAS_CONTEUDO, MOODS, args.tipo, args.versao,
+                             args.processos, args.estrito)
+    except ErroImportacao as e:
+        print(f"❌ {e}")
+        return 1
+    for origem, numero, mensagem in relatorio['erros']:
+        print(f"  {origem}:{numero}: {mensagem}")
+    if relatorio['rejeitados'] > len(relatorio['erros']):
+        print(f"  ... e mais {relatorio['rejeitados'] - len(relatorio['erros'])} linhas rejeitadas")
+    importados = relatorio['importados']
+    print(f"📥 {relatorio['linhas']} linhas lidas, {relatorio['rejeitados']} rejeitadas "
+          f"({relatorio['duplicados']} ids repetidos) em {time.perf_counter() - inicio:.1f}s")
+    for nome, total in importados.items():
+        print(f"  {nome}: {total} itens")
+    if not sum(importados.values()):
+        print("❌ Nenhum item importado")
+        return 1
+    print(f"✅ Catálogo gravado em {saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
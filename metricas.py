@@ -0,0 +1,209 @@
+"""
+Métricas do caminho quente no formato texto do Prometheus
+
+Desligado por padrão: sem MOOD_METRICAS=1, `etapa()` devolve um contexto
+vazio compartilhado e os contadores retornam na primeira linha.
+
+    MOOD_METRICAS=1             liga histogramas, contadores e /metrics
+    MOOD_PERFIL_DIR=/tmp/perfis aceita o cabeçalho X-Mood-Perfil: 1 e grava
+                                as pilhas amostradas da requisição ali
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import Dict, Optional, Sequence, Tuple
+
+# Limites em segundos; o caminho quente fica na casa dos microssegundos
+LIMITES_PADRAO = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                  0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_NULO = nullcontext()
+
+
+class Histograma:
+    """Contagens por faixa, soma e total; acumulado só na exportação"""
+
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites: Sequence[float] = LIMITES_PADRAO):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class _Cronometro:
+    __slots__ = ('_metricas', '_nome', '_inicio')
+
+    def __init__(self, metricas: 'Metricas', nome: str):
+        self._metricas = metricas
+        self._nome = nome
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        self._metricas.observar(self._nome, time.perf_counter() - self._inicio)
+        return False
+
+
+def _rotulos(nomes: Tuple[str, ...], valores: Tuple[str, ...]) -> str:
+    pares = ','.join(f'{nome}="{_escapar(str(valor))}"' for nome, valor in zip(nomes, valores))
+    return f'{{{pares}}}' if pares else ''
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metricas:
+    """Histogramas por etapa, requisições por mood/tipo e erros por rota"""
+
+    def __init__(self, ativo: bool = False, limites: Sequence[float] = LIMITES_PADRAO):
+        self.ativo = ativo
+        self.limites = tuple(limites)
+        self._lock = threading.Lock()
+        self._etapas: Dict[str, Histograma] = {}
+        self._requisicoes: Counter = Counter()
+        self._erros: Counter = Counter()
+
+    def etapa(self, nome: str):
+        """Cronometra um bloco `with`; sem custo além da chamada quando desligado"""
+        if not self.ativo:
+            return _NULO
+        return _Cronometro(self, nome)
+
+    def observar(self, nome: str, segundos: float):
+        if not self.ativo:
+            return
+        with self._lock:
+            histograma = self._etapas.get(nome)
+            if histograma is None:
+                histograma = self._etapas[nome] = Histograma(self.limites)
+            histograma.observar(segundos)
+
+    def contar_requisicao(self, mood: str, tipo: str, formato: str):
+        if not self.ativo:
+            return
+        with self._lock:
+            self._requisicoes[(mood, tipo, formato)] += 1
+
+    def contar_erro(self, rota: str, status: int):
+        if not self.ativo:
+            return
+        with self._lock:
+            self._erros[(rota, status)] += 1
+
+    def limpar(self):
+        with self._lock:
+            self._etapas.clear()
+            self._requisicoes.clear()
+            self._erros.clear()
+
+    def prometheus(self, extras: Optional[Dict[str, Tuple[str, str, float]]] = None) -> str:
+        """Exposição em texto; `extras` são valores avulsos nome -> (tipo, ajuda, valor)"""
+        with self._lock:
+            etapas = {nome: (list(h.contagens), h.soma, h.total) for nome, h in self._etapas.items()}
+            requisicoes = dict(self._requisicoes)
+            erros = dict(self._erros)
+
+        linhas = [
+            '# HELP mood_etapa_segundos Duração de cada etapa do caminho quente',
+            '# TYPE mood_etapa_segundos histogram',
+        ]
+        for nome in sorted(etapas):
+            contagens, soma, total = etapas[nome]
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float('inf'),), contagens):
+                acumulado += contagem
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                linhas.append(f'mood_etapa_segundos_bucket{_rotulos(("etapa", "le"), (nome, le))} {acumulado}')
+            linhas.append(f'mood_etapa_segundos_sum{_rotulos(("etapa",), (nome,))} {_numero(soma)}')
+            linhas.append(f'mood_etapa_segundos_count{_rotulos(("etapa",), (nome,))} {total}')
+
+        linhas += ['# HELP mood_requisicoes_total Recomendações atendidas por mood, tipo e formato',
+                   '# TYPE mood_requisicoes_total counter']
+        for chave in sorted(requisicoes):
+            linhas.append(f'mood_requisicoes_total{_rotulos(("mood", "tipo", "formato"), chave)} {requisicoes[chave]}')
+
+        linhas += ['# HELP mood_erros_total Respostas de erro por rota e status',
+                   '# TYPE mood_erros_total counter']
+        for chave in sorted(erros):
+            linhas.append(f'mood_erros_total{_rotulos(("rota", "status"), chave)} {erros[chave]}')
+
+        for nome, (tipo, ajuda, valor) in (extras or {}).items():
+            linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo}', f'{nome} {_numero(valor)}']
+        return '\n'.join(linhas) + '\n'
+
+
+class AmostradorPilhas:
+    """Profiler por amostragem de uma thread, em pilhas colapsadas (flamegraph.pl, speedscope)"""
+
+    def __init__(self, thread_id: int, intervalo: float = 0.0005):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.amostras: Counter = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name='amostrador-pilhas', daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if pilha:
+                self.amostras[';'.join(reversed(pilha))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._parar.set()
+        self._thread.join()
+        return False
+
+    def colapsado(self) -> str:
+        return ''.join(f'{pilha} {n}\n' for pilha, n in self.amostras.most_common())
+
+
+DIRETORIO_PERFIS = os.environ.get('MOOD_PERFIL_DIR')
+
+
+def gravar_perfil(amostrador: AmostradorPilhas, rota: str) -> Optional[str]:
+    """Grava as pilhas em DIRETORIO_PERFIS e devolve o nome do arquivo"""
+    if not DIRETORIO_PERFIS:
+        return None
+    os.makedirs(DIRETORIO_PERFIS, exist_ok=True)
+    nome = f'{rota.strip("/").replace("/", "_")}-{time.time_ns()}.txt'
+    with open(os.path.join(DIRETORIO_PERFIS, nome), 'w', encoding='utf-8') as arquivo:
+        arquivo.write(amostrador.colapsado())
+    return nome
+
+
+def amostrador_pedido(cabecalho: Optional[str]):
+    """Amostrador da thread atual se o pedido trouxe X-Mood-Perfil: 1 e há DIRETORIO_PERFIS"""
+    if not DIRETORIO_PERFIS or cabecalho != '1':
+        return _NULO
+    return AmostradorPilhas(threading.get_ident())
+
+
+metricas = Metricas(os.environ.get('MOOD_METRICAS') == '1')
@@ -1,12 +1,37 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
+from itsdangerous import BadSignature, URLSafeSerializer
 import json
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional
+import copy
+from dataclasses import dataclass, fields
+from typing import List, Dict, Optional, Tuple, Sequence, Iterable, Iterator, Container, Set, Mapping, ClassVar, Union, Callable
 from enum import Enum
 import traceback
 import random
+import bisect
 from datetime import datetime
 import urllib.parse
+import os
+import re
+import secrets
+import hashlib
+import hmac
+import math
+import threading
+import time
+import sys
+import weakref
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import compress
+from collections.abc import Mapping as MappingABC
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from catalogo import SCORE_MAXIMO, ArquivoCatalogo, CatalogoMapeado
+from eventos import TIPOS_EVENTO, criar_fila
+from historico import ALFA_CLIQUE, HistoricoCompacto, JANELA_PADRAO, PerfilMood, criar_armazem, misturar64
+from metricas import AmostradorPilhas, amostrador_pedido, gravar_perfil, metricas
+from similaridade import IndiceSimilaridade, N_VIZINHOS
 
 app = Flask(__name__)
 app.secret_key = 'sua-chave-secreta-aqui-mude-em-producao'
@@ -19,59 +44,977 @@ class Mood(Enum):
     ANSIOSO = "😰 Ansioso"
     PENSATIVO = "🤔 Pensativo"
 
-@dataclass
+_POSICAO_MOOD = {m.name.lower(): i for i, m in enumerate(Mood)}
+_NOMES_MOOD = tuple(_POSICAO_MOOD)
+
+
+class ScoresMood(MappingABC):
+    """Scores por mood num array de bytes indexado por Mood; vetores iguais são compartilhados"""
+
+    __slots__ = ('_valores', '__weakref__')
+    _internados: ClassVar['weakref.WeakValueDictionary[bytes, ScoresMood]'] = weakref.WeakValueDictionary()
+
+    def __new__(cls, scores: Union[Mapping[str, int], bytes] = ()):
+        if isinstance(scores, ScoresMood):
+            return scores
+        if isinstance(scores, (bytes, bytearray)):
+            valores = bytes(scores)
+        else:
+            linha = bytearray(len(_NOMES_MOOD))
+            for mood, score in dict(scores).items():
+                posicao = _POSICAO_MOOD.get(mood)
+                if posicao is None:
+                    raise ValueError(f'mood desconhecido: {mood}')
+                if not 0 <= score <= SCORE_MAXIMO:
+                    raise ValueError(f'score fora do intervalo: {mood}={score}')
+                linha[posicao] = score
+            valores = bytes(linha)
+        instancia = cls._internados.get(valores)
+        if instancia is None:
+            # Os índices empacotam um score por byte e somam até 20 deles; acima de SCORE_MAXIMO vaza para o vizinho
+            if len(valores) != len(_NOMES_MOOD) or max(valores) > SCORE_MAXIMO:
+                raise ValueError(f'scores inválidos: {list(valores)}')
+            instancia = super().__new__(cls)
+            instancia._valores = valores
+            cls._internados[valores] = instancia
+        return instancia
+
+    @property
+    def valores(self) -> bytes:
+        """Um byte por mood, na ordem de Mood (0 = sem score)"""
+        return self._valores
+
+    def __getitem__(self, mood: str) -> int:
+        posicao = _POSICAO_MOOD.get(mood)
+        if posicao is None or not self._valores[posicao]:
+            raise KeyError(mood)
+        return self._valores[posicao]
+
+    def __iter__(self) -> Iterator[str]:
+        return (mood for mood, score in zip(_NOMES_MOOD, self._valores) if score)
+
+    def __len__(self) -> int:
+        return len(self._valores) - self._valores.count(0)
+
+    def items(self) -> Tuple[Tuple[str, int], ...]:
+        return tuple((mood, score) for mood, score in zip(_NOMES_MOOD, self._valores) if score)
+
+    def __eq__(self, outro) -> bool:
+        if isinstance(outro, ScoresMood):
+            return self._valores == outro._valores
+        return MappingABC.__eq__(self, outro)
+
+    def __hash__(self) -> int:
+        return hash(self._valores)
+
+    def __reduce__(self):
+        return ScoresMood, (self._valores,)
+
+    def __repr__(self) -> str:
+        return f'ScoresMood({dict(self.items())!r})'
+
+
+@dataclass(frozen=True, slots=True)
 class ConteudoBase:
     id: int
     titulo: str
-    mood_scores: Dict[str, int]
-    imagem_url: str 
-    link_url: str    
-    
-@dataclass
+    mood_scores: Mapping[str, int]  # vira ScoresMood
+    imagem_url: Optional[str]  # None = derivada do id da loja, quando possível
+    link_url: Optional[str]    # None = derivado do id da loja ou de uma busca
+
+    # Textos que se repetem entre itens; internados para existir uma cópia só
+    _INTERNAR: ClassVar[Tuple[str, ...]] = ()
+    # (gênero, autor) usados pelo índice de similaridade junto com o vetor de moods
+    _SIMILARIDADE: ClassVar[Tuple[str, str]] = ()
+
+    def __post_init__(self):
+        object.__setattr__(self, 'mood_scores', ScoresMood(self.mood_scores))
+        for campo in self._INTERNAR:
+            valor = getattr(self, campo)
+            if isinstance(valor, str):
+                object.__setattr__(self, campo, sys.intern(valor))
+
+@dataclass(frozen=True, slots=True)
 class Musica(ConteudoBase):
     artista: str
     duracao: str
     genero: str
     spotify_id: Optional[str] = None  
     youtube_url: Optional[str] = None  
+
+    _INTERNAR: ClassVar[Tuple[str, ...]] = ('artista', 'duracao', 'genero')
+    _SIMILARIDADE: ClassVar[Tuple[str, str]] = ('genero', 'artista')
     
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Filme(ConteudoBase):
     diretor: str
     ano: int
     genero: str
     duracao: str
     imdb_id: Optional[str] = None  
+
+    _INTERNAR: ClassVar[Tuple[str, ...]] = ('diretor', 'genero', 'duracao')
+    _SIMILARIDADE: ClassVar[Tuple[str, str]] = ('genero', 'diretor')
     
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Jogo(ConteudoBase):
     plataforma: str
     genero: str
     multiplayer: bool
-    steam_id: Optional[str] = None  
+    steam_id: Optional[str] = None
+
+    _INTERNAR: ClassVar[Tuple[str, ...]] = ('plataforma', 'genero')
+    _SIMILARIDADE: ClassVar[Tuple[str, str]] = ('genero', 'plataforma')
+
+
+MOODS = [m.name.lower() for m in Mood]
+
+# Fontes de link que o cliente pode pedir; as que não se aplicam à categoria caem no link padrão
+FONTES_LINK = ('spotify', 'youtube', 'imdb', 'steam')
+
+# Pesos de mood em partes inteiras de PARTES_PESO (passos de 5%): com scores até 10,
+# o score combinado de cada item cabe em um byte e pode ser somado em lote
+PARTES_PESO = 20
+
+# Um mood ('feliz') ou partes por mood em ordem de Mood ((('relaxado', 8), ('ansioso', 12)))
+PesosMood = Union[str, Tuple[Tuple[str, int], ...]]
+
+
+def normalizar_mood(mood: Union[str, Mapping[str, float], Tuple[Tuple[str, int], ...]]) -> PesosMood:
+    """Mood em minúsculas ou vetor {mood: peso} em partes de PARTES_PESO; um só mood vira str"""
+    if isinstance(mood, str):
+        return mood.lower()
+    if isinstance(mood, tuple):
+        return mood
+    pesos: Dict[str, float] = {}
+    for nome, peso in mood.items():
+        nome = nome.lower()
+        if nome not in _POSICAO_MOOD:
+            raise ValueError(f'mood desconhecido: {nome}')
+        if isinstance(peso, bool) or not isinstance(peso, (int, float)) or not 0 <= peso <= sys.float_info.max:
+            raise ValueError(f'peso inválido para {nome}: {peso!r}')
+        pesos[nome] = pesos.get(nome, 0.0) + peso
+    total = sum(pesos.values())
+    if not math.isfinite(total):
+        raise ValueError('soma dos pesos grande demais')
+    if not total:
+        raise ValueError('nenhum mood com peso positivo')
+    partes = tuple((nome, round(pesos[nome] / total * PARTES_PESO)) for nome in _NOMES_MOOD if pesos.get(nome))
+    partes = tuple((nome, n) for nome, n in partes if n)
+    if not partes:
+        raise ValueError('nenhum mood com peso positivo')
+    if len(partes) == 1:
+        return partes[0][0]
+    return partes
+
+
+def mood_resposta(mood: PesosMood) -> Union[str, Dict[str, float]]:
+    """Mood como aparece na resposta: o nome ou os pesos efetivos, somando 1"""
+    if isinstance(mood, str):
+        return mood
+    soma = sum(n for _, n in mood)
+    return {nome: round(n / soma, 2) for nome, n in mood}
+
+
+_NAO_ALFANUMERICO = re.compile(r'[^A-Za-z0-9]+')
+
+
+def resolver_link(item: ConteudoBase, fonte: Optional[str] = None) -> str:
+    """Link do item para a fonte pedida; fora o YouTube, vale o link gravado ou o da loja da categoria"""
+    urls = MoodRecommenderWithMedia
+    if isinstance(item, Musica):
+        if fonte == 'youtube':
+            return item.youtube_url or urls._gerar_url_busca_youtube(item.artista, item.titulo)
+        if item.link_url:
+            return item.link_url
+        if item.spotify_id:
+            return f"https://open.spotify.com/track/{item.spotify_id}"
+        return urls._gerar_url_spotify(item.artista, item.titulo)
+    if isinstance(item, Filme):
+        if fonte == 'youtube':
+            return urls._gerar_url_busca_youtube(item.titulo, f"{item.ano} trailer")
+        if item.link_url:
+            return item.link_url
+        if item.imdb_id:
+            return f"https://www.imdb.com/title/{item.imdb_id}/"
+        return urls._gerar_url_imdb(item.titulo, item.ano)
+    if isinstance(item, Jogo):
+        if fonte == 'youtube':
+            return urls._gerar_url_busca_youtube(item.titulo, "gameplay")
+        if item.link_url:
+            return item.link_url
+        if item.steam_id:
+            # Como na loja: /app/<id>/<título>/, com o título só em letras, dígitos e _
+            slug = _NAO_ALFANUMERICO.sub('_', item.titulo).strip('_')
+            return f"https://store.steampowered.com/app/{item.steam_id}/{slug + '/' if slug else ''}"
+        return urls._gerar_url_steam(item.titulo)
+    return item.link_url
+
+
+def resolver_imagem(item: ConteudoBase) -> Optional[str]:
+    """Imagem gravada ou, para jogos da Steam, a capa derivada do steam_id"""
+    if item.imagem_url:
+        return item.imagem_url
+    if isinstance(item, Jogo) and item.steam_id:
+        return f"https://cdn.cloudflare.steamstatic.com/steam/apps/{item.steam_id}/header.jpg"
+    return None
+
+
+CLASSES_CONTEUDO = {'Musica': Musica, 'Filme': Filme, 'Jogo': Jogo}
+# Classe dos itens de cada categoria do catálogo
+CATEGORIAS_CONTEUDO = {'musicas': Musica, 'filmes': Filme, 'jogos': Jogo}
+# Campos que o cliente pode pedir no formato compacto (id e relevância sempre vêm)
+CAMPOS_ITEM = frozenset(f.name for classe in CLASSES_CONTEUDO.values() for f in fields(classe)) - {'id'}
+
+# Quantos ids recentes por categoria ficam fora das próximas recomendações
+JANELA_HISTORICO = int(os.environ.get('MOOD_JANELA_HISTORICO', JANELA_PADRAO))
+
+# Fan-out por categoria em recomendar_tudo_com_variedade
+PARALELO_CATEGORIAS = os.environ.get('MOOD_PARALELO') == '1'
+TIMEOUT_CATEGORIA = float(os.environ.get('MOOD_TIMEOUT_CATEGORIA', '0.5'))
+
+# Modo determinístico: mesma sessão, mood e contador sempre geram o mesmo resultado
+DETERMINISTICO = os.environ.get('MOOD_DETERMINISTICO') == '1'
+SAL_SEMENTE = '' if DETERMINISTICO else secrets.token_hex(8)
+
+# Cache dos buckets de moods combinados por (pesos, tipo, versão do catálogo); o tamanho conta ids
+CACHE_BUCKETS_ENTRADAS = int(os.environ.get('MOOD_CACHE_ENTRADAS', '10000'))
+CACHE_BUCKETS_CANDIDATOS = int(os.environ.get('MOOD_CACHE_CANDIDATOS', '1000000'))
+
+# Combinações distintas de campos com fragmentos em cache, por versão do catálogo
+MAX_COMBINACOES_CAMPOS = 64
+
+# Limites de score usados na seleção
+SCORE_MINIMO = 6
+SCORE_FALLBACK = 5
+SCORE_TIER_ALTO = 9
+SCORE_TIER_MEDIO = 7
+
+# Com perfil de sessão, cada tier sorteia este múltiplo de itens e fica com os mais afins
+FATOR_PERFIL = 2
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _executor_categorias() -> ThreadPoolExecutor:
+    """Pool de threads compartilhado pelo fan-out de categorias"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4,
+                                               thread_name_prefix='categorias')
+    return _executor
+
+
+_rng_local = threading.local()
+
+
+def _rng_thread() -> random.Random:
+    """RNG por thread, para não disputar o estado global do módulo random"""
+    rng = getattr(_rng_local, 'rng', None)
+    if rng is None:
+        rng = _rng_local.rng = random.Random()
+    return rng
+
+
+@lru_cache(maxsize=None)
+def _tabela_combinada(total_partes: int) -> bytes:
+    """Tabela de bytes.translate: soma ponderada -> score combinado arredondado"""
+    return bytes(min(round(soma / total_partes), 255) for soma in range(256))
+
+
+# Tabelas de bytes.translate que marcam com 1 os itens de um score
+_MARCAS_SCORE = {score: bytes(int(v == score) for v in range(256)) for score in range(11)}
+
+
+def semente_requisicao(sid: str, mood: str, contador: int) -> int:
+    """Semente estável de (sessão, mood, contador); sem sal no modo determinístico"""
+    chave = f'{SAL_SEMENTE}|{sid}|{mood}|{contador}'.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(chave, digest_size=8).digest(), 'little')
+
+
+def _rng_categoria(semente: Optional[int], tipo: str) -> Optional[random.Random]:
+    """Um RNG por categoria, para o resultado não depender da ordem das threads"""
+    if semente is None:
+        return None
+    return random.Random(f'{semente}|{tipo}')
+
+
+class TierVirtual(Sequence):
+    """Buckets (score, ids) de um tier vistos como uma sequência de (score, id), sem copiar os ids"""
+
+    __slots__ = ('_buckets', '_inicios', '_tamanho')
+
+    def __init__(self, buckets: Sequence[Tuple[int, Sequence[int]]]):
+        self._buckets = buckets
+        self._inicios = []
+        total = 0
+        for _, ids in buckets:
+            self._inicios.append(total)
+            total += len(ids)
+        self._tamanho = total
+
+    def __len__(self) -> int:
+        return self._tamanho
+
+    def __getitem__(self, posicao: int) -> Tuple[int, int]:
+        b = bisect.bisect_right(self._inicios, posicao) - 1
+        score, ids = self._buckets[b]
+        return score, ids[posicao - self._inicios[b]]
+
+
+Tiers = Tuple[TierVirtual, TierVirtual, TierVirtual]
+
+
+class PermutacaoPseudoaleatoria:
+    """Permutação de range(n) fixa pela semente; qualquer posição sai em O(1), sem guardar a ordem
+
+    Rede de Feistel de 4 rodadas sobre o menor domínio de 2^(2b) >= n, com
+    cycle walking para cair de volta em range(n).
+    """
+
+    __slots__ = ('n', '_meio', '_mascara', '_chaves')
+
+    def __init__(self, n: int, semente: str):
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        self._meio = (bits + 1) // 2
+        self._mascara = (1 << self._meio) - 1
+        rng = random.Random(semente)
+        self._chaves = tuple(rng.getrandbits(64) for _ in range(4))
+
+    def _cifrar(self, x: int) -> int:
+        esquerda, direita = x >> self._meio, x & self._mascara
+        for chave in self._chaves:
+            esquerda, direita = direita, esquerda ^ (misturar64(direita ^ chave) & self._mascara)
+        return (esquerda << self._meio) | direita
+
+    def __getitem__(self, posicao: int) -> int:
+        x = self._cifrar(posicao)
+        while x >= self.n:
+            x = self._cifrar(x)
+        return x
+
+
+class OrdemEmbaralhada(Sequence):
+    """Tiers um após o outro, cada um numa ordem pseudoaleatória fixa pela semente"""
+
+    __slots__ = ('_partes', '_inicios', '_tamanho')
+
+    def __init__(self, tiers: Tiers, semente: str):
+        self._partes = [(tier, PermutacaoPseudoaleatoria(len(tier), f'{semente}|{i}'))
+                        for i, tier in enumerate(tiers) if len(tier)]
+        self._inicios = []
+        total = 0
+        for tier, _ in self._partes:
+            self._inicios.append(total)
+            total += len(tier)
+        self._tamanho = total
+
+    def __len__(self) -> int:
+        return self._tamanho
+
+    def __getitem__(self, posicao: int) -> Tuple[int, int]:
+        p = bisect.bisect_right(self._inicios, posicao) - 1
+        tier, permutacao = self._partes[p]
+        return tier[permutacao[posicao - self._inicios[p]]]
+
+
+class CursorExpirado(Exception):
+    """O cursor aponta para uma versão do catálogo que não está mais publicada"""
+
+
+def _amostrar(tier: Sequence, k: int, rng: random.Random, excluidos: Container[int] = frozenset()) -> List:
+    """Fisher–Yates parcial e esparso, descartando ids de `excluidos`: O(k + descartados) e sem alterar `tier`"""
+    n = len(tier)
+    trocas: Dict[int, int] = {}
+    escolhidos = []
+    i = 0
+    while len(escolhidos) < k and i < n:
+        j = rng.randrange(i, n)
+        candidato = tier[trocas.get(j, j)]
+        trocas[j] = trocas.get(i, i)
+        i += 1
+        if candidato[1] not in excluidos:
+            escolhidos.append(candidato)
+    return escolhidos
+
+
+def _amostrar_por_perfil(tier: Sequence, k: int, rng: random.Random, excluidos: Container[int],
+                         afinidades: Callable[[List[int]], List[float]]) -> List:
+    """Sorteia FATOR_PERFIL·k do tier e fica com os k mais próximos do perfil da sessão"""
+    candidatos = _amostrar(tier, k * FATOR_PERFIL, rng, excluidos)
+    if len(candidatos) <= k:
+        return candidatos
+    notas = afinidades([item_id for _, item_id in candidatos])
+    # sorted é estável: empates ficam na ordem do sorteio
+    return [candidatos[i] for i in sorted(range(len(candidatos)), key=notas.__getitem__, reverse=True)[:k]]
+
+
+def _como_conjunto(historico_ids) -> Container[int]:
+    """Histórico pronto para teste de pertinência O(1)"""
+    if not historico_ids:
+        return frozenset()
+    if isinstance(historico_ids, (set, frozenset, HistoricoCompacto)):
+        return historico_ids
+    return set(historico_ids)
+
+
+def _historico_compacto(valor, janela: int) -> HistoricoCompacto:
+    """Aceita o histórico antigo (lista de ids) ou um HistoricoCompacto"""
+    if isinstance(valor, HistoricoCompacto) and valor.janela == janela:
+        return valor
+    return HistoricoCompacto(valor or (), janela)
+
+
+def _perfil_sessao(session_data: Dict) -> PerfilMood:
+    """Perfil de moods da sessão, criado vazio na primeira vez"""
+    perfil = session_data.get('perfil_mood')
+    if not isinstance(perfil, PerfilMood):
+        perfil = session_data['perfil_mood'] = PerfilMood(len(_NOMES_MOOD))
+    return perfil
+
+
+class IndiceMood:
+    """Índice invertido tipo → mood → score → ids ordenados"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, Dict[int, List[int]]]] = {}
+        self._itens: Dict[str, Dict[int, ConteudoBase]] = {}
+        self._mapeados: Dict[str, CatalogoMapeado] = {}
+        self._colunas: Dict[str, Tuple[Sequence[int], Dict[str, int]]] = {}
+
+    def definir_categoria(self, tipo: str, itens: List[ConteudoBase]):
+        """(Re)constrói o índice de uma categoria inteira"""
+        postings: Dict[str, Dict[int, List[int]]] = {}
+        por_id: Dict[int, ConteudoBase] = {}
+        for item in itens:
+            por_id[item.id] = item
+            for mood, score in item.mood_scores.items():
+                if score >= SCORE_FALLBACK:
+                    postings.setdefault(mood, {}).setdefault(score, []).append(item.id)
+        for por_score in postings.values():
+            for ids in por_score.values():
+                ids.sort()
+        self._postings[tipo] = postings
+        self._itens[tipo] = por_id
+        self._mapeados.pop(tipo, None)
+        self._colunas.pop(tipo, None)
+
+    def definir_categoria_mapeada(self, tipo: str, catalogo: CatalogoMapeado):
+        """Usa os postings gravados no arquivo, sem percorrer os itens"""
+        self._postings[tipo] = {mood: catalogo.buckets(mood) for mood in catalogo.moods}
+        self._itens[tipo] = catalogo.por_id
+        self._mapeados[tipo] = catalogo
+        self._colunas.pop(tipo, None)
+
+    def adicionar(self, tipo: str, item: ConteudoBase):
+        """Insere ou substitui um item sem reconstruir a categoria"""
+        self.remover(tipo, item.id)
+        self._itens.setdefault(tipo, {})[item.id] = item
+        self._colunas.pop(tipo, None)
+        postings = self._postings.setdefault(tipo, {})
+        for mood, score in item.mood_scores.items():
+            if score >= SCORE_FALLBACK:
+                bisect.insort(postings.setdefault(mood, {}).setdefault(score, []), item.id)
+
+    def remover(self, tipo: str, item_id: int) -> Optional[ConteudoBase]:
+        """Remove um item do índice, se existir"""
+        item = self._itens.get(tipo, {}).pop(item_id, None)
+        if item is None:
+            return None
+        self._colunas.pop(tipo, None)
+        postings = self._postings[tipo]
+        for mood, score in item.mood_scores.items():
+            ids = postings.get(mood, {}).get(score)
+            if ids:
+                pos = bisect.bisect_left(ids, item_id)
+                if pos < len(ids) and ids[pos] == item_id:
+                    del ids[pos]
+                if not ids:
+                    del postings[mood][score]
+        return item
+
+    def item(self, tipo: str, item_id: int) -> ConteudoBase:
+        return self._itens[tipo][item_id]
+
+    def ids(self, tipo: str) -> Iterator[int]:
+        return iter(self._itens.get(tipo, {}))
+
+    def contem(self, tipo: str, item_id: int) -> bool:
+        return item_id in self._itens.get(tipo, {})
+
+    def vetor(self, tipo: str, item_id: int) -> Optional[bytes]:
+        """Scores do item, um byte por mood na ordem de Mood; None se não existir"""
+        catalogo = self._mapeados.get(tipo)
+        if catalogo is None:
+            item = self._itens.get(tipo, {}).get(item_id)
+            return item.mood_scores.valores if item is not None else None
+        pos = catalogo.posicao(item_id)
+        if pos is None:
+            return None
+        n_moods = len(catalogo.moods)
+        linha = catalogo.scores[pos * n_moods:(pos + 1) * n_moods]
+        if tuple(catalogo.moods) == _NOMES_MOOD:
+            return bytes(linha)
+        return ScoresMood(dict(zip(catalogo.moods, linha))).valores
+
+    def vetores(self, tipo: str, ids: Iterable[int]) -> List[bytes]:
+        """vetor() de vários ids que estão no índice"""
+        if tipo in self._mapeados:
+            return [self.vetor(tipo, item_id) for item_id in ids]
+        itens = self._itens[tipo]
+        return [itens[item_id].mood_scores.valores for item_id in ids]
+
+    def colunas(self, tipo: str) -> Tuple[Sequence[int], Dict[str, int]]:
+        """Ids e, por mood, a coluna de scores como um inteiro com um byte por item (montadas sob demanda)"""
+        colunas = self._colunas.get(tipo)
+        if colunas is None:
+            catalogo = self._mapeados.get(tipo)
+            if catalogo is not None:
+                ids, matriz, moods = catalogo.ids, catalogo.scores, catalogo.moods
+            else:
+                itens = self._itens.get(tipo, {})
+                ids = array('q', itens)
+                matriz, moods = b''.join(item.mood_scores.valores for item in itens.values()), _NOMES_MOOD
+            n_moods = len(moods)
+            colunas = ids, {mood: int.from_bytes(bytes(matriz[i::n_moods]), 'little')
+                            for i, mood in enumerate(moods)}
+            self._colunas[tipo] = colunas
+        return colunas
+
+    def derivar(self, tipo: str) -> 'IndiceMood':
+        """Cópia que compartilha as outras categorias e duplica só `tipo`"""
+        novo = IndiceMood()
+        novo._postings = dict(self._postings)
+        novo._itens = dict(self._itens)
+        novo._mapeados = dict(self._mapeados)
+        novo._colunas = {outro: colunas for outro, colunas in self._colunas.items() if outro != tipo}
+        novo._postings[tipo] = {
+            mood: {score: list(ids) for score, ids in por_score.items()}
+            for mood, por_score in self._postings.get(tipo, {}).items()
+        }
+        novo._itens[tipo] = dict(self._itens.get(tipo, {}))
+        return novo
+
+    def buckets(self, tipo: str, mood: str) -> Dict[int, List[int]]:
+        """Ids por score (>= SCORE_FALLBACK) para um mood"""
+        return self._postings.get(tipo, {}).get(mood, {})
+
+
+class PayloadCongelado(dict):
+    """dict somente-leitura compartilhado entre requisições"""
+
+    def _somente_leitura(self, *args, **kwargs):
+        raise TypeError('payload em cache é somente-leitura')
+
+    __setitem__ = __delitem__ = __ior__ = _somente_leitura
+    clear = pop = popitem = setdefault = update = _somente_leitura
+
+    def __copy__(self) -> Dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo) -> Dict:
+        return {k: copy.deepcopy(v, memo) for k, v in self.items()}
+
+
+class JSONBruto(str):
+    """Trecho já codificado em JSON, emendado como está por codificar_json"""
+
+
+def codificar_json(valor) -> str:
+    """json.dumps compacto que não recodifica os trechos JSONBruto"""
+    if isinstance(valor, JSONBruto):
+        return valor
+    if isinstance(valor, dict):
+        pares = (f'{json.dumps(str(chave), ensure_ascii=False)}:{codificar_json(v)}' for chave, v in valor.items())
+        return '{' + ','.join(pares) + '}'
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':'))
+
+
+def _congelar(valor):
+    if isinstance(valor, MappingABC):
+        return PayloadCongelado((k, _congelar(v)) for k, v in valor.items())
+    if isinstance(valor, list):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+
+class CacheLRU:
+    """Cache LRU limitado por número de entradas e por tamanho total, com contadores"""
+
+    def __init__(self, max_entradas: int, max_tamanho: int):
+        self.max_entradas = max_entradas
+        self.max_tamanho = max_tamanho
+        self._entradas: 'OrderedDict[object, Tuple[object, int]]' = OrderedDict()
+        self._tamanho = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[0]
+
+    def guardar(self, chave, valor, tamanho: int = 1):
+        if tamanho > self.max_tamanho:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self._tamanho -= anterior[1]
+            self._entradas[chave] = (valor, tamanho)
+            self._tamanho += tamanho
+            while len(self._entradas) > self.max_entradas or self._tamanho > self.max_tamanho:
+                _, (_, tamanho_removido) = self._entradas.popitem(last=False)
+                self._tamanho -= tamanho_removido
+                self.remocoes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._tamanho = 0
+
+    def estatisticas(self) -> Dict:
+        return {
+            'entradas': len(self._entradas),
+            'tamanho': self._tamanho,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'remocoes': self.remocoes,
+        }
+
+
+class CachePayloads:
+    """Payloads prontos para JSON, construídos uma vez por item e versão do catálogo"""
+
+    def __init__(self, indice: IndiceMood):
+        self._indice = indice
+        self._cache: Dict[str, Dict[int, PayloadCongelado]] = {}
+        self._fragmentos: Dict[str, Dict[int, str]] = {}
+        self._links: Dict[Tuple[str, str], Dict[int, str]] = {}
+        self._compactos: Dict[Tuple[str, Optional[Tuple[str, ...]], Optional[str]], Dict[int, str]] = {}
+        self._catalogos: Dict[Tuple[str, Optional[Tuple[str, ...]], Optional[str]], str] = {}
+
+    def payload(self, tipo: str, item_id: int) -> PayloadCongelado:
+        por_tipo = self._cache.setdefault(tipo, {})
+        payload = por_tipo.get(item_id)
+        if payload is None:
+            item = self._indice.item(tipo, item_id)
+            dados = {f.name: getattr(item, f.name) for f in fields(item)}
+            dados['link_url'] = resolver_link(item)
+            dados['imagem_url'] = resolver_imagem(item)
+            payload = _congelar(dados)
+            por_tipo[item_id] = payload
+        return payload
+
+    def link(self, tipo: str, item_id: int, fonte: str) -> str:
+        """Link alternativo (ex.: youtube), gerado na primeira vez que é pedido"""
+        por_item = self._links.setdefault((tipo, fonte), {})
+        url = por_item.get(item_id)
+        if url is None:
+            url = por_item[item_id] = resolver_link(self._indice.item(tipo, item_id), fonte)
+        return url
+
+    def resposta(self, tipo: str, item_id: int, relevancia: int, fonte: Optional[str] = None) -> Dict:
+        """Cópia rasa do payload com a relevância da requisição"""
+        item_dict = dict(self.payload(tipo, item_id))
+        item_dict['relevancia'] = relevancia
+        if fonte:
+            item_dict['link_url'] = self.link(tipo, item_id, fonte)
+        return item_dict
+
+    def json_resposta(self, tipo: str, item_id: int, relevancia: int) -> str:
+        """Item já codificado em JSON, com a relevância emendada no fragmento em cache"""
+        por_tipo = self._fragmentos.setdefault(tipo, {})
+        fragmento = por_tipo.get(item_id)
+        if fragmento is None:
+            # Sem a chave de fechamento, para emendar a relevância
+            fragmento = json.dumps(self.payload(tipo, item_id), separators=(',', ':'))[:-1]
+            por_tipo[item_id] = fragmento
+        return f'{fragmento},"relevancia":{relevancia}}}'
+
+    def _codificar_campos(self, tipo: str, item_id: int, campos: Optional[Tuple[str, ...]],
+                          fonte: Optional[str]) -> str:
+        payload = self.payload(tipo, item_id)
+        if campos is not None:
+            payload = {campo: payload[campo] for campo in campos if campo in payload}
+        if fonte and 'link_url' in payload:
+            payload = {**payload, 'link_url': self.link(tipo, item_id, fonte)}
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))[1:-1]
+
+    def _corpo_campos(self, tipo: str, item_id: int, campos: Optional[Tuple[str, ...]],
+                      fonte: Optional[str] = None) -> str:
+        """Pares "campo":valor já codificados, sem as chaves; None = todos os campos"""
+        chave = (tipo, campos, fonte)
+        por_item = self._compactos.get(chave)
+        if por_item is None:
+            if len(self._compactos) >= MAX_COMBINACOES_CAMPOS:
+                return self._codificar_campos(tipo, item_id, campos, fonte)
+            por_item = self._compactos.setdefault(chave, {})
+        corpo = por_item.get(item_id)
+        if corpo is None:
+            corpo = por_item[item_id] = self._codificar_campos(tipo, item_id, campos, fonte)
+        return corpo
+
+    def json_compacto(self, tipo: str, item_id: int, relevancia: int, campos: Tuple[str, ...],
+                      fonte: Optional[str] = None) -> str:
+        """Item no formato compacto: id, relevância e só os `campos` pedidos"""
+        corpo = self._corpo_campos(tipo, item_id, campos, fonte)
+        separador = ',' if corpo else ''
+        return f'{{"id":{item_id},"relevancia":{relevancia}{separador}{corpo}}}'
+
+    def json_catalogo(self, tipo: str, campos: Optional[Tuple[str, ...]] = None,
+                      fonte: Optional[str] = None) -> str:
+        """Objeto JSON id → item da categoria inteira, montado uma vez por versão"""
+        chave = (tipo, campos, fonte)
+        corpo = self._catalogos.get(chave)
+        if corpo is None:
+            itens = ','.join(f'"{item_id}":{{{self._corpo_campos(tipo, item_id, campos, fonte)}}}'
+                             for item_id in self._indice.ids(tipo))
+            corpo = '{' + itens + '}'
+            if len(self._catalogos) < MAX_COMBINACOES_CAMPOS:
+                self._catalogos[chave] = corpo
+        return corpo
+
+    def derivar(self, indice: IndiceMood, tipo: str, alterados: Set[int]) -> 'CachePayloads':
+        """Cache para uma nova versão: reaproveita tudo que não foi alterado"""
+        novo = CachePayloads(indice)
+        novo._cache = dict(self._cache)
+        novo._fragmentos = dict(self._fragmentos)
+        novo._cache[tipo] = {k: v for k, v in self._cache.get(tipo, {}).items() if k not in alterados}
+        novo._fragmentos[tipo] = {k: v for k, v in self._fragmentos.get(tipo, {}).items() if k not in alterados}
+        novo._links = {
+            chave: ({k: v for k, v in por_item.items() if k not in alterados} if chave[0] == tipo else por_item)
+            for chave, por_item in self._links.items()
+        }
+        novo._compactos = {
+            chave: ({k: v for k, v in por_item.items() if k not in alterados} if chave[0] == tipo else por_item)
+            for chave, por_item in self._compactos.items()
+        }
+        novo._catalogos = {chave: corpo for chave, corpo in self._catalogos.items() if chave[0] != tipo}
+        return novo
+
+
+class EstadoCatalogo:
+    """Uma versão do catálogo (itens, índice e payloads), trocada inteira de uma vez"""
+
+    def __init__(self, categorias: Dict[str, Sequence[ConteudoBase]], versao: int,
+                 arquivo: Optional[ArquivoCatalogo] = None, indice: Optional[IndiceMood] = None,
+                 payloads: Optional['CachePayloads'] = None,
+                 similaridade: Optional[Dict[str, IndiceSimilaridade]] = None):
+        inicio = time.perf_counter()
+        self.categorias = categorias
+        self.versao = versao
+        self.arquivo = arquivo
+        # Identifica esta versão para caches de cliente (o contador reinicia com o processo)
+        self.etag = f'{versao}-{secrets.token_hex(4)}'
+        if indice is None:
+            indice = IndiceMood()
+            for tipo, itens in categorias.items():
+                if isinstance(itens, CatalogoMapeado):
+                    indice.definir_categoria_mapeada(tipo, itens)
+                else:
+                    indice.definir_categoria(tipo, itens)
+        self.indice = indice
+        self.payloads = payloads if payloads is not None else CachePayloads(indice)
+        self.carregado_em = datetime.now()
+        self.duracao_carga = time.perf_counter() - inicio
+        # Índices de categorias que não mudaram são reaproveitados da versão anterior
+        self._similaridade: Dict[str, IndiceSimilaridade] = dict(similaridade or {})
+        self._lock_similaridade = threading.Lock()
+
+    def similaridade(self, tipo: str) -> Optional[IndiceSimilaridade]:
+        """Índice de vizinhos da categoria, montado no primeiro uso desta versão"""
+        indice = self._similaridade.get(tipo)
+        if indice is None:
+            itens = self.categorias.get(tipo)
+            if not itens:
+                return None
+            with self._lock_similaridade:
+                indice = self._similaridade.get(tipo)
+                if indice is None:
+                    classe = itens.classe if isinstance(itens, CatalogoMapeado) else type(itens[0])
+                    with metricas.etapa('similaridade_indice'):
+                        indice = self._similaridade[tipo] = IndiceSimilaridade(itens, classe._SIMILARIDADE)
+        return indice
+
+    def info(self) -> Dict:
+        return {
+            'versao': self.versao,
+            'versao_arquivo': self.arquivo.versao if self.arquivo else None,
+            'carregado_em': self.carregado_em.isoformat(timespec='seconds'),
+            'duracao_carga_ms': round(self.duracao_carga * 1000, 3),
+        }
 
 
 class MoodRecommenderWithMedia:
     """Engine de recomendação com imagens e links"""
-    
-    def __init__(self):
-        self.musicas = self._carregar_musicas()
-        self.filmes = self._carregar_filmes()
-        self.jogos = self._carregar_jogos()
-    
-    def _gerar_url_busca_youtube(self, artista: str, titulo: str) -> str:
+
+    def __init__(self, caminho_catalogo: Optional[str] = None,
+                 categorias: Optional[Dict[str, List[ConteudoBase]]] = None):
+        self.caminho_catalogo = None if categorias is not None else caminho_catalogo
+        self.cache_buckets = CacheLRU(CACHE_BUCKETS_ENTRADAS, CACHE_BUCKETS_CANDIDATOS)
+        self._lock_atualizacao = threading.Lock()
+        if categorias is not None:
+            self._estado = EstadoCatalogo(dict(categorias), 1)
+        else:
+            self._estado = self._novo_estado(caminho_catalogo, 1)
+
+    def _novo_estado(self, caminho: Optional[str], versao: int) -> EstadoCatalogo:
+        inicio = time.perf_counter()
+        if caminho:
+            # Catálogo em disco via mmap: itens são materializados sob demanda
+            arquivo = ArquivoCatalogo(caminho, CLASSES_CONTEUDO)
+            estado = EstadoCatalogo(dict(arquivo.categorias), versao, arquivo)
+        else:
+            categorias = {
+                'musicas': self._carregar_musicas(),
+                'filmes': self._carregar_filmes(),
+                'jogos': self._carregar_jogos(),
+            }
+            estado = EstadoCatalogo(categorias, versao)
+        estado.duracao_carga = time.perf_counter() - inicio
+        return estado
+
+    def _publicar(self, estado: EstadoCatalogo):
+        # Atribuição de referência é atômica: requisições em andamento
+        # continuam com o estado que já pegaram
+        self._estado = estado
+        self.cache_buckets.limpar()
+
+    @property
+    def estado(self) -> EstadoCatalogo:
+        return self._estado
+
+    @property
+    def categorias(self) -> Dict[str, Sequence[ConteudoBase]]:
+        return self._estado.categorias
+
+    @property
+    def musicas(self) -> Sequence[Musica]:
+        return self._estado.categorias.get('musicas', [])
+
+    @property
+    def filmes(self) -> Sequence[Filme]:
+        return self._estado.categorias.get('filmes', [])
+
+    @property
+    def jogos(self) -> Sequence[Jogo]:
+        return self._estado.categorias.get('jogos', [])
+
+    @property
+    def indice(self) -> IndiceMood:
+        return self._estado.indice
+
+    @property
+    def payloads(self) -> 'CachePayloads':
+        return self._estado.payloads
+
+    @property
+    def versao_catalogo(self) -> int:
+        return self._estado.versao
+
+    @property
+    def arquivo_catalogo(self) -> Optional[ArquivoCatalogo]:
+        return self._estado.arquivo
+
+    def reconstruir_indice(self):
+        """Reconstrói índice e payloads a partir dos itens atuais"""
+        with self._lock_atualizacao:
+            atual = self._estado
+            self._publicar(EstadoCatalogo(dict(atual.categorias), atual.versao + 1, atual.arquivo))
+
+    def recarregar_catalogo(self, caminho: Optional[str] = None) -> EstadoCatalogo:
+        """Carrega uma nova versão do catálogo e a publica sem reiniciar o processo"""
+        caminho = caminho or self.caminho_catalogo
+        with self._lock_atualizacao:
+            estado = self._novo_estado(caminho, self._estado.versao + 1)
+            self.caminho_catalogo = caminho
+            self._publicar(estado)
+        return estado
+
+    def recarregar_em_segundo_plano(self, caminho: Optional[str] = None) -> threading.Thread:
+        """Como recarregar_catalogo, numa thread; a troca acontece quando a carga termina"""
+        def recarregar():
+            try:
+                estado = self.recarregar_catalogo(caminho)
+                print(f"🔄 Catálogo recarregado: versão {estado.versao} em {estado.duracao_carga * 1000:.1f} ms")
+            except Exception as e:
+                print(f"Erro ao recarregar catálogo: {e}")
+                print(traceback.format_exc())
+        thread = threading.Thread(target=recarregar, name='recarga-catalogo', daemon=True)
+        thread.start()
+        return thread
+
+    def atualizar_itens(self, tipo: str, itens: Iterable[ConteudoBase] = (),
+                        remover: Iterable[int] = ()) -> EstadoCatalogo:
+        """Nova versão com poucos itens alterados: só a categoria tocada é copiada"""
+        itens = list(itens)
+        remover = set(remover)
+        with self._lock_atualizacao:
+            atual = self._estado
+            lista = atual.categorias[tipo]
+            if not isinstance(lista, list):
+                raise TypeError(f'catálogo de {tipo} é somente-leitura (arquivo em disco); use recarregar_catalogo')
+            novos = {item.id: item for item in itens}
+            nova_lista = [novos.pop(item.id, item) for item in lista if item.id not in remover]
+            nova_lista.extend(novos.values())
+
+            indice = atual.indice.derivar(tipo)
+            for item_id in remover:
+                indice.remover(tipo, item_id)
+            for item in itens:
+                indice.adicionar(tipo, item)
+            alterados = remover | {item.id for item in itens}
+            payloads = atual.payloads.derivar(indice, tipo, alterados)
+
+            categorias = dict(atual.categorias)
+            categorias[tipo] = nova_lista
+            # Só a categoria alterada perde o índice de similaridade já montado
+            similaridade = {outro: vizinhos for outro, vizinhos in atual._similaridade.items() if outro != tipo}
+            estado = EstadoCatalogo(categorias, atual.versao + 1, atual.arquivo, indice, payloads, similaridade)
+            self._publicar(estado)
+        return estado
+
+    def adicionar_item(self, tipo: str, item: ConteudoBase):
+        """Adiciona (ou substitui) um item e atualiza o índice incrementalmente"""
+        self.atualizar_itens(tipo, itens=[item])
+
+    def remover_item(self, tipo: str, item_id: int) -> bool:
+        """Remove um item do catálogo e do índice"""
+        if not self._estado.indice.contem(tipo, item_id):
+            return False
+        self.atualizar_itens(tipo, remover=[item_id])
+        return True
+
+    @staticmethod
+    def _gerar_url_busca_youtube(artista: str, titulo: str) -> str:
         query = f"{artista} {titulo}"
         return f"https://www.youtube.com/results?search_query={urllib.parse.quote(query)}"
     
-    def _gerar_url_spotify(self, artista: str, titulo: str) -> str:
+    @staticmethod
+    def _gerar_url_spotify(artista: str, titulo: str) -> str:
         query = f"{artista} {titulo}"
         return f"https://open.spotify.com/search/{urllib.parse.quote(query)}"
     
-    def _gerar_url_imdb(self, titulo: str, ano: int = None) -> str:
+    @staticmethod
+    def _gerar_url_imdb(titulo: str, ano: int = None) -> str:
         query = f"{titulo} {ano}" if ano else titulo
         return f"https://www.imdb.com/find?q={urllib.parse.quote(query)}"
     
-    def _gerar_url_steam(self, titulo: str) -> str:
+    @staticmethod
+    def _gerar_url_steam(titulo: str) -> str:
         return f"https://store.steampowered.com/search/?term={urllib.parse.quote(titulo)}"
     
     def _carregar_musicas(self) -> List[Musica]:
@@ -82,7 +1025,7 @@ class MoodRecommenderWithMedia:
                 1, "Don't Stop Me Now", 
                 {"feliz": 10, "energizado": 9, "relaxado": 2},
                 "https://i.scdn.co/image/ab67616d0000b2731dacfbc31cc873d132958af9",  # Imagem do álbum Queen
-                "https://open.spotify.com/track/7hQJA50XrCWABAu5v6QZ4i",
+                None,
                 "Queen", "3:29", "Rock",
                 spotify_id="7hQJA50XrCWABAu5v6QZ4i"
             ),
@@ -90,7 +1033,7 @@ class MoodRecommenderWithMedia:
                 2, "Happy", 
                 {"feliz": 10, "energizado": 8, "relaxado": 4},
                 "https://i.scdn.co/image/ab67616d0000b2732c430aa917d49c0e48201f96",
-                "https://open.spotify.com/track/60nZcImufyMA1MKQY3dcCH",
+                None,
                 "Pharrell Williams", "3:53", "Pop",
                 spotify_id="60nZcImufyMA1MKQY3dcCH"
             ),
@@ -98,7 +1041,7 @@ class MoodRecommenderWithMedia:
                 3, "Uptown Funk",
                 {"feliz": 9, "energizado": 10, "relaxado": 2},
                 "https://i.scdn.co/image/ab67616d0000b273e787cffec20aa2a396a61647",
-                "https://open.spotify.com/track/32OlwWuMpZ6b0aN2RZOeMS",
+                None,
                 "Bruno Mars", "4:30", "Funk",
                 spotify_id="32OlwWuMpZ6b0aN2RZOeMS"
             ),
@@ -167,7 +1110,7 @@ class MoodRecommenderWithMedia:
                 1, "The Grand Budapest Hotel",
                 {"feliz": 9, "pensativo": 7, "relaxado": 6},
                 "https://m.media-amazon.com/images/M/MV5BMzM5NjUxOTEyMl5BMl5BanBnXkFtZTgwNjEyMDM0MDE@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt2278388/",
+                None,
                 "Wes Anderson", 2014, "Comédia", "99 min",
                 imdb_id="tt2278388"
             ),
@@ -175,7 +1118,7 @@ class MoodRecommenderWithMedia:
                 2, "Amélie",
                 {"feliz": 10, "pensativo": 7, "relaxado": 8},
                 "https://m.media-amazon.com/images/M/MV5BNDg4NjM1YjMtYmNhZC00MjM0LWFiZmYtNGY1YjA3MzZmODc5XkEyXkFqcGdeQXVyNDk3NzU2MTQ@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt0211915/",
+                None,
                 "Jean-Pierre Jeunet", 2001, "Romance/Comédia", "122 min",
                 imdb_id="tt0211915"
             ),
@@ -183,7 +1126,7 @@ class MoodRecommenderWithMedia:
                 3, "Guardians of the Galaxy",
                 {"feliz": 9, "energizado": 8, "relaxado": 5},
                 "https://m.media-amazon.com/images/M/MV5BNzM3NDFhYTQtYjViOC00NDZhLWI0Y2ItZGUyZGMxODdjMmU1XkEyXkFqcGc@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt2015381/",
+                None,
                 "James Gunn", 2014, "Ação/Comédia", "121 min",
                 imdb_id="tt2015381"
             ),
@@ -193,7 +1136,7 @@ class MoodRecommenderWithMedia:
                 4, "The Pursuit of Happyness",
                 {"feliz": 8, "pensativo": 9, "triste": 7},
                 "https://m.media-amazon.com/images/M/MV5BMTQ5NjQ0NDI3NF5BMl5BanBnXkFtZTcwNDI0MjEzMw@@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt0454921/",
+                None,
                 "Gabriele Muccino", 2006, "Drama", "117 min",
                 imdb_id="tt0454921"
             ),
@@ -201,7 +1144,7 @@ class MoodRecommenderWithMedia:
                 5, "Eternal Sunshine of the Spotless Mind",
                 {"triste": 9, "pensativo": 10, "relaxado": 4},
                 "https://m.media-amazon.com/images/M/MV5BMTY4NzcwODg3Nl5BMl5BanBnXkFtZTcwNTEwOTMyMw@@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt0338013/",
+                None,
                 "Michel Gondry", 2004, "Romance/Drama", "108 min",
                 imdb_id="tt0338013"
             ),
@@ -211,7 +1154,7 @@ class MoodRecommenderWithMedia:
                 6, "Blade Runner 2049",
                 {"pensativo": 10, "triste": 7, "ansioso": 6},
                 "https://m.media-amazon.com/images/M/MV5BNzA1Njg4NzYxOV5BMl5BanBnXkFtZTgwODk5NjU3MzI@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt1856101/",
+                None,
                 "Denis Villeneuve", 2017, "Sci-Fi", "164 min",
                 imdb_id="tt1856101"
             ),
@@ -219,7 +1162,7 @@ class MoodRecommenderWithMedia:
                 7, "Arrival",
                 {"pensativo": 10, "ansioso": 7, "triste": 6},
                 "https://m.media-amazon.com/images/M/MV5BMTExMzU0ODcxNDheQTJeQWpwZ15BbWU4MDE1OTI4MzAy._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt2543164/",
+                None,
                 "Denis Villeneuve", 2016, "Sci-Fi", "116 min",
                 imdb_id="tt2543164"
             ),
@@ -229,7 +1172,7 @@ class MoodRecommenderWithMedia:
                 8, "Mad Max: Fury Road",
                 {"energizado": 10, "ansioso": 8, "feliz": 6},
                 "https://m.media-amazon.com/images/M/MV5BN2EwM2I5OWMtMGQyMi00Zjg1LWJkNTctZTdjYTA4OGUwZjMyXkEyXkFqcGdeQXVyMTMxODk2OTU@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt1392190/",
+                None,
                 "George Miller", 2015, "Ação", "120 min",
                 imdb_id="tt1392190"
             ),
@@ -237,7 +1180,7 @@ class MoodRecommenderWithMedia:
                 9, "John Wick",
                 {"energizado": 10, "ansioso": 5, "feliz": 4},
                 "https://m.media-amazon.com/images/M/MV5BMTU2NjA1ODgzMF5BMl5BanBnXkFtZTgwMTM2MTI4MjE@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt2911666/",
+                None,
                 "Chad Stahelski", 2014, "Ação", "101 min",
                 imdb_id="tt2911666"
             ),
@@ -247,7 +1190,7 @@ class MoodRecommenderWithMedia:
                 10, "My Neighbor Totoro",
                 {"relaxado": 10, "feliz": 9, "pensativo": 5},
                 "https://m.media-amazon.com/images/M/MV5BYzJjMTYyMjQtZDI0My00ZjE2LTkyNGYtOTllNGQxNDMyZjE0XkEyXkFqcGdeQXVyMTMxODk2OTU@._V1_SX300.jpg",
-                "https://www.imdb.com/title/tt0096283/",
+                None,
                 "Hayao Miyazaki", 1988, "Animação", "86 min",
                 imdb_id="tt0096283"
             ),
@@ -260,8 +1203,8 @@ class MoodRecommenderWithMedia:
             Jogo(
                 1, "Stardew Valley",
                 {"relaxado": 10, "feliz": 8, "pensativo": 6},
-                "https://cdn.cloudflare.steamstatic.com/steam/apps/413150/header.jpg",
-                "https://store.steampowered.com/app/413150/Stardew_Valley/",
+                None,
+                None,
                 "PC/Console", "Simulação", False,
                 steam_id="413150"
             ),
@@ -275,8 +1218,8 @@ class MoodRecommenderWithMedia:
             Jogo(
                 3, "Journey",
                 {"pensativo": 10, "relaxado": 9, "triste": 6},
-                "https://cdn.cloudflare.steamstatic.com/steam/apps/638230/header.jpg",
-                "https://store.steampowered.com/app/638230/Journey/",
+                None,
+                None,
                 "PlayStation/PC", "Aventura", True,
                 steam_id="638230"
             ),
@@ -285,16 +1228,16 @@ class MoodRecommenderWithMedia:
             Jogo(
                 4, "DOOM Eternal",
                 {"energizado": 10, "ansioso": 3, "feliz": 6},
-                "https://cdn.cloudflare.steamstatic.com/steam/apps/782330/header.jpg",
-                "https://store.steampowered.com/app/782330/DOOM_Eternal/",
+                None,
+                None,
                 "PC/Console", "FPS", False,
                 steam_id="782330"
             ),
             Jogo(
                 5, "Hades",
                 {"energizado": 10, "feliz": 8, "ansioso": 5},
-                "https://cdn.cloudflare.steamstatic.com/steam/apps/1145360/header.jpg",
-                "https://store.steampowered.com/app/1145360/Hades/",
+                None,
+                None,
                 "PC/Console", "Roguelike", False,
                 steam_id="1145360"
             ),
@@ -310,8 +1253,8 @@ class MoodRecommenderWithMedia:
             Jogo(
                 7, "Fall Guys",
                 {"feliz": 9, "energizado": 7, "relaxado": 5},
-                "https://cdn.cloudflare.steamstatic.com/steam/apps/1097150/header.jpg",
-                "https://store.steampowered.com/app/1097150/Fall_Guys/",
+                None,
+                None,
                 "PC/Console", "Party", True,
                 steam_id="1097150"
             ),
@@ -320,16 +1263,16 @@ class MoodRecommenderWithMedia:
             Jogo(
                 8, "Outer Wilds",
                 {"pensativo": 10, "ansioso": 7, "feliz": 7},
-                "https://cdn.cloudflare.steamstatic.com/steam/apps/753640/header.jpg",
-                "https://store.steampowered.com/app/753640/Outer_Wilds/",
+                None,
+                None,
                 "PC/Console", "Aventura", False,
                 steam_id="753640"
             ),
             Jogo(
                 9, "What Remains of Edith Finch",
                 {"pensativo": 10, "triste": 9, "relaxado": 5},
-                "https://cdn.cloudflare.steamstatic.com/steam/apps/501300/header.jpg",
-                "https://store.steampowered.com/app/501300/What_Remains_of_Edith_Finch/",
+                None,
+                None,
                 "PC/Console", "Narrativa", False,
                 steam_id="501300"
             ),
@@ -338,157 +1281,804 @@ class MoodRecommenderWithMedia:
             Jogo(
                 10, "Celeste",
                 {"ansioso": 7, "energizado": 8, "pensativo": 7},
-                "https://cdn.cloudflare.steamstatic.com/steam/apps/504230/header.jpg",
-                "https://store.steampowered.com/app/504230/Celeste/",
+                None,
+                None,
                 "PC/Console", "Plataforma", False,
                 steam_id="504230"
             ),
         ]
     
-    def recomendar_com_variedade(self, mood: str, tipo: str, limite: int = 3,
-                                  historico_ids: List[int] = None) -> List[Dict]:
-        """Recomenda com variedade (mesmo código anterior)"""
-        mood = mood.lower()
-        historico_ids = historico_ids or []
-        
-        if tipo == "musicas":
-            conteudo = self.musicas
-        elif tipo == "filmes":
-            conteudo = self.filmes
-        elif tipo == "jogos":
-            conteudo = self.jogos
-        else:
-            return []
-        
-        candidatos = []
-        for item in conteudo:
-            score = item.mood_scores.get(mood, 0)
-            if score >= 6 and item.id not in historico_ids:
-                item_dict = asdict(item)
-                item_dict['relevancia'] = score
-                candidatos.append(item_dict)
-        
-        if not candidatos:
-            for item in conteudo:
-                score = item.mood_scores.get(mood, 0)
-                if score >= 5:
-                    item_dict = asdict(item)
-                    item_dict['relevancia'] = score
-                    candidatos.append(item_dict)
-        
-        tier_alto = [c for c in candidatos if c['relevancia'] >= 9]
-        tier_medio = [c for c in candidatos if 7 <= c['relevancia'] < 9]
-        tier_baixo = [c for c in candidatos if c['relevancia'] < 7]
-        
+    def _buckets_ordenados(self, estado: EstadoCatalogo, tipo: str, mood: PesosMood) -> List[Tuple[int, Sequence[int]]]:
+        """Buckets (score, ids) do índice, do maior score para o menor"""
+        if not isinstance(mood, str):
+            return self._buckets_combinados(estado, tipo, mood)
+        return sorted(estado.indice.buckets(tipo, mood).items(), reverse=True)
+
+    def _buckets_combinados(self, estado: EstadoCatalogo, tipo: str,
+                            pesos: Tuple[Tuple[str, int], ...]) -> List[Tuple[int, Sequence[int]]]:
+        """Buckets pelo score combinado round(Σ partes·score / Σ partes), em cache por vetor de pesos
+
+        As colunas de score são inteiros com um byte por item, então a soma
+        ponderada de todos os itens sai de poucas operações em inteiros grandes.
+        """
+        chave = ('combinado', pesos, tipo, estado.versao)
+        buckets = self.cache_buckets.obter(chave)
+        if buckets is None:
+            with metricas.etapa('combinar'):
+                ids, colunas = estado.indice.colunas(tipo)
+                soma = sum(partes * colunas.get(mood, 0) for mood, partes in pesos)
+                scores = soma.to_bytes(len(ids), 'little').translate(_tabela_combinada(sum(n for _, n in pesos)))
+                buckets = []
+                for score in range(10, SCORE_FALLBACK - 1, -1):
+                    if score in scores:
+                        buckets.append((score, sorted(compress(ids, scores.translate(_MARCAS_SCORE[score])))))
+            self.cache_buckets.guardar(chave, buckets, sum(len(ids) for _, ids in buckets))
+        return buckets
+
+    @staticmethod
+    def _tiers(buckets: List[Tuple[int, Sequence[int]]], minimo: int) -> Tiers:
+        """Tiers alto (9+), médio (7-8) e baixo (minimo-6) sobre os buckets, sem materializar candidatos"""
+        alto, medio, baixo = [], [], []
+        for score, ids in buckets:
+            if score >= SCORE_TIER_ALTO:
+                alto.append((score, ids))
+            elif score >= SCORE_TIER_MEDIO:
+                medio.append((score, ids))
+            elif score >= minimo:
+                baixo.append((score, ids))
+        return TierVirtual(alto), TierVirtual(medio), TierVirtual(baixo)
+
+    @staticmethod
+    def _todos_excluidos(tiers: Tiers, excluidos: Container[int]) -> bool:
+        """Se todo item dos tiers está no histórico; só percorre tiers menores que o histórico"""
+        if sum(len(tier) for tier in tiers) > len(excluidos):
+            return False
+        return all(item_id in excluidos for tier in tiers for _, item_id in tier)
+
+    def _selecionar(self, buckets: List[Tuple[int, Sequence[int]]], limite: int, rng: random.Random,
+                    historico_ids=None, afinidades: Optional[Callable[[List[int]], List[float]]] = None) -> List[Tuple[int, int]]:
+        """Sorteio final por tiers: até 2 do alto, completa com médio e baixo
+
+        Cada tier é amostrado direto dos buckets do índice, descartando o
+        histórico na hora: o custo é O(limite + ids do histórico sorteados),
+        não importa quantos itens combinem com o mood. Com `afinidades`, cada
+        tier sorteia FATOR_PERFIL vezes mais e fica com os mais afins.
+        """
+        excluidos = _como_conjunto(historico_ids)
+        with metricas.etapa('sorteio'):
+            selecionados = self._sortear(self._tiers(buckets, SCORE_MINIMO), limite, rng, excluidos, afinidades)
+            if not selecionados:
+                # Nada elegível fora do histórico: o fallback ignora o histórico e aceita score >= 5
+                selecionados = self._sortear(self._tiers(buckets, SCORE_FALLBACK), limite, rng)
+            rng.shuffle(selecionados)
+
+        return selecionados[:limite]
+
+    @staticmethod
+    def _sortear(tiers: Tiers, limite: int, rng: random.Random, excluidos: Container[int] = frozenset(),
+                 afinidades: Optional[Callable[[List[int]], List[float]]] = None) -> List[Tuple[int, int]]:
+        def amostrar(tier, k):
+            if afinidades is None:
+                return _amostrar(tier, k, rng, excluidos)
+            return _amostrar_por_perfil(tier, k, rng, excluidos, afinidades)
+
+        tier_alto, tier_medio, tier_baixo = tiers
         selecionados = []
-        
         if tier_alto:
-            random.shuffle(tier_alto)
-            selecionados.extend(tier_alto[:min(2, limite)])
-        
+            selecionados.extend(amostrar(tier_alto, min(2, limite)))
         if len(selecionados) < limite and tier_medio:
-            random.shuffle(tier_medio)
-            selecionados.extend(tier_medio[:limite - len(selecionados)])
-        
+            selecionados.extend(amostrar(tier_medio, limite - len(selecionados)))
         if len(selecionados) < limite and tier_baixo:
-            random.shuffle(tier_baixo)
-            selecionados.extend(tier_baixo[:limite - len(selecionados)])
-        
-        random.shuffle(selecionados)
-        
-        return selecionados[:limite]
+            selecionados.extend(amostrar(tier_baixo, limite - len(selecionados)))
+        return selecionados
+
+    def recomendar_com_variedade(self, mood: Union[str, Mapping[str, float]], tipo: str, limite: int = 3,
+                                  historico_ids: List[int] = None,
+                                  rng: Optional[random.Random] = None,
+                                  fonte_link: Optional[str] = None,
+                                  perfil: Optional[PerfilMood] = None) -> List[Dict]:
+        """Recomenda com variedade; passe `rng` semeado para um resultado reproduzível
+
+        `mood` pode ser um vetor de pesos, ex.: {'ansioso': 0.6, 'relaxado': 0.4}.
+        Com `perfil`, o sorteio puxa para o perfil da sessão e os itens
+        escolhidos entram nele.
+        """
+        return self._recomendar(self._estado, mood, tipo, limite, historico_ids, rng, fonte_link, perfil)
+
+    def _recomendar(self, estado: EstadoCatalogo, mood: PesosMood, tipo: str, limite: int,
+                    historico_ids, rng: Optional[random.Random], fonte_link: Optional[str] = None,
+                    perfil: Optional[PerfilMood] = None) -> List[Dict]:
+        selecionados = self._selecionar_categoria(estado, mood, tipo, limite, historico_ids, rng, perfil)
+        self._registrar_exibidos(estado, perfil, tipo, selecionados)
+        with metricas.etapa('serializacao'):
+            return [estado.payloads.resposta(tipo, item_id, score, fonte_link) for score, item_id in selecionados]
+
+    def _selecionar_categoria(self, estado: EstadoCatalogo, mood: PesosMood, tipo: str, limite: int,
+                              historico_ids, rng: Optional[random.Random],
+                              perfil: Optional[PerfilMood] = None) -> List[Tuple[int, int]]:
+        """(score, id) sorteados para uma categoria"""
+        mood = normalizar_mood(mood)
+
+        if tipo not in estado.categorias:
+            return []
+
+        with metricas.etapa('candidatos'):
+            buckets = self._buckets_ordenados(estado, tipo, mood)
+        afinidades = None
+        if perfil is not None and perfil.eventos:
+            vetores = estado.indice.vetores
+
+            def afinidades(ids: List[int]) -> List[float]:
+                return perfil.afinidades(vetores(tipo, ids))
+        return self._selecionar(buckets, limite, rng or _rng_thread(), historico_ids, afinidades)
+
+    @staticmethod
+    def _registrar_exibidos(estado: EstadoCatalogo, perfil: Optional[PerfilMood], tipo: str,
+                            selecionados: List[Tuple[int, int]]):
+        if perfil is None or not selecionados:
+            return
+        for vetor in estado.indice.vetores(tipo, [item_id for _, item_id in selecionados]):
+            perfil.registrar(vetor)
+
+    def registrar_clique(self, perfil: PerfilMood, tipo: str, item_id: int) -> bool:
+        """Leva o perfil da sessão na direção de um item aberto; False se o item não existe"""
+        vetor = self._estado.indice.vetor(tipo, item_id)
+        if vetor is None:
+            return False
+        perfil.registrar(vetor, ALFA_CLIQUE)
+        return True
+
+    def recomendar_compacto(self, mood: Union[str, Mapping[str, float]], tipo: str, limite: int = 3, historico_ids: List[int] = None,
+                            rng: Optional[random.Random] = None, campos: Tuple[str, ...] = (),
+                            fonte_link: Optional[str] = None, perfil: Optional[PerfilMood] = None) -> Dict:
+        """Formato compacto de uma categoria; os itens completos vêm de /api/catalogo/<tipo>"""
+        estado = self._estado
+        mood = normalizar_mood(mood)
+        selecionados = self._selecionar_categoria(estado, mood, tipo, limite, historico_ids, rng, perfil)
+        self._registrar_exibidos(estado, perfil, tipo, selecionados)
+        with metricas.etapa('serializacao'):
+            return {'mood': mood_resposta(mood), 'catalogo': estado.etag,
+                    tipo: self._lista_compacta(estado, tipo, selecionados, campos, fonte_link)}
+
+    @staticmethod
+    def _lista_compacta(estado: EstadoCatalogo, tipo: str, selecionados: List[Tuple[int, int]],
+                        campos: Tuple[str, ...], fonte_link: Optional[str] = None) -> JSONBruto:
+        itens = ','.join(estado.payloads.json_compacto(tipo, item_id, score, campos, fonte_link)
+                         for score, item_id in selecionados)
+        return JSONBruto(f'[{itens}]')
+
+    def recomendar_pagina(self, mood: Union[str, Mapping[str, float]], tipo: str, semente: int,
+                          posicao: int = 0, limite: int = 3, historico_ids=None,
+                          catalogo: Optional[str] = None, campos: Optional[Tuple[str, ...]] = None,
+                          fonte_link: Optional[str] = None) -> Dict:
+        """Página de uma ordem embaralhada fixa por (semente, versão do catálogo), a partir de `posicao`
+
+        A ordem segue os tiers (9+, 7-8, 6) e pula o histórico; se o
+        histórico cobre todos eles, vale o fallback >= 5 sem histórico, como
+        em _selecionar. O custo é O(limite + itens do histórico pulados).
+        `posicao` na resposta continua a ordem (None no fim) e `catalogo` deve
+        voltar na próxima chamada: se a versão mudou, levanta CursorExpirado.
+        """
+        estado = self._estado
+        if catalogo is not None and catalogo != estado.etag:
+            raise CursorExpirado(catalogo)
+        mood = normalizar_mood(mood)
+        selecionados: List[Tuple[int, int]] = []
+        if tipo in estado.categorias:
+            with metricas.etapa('candidatos'):
+                buckets = self._buckets_ordenados(estado, tipo, mood)
+            tiers = self._tiers(buckets, SCORE_MINIMO)
+            excluidos = _como_conjunto(historico_ids)
+            if self._todos_excluidos(tiers, excluidos):
+                # Como em _selecionar: nada elegível fora do histórico, o fallback ignora o histórico e aceita score >= 5
+                tiers = self._tiers(buckets, SCORE_FALLBACK)
+                excluidos = frozenset()
+            ordem = OrdemEmbaralhada(tiers, f'{semente}|{tipo}')
+            with metricas.etapa('sorteio'):
+                while len(selecionados) < limite and posicao < len(ordem):
+                    candidato = ordem[posicao]
+                    posicao += 1
+                    if candidato[1] not in excluidos:
+                        selecionados.append(candidato)
+            fim = posicao >= len(ordem)
+        else:
+            fim = True
+        with metricas.etapa('serializacao'):
+            if campos is None:
+                itens = [estado.payloads.resposta(tipo, item_id, score, fonte_link) for score, item_id in selecionados]
+            else:
+                itens = self._lista_compacta(estado, tipo, selecionados, campos, fonte_link)
+        return {'mood': mood_resposta(mood), 'catalogo': estado.etag, tipo: itens,
+                'posicao': None if fim else posicao}
+
+    def similares(self, tipo: str, item_id: int, limite: int = 5,
+                  fonte_link: Optional[str] = None) -> Optional[Dict]:
+        """Itens mais parecidos com `item_id` (moods, gênero e autor); None se o item não existe"""
+        estado = self._estado
+        indice = estado.similaridade(tipo)
+        if indice is None or item_id not in indice:
+            return None
+        with metricas.etapa('similares'):
+            vizinhos = indice.vizinhos(item_id, limite)
+        itens = []
+        for sim, vizinho in vizinhos:
+            item_dict = estado.payloads.resposta(tipo, vizinho, round(sim * 10), fonte_link)
+            item_dict['similaridade'] = round(sim, 3)
+            itens.append(item_dict)
+        return {'catalogo': estado.etag, 'item': item_id, tipo: itens}
+
+    def _selecionar_lote(self, estado: EstadoCatalogo, pedidos: Iterable[Tuple]
+                         ) -> Iterator[Tuple[PesosMood, str, List[Tuple[int, int]]]]:
+        """Seleção de vários pedidos compartilhando as consultas ao índice"""
+        buckets_por_chave = {}
+        for mood, tipo, limite, historico, *semente in pedidos:
+            mood = normalizar_mood(mood)
+            if tipo not in estado.categorias:
+                yield mood, tipo, []
+                continue
+            chave = (tipo, mood)
+            buckets = buckets_por_chave.get(chave)
+            if buckets is None:
+                buckets = buckets_por_chave[chave] = self._buckets_ordenados(estado, tipo, mood)
+            rng = random.Random(semente[0]) if semente and semente[0] is not None else _rng_thread()
+            yield mood, tipo, self._selecionar(buckets, limite, rng, historico)
+
+    def recomendar_lote(self, pedidos: Iterable[Tuple]) -> Iterator[List[Dict]]:
+        """Recomenda para vários (mood, tipo, limite, historico[, semente]) de uma vez"""
+        estado = self._estado
+        for _, tipo, selecionados in self._selecionar_lote(estado, pedidos):
+            yield [estado.payloads.resposta(tipo, item_id, score) for score, item_id in selecionados]
+
+    def recomendar_lote_ndjson(self, pedidos: Iterable[Tuple]) -> Iterator[str]:
+        """Como recomendar_lote, mas já em linhas NDJSON montadas com fragmentos pré-codificados"""
+        estado = self._estado
+        for indice, (mood, tipo, selecionados) in enumerate(self._selecionar_lote(estado, pedidos)):
+            itens = ','.join(estado.payloads.json_resposta(tipo, item_id, score) for score, item_id in selecionados)
+            yield (f'{{"indice":{indice},"mood":{json.dumps(mood_resposta(mood))},"tipo":{json.dumps(tipo)},'
+                   f'"itens":[{itens}]}}\n')
     
-    def recomendar_tudo_com_variedade(self, mood: str, session_data: Dict = None) -> Dict:
-        """Recomenda tudo com histórico"""
-        session_data = session_data or {}
-        
-        historico_musicas = session_data.get('historico_musicas', [])
-        historico_filmes = session_data.get('historico_filmes', [])
-        historico_jogos = session_data.get('historico_jogos', [])
-        
-        musicas = self.recomendar_com_variedade(mood, 'musicas', 3, historico_musicas)
-        filmes = self.recomendar_com_variedade(mood, 'filmes', 3, historico_filmes)
-        jogos = self.recomendar_com_variedade(mood, 'jogos', 3, historico_jogos)
-        
-        historico_musicas.extend([m['id'] for m in musicas])
-        historico_filmes.extend([f['id'] for f in filmes])
-        historico_jogos.extend([j['id'] for j in jogos])
-        
-        session_data['historico_musicas'] = historico_musicas[-15:]
-        session_data['historico_filmes'] = historico_filmes[-15:]
-        session_data['historico_jogos'] = historico_jogos[-15:]
-        
-        return {
-            'mood': mood,
-            'musicas': musicas,
-            'filmes': filmes,
-            'jogos': jogos,
-            'session_data': session_data
-        }
+    def _recomendar_categorias(self, estado: EstadoCatalogo, mood: PesosMood, historicos: Dict[str, HistoricoCompacto],
+                               paralelo: bool, timeout: Optional[float], semente: Optional[int],
+                               perfil: Optional[PerfilMood] = None) -> Dict[str, Optional[List[Tuple[int, int]]]]:
+        """Uma seleção por categoria; None indica categoria que estourou o timeout"""
+        if not paralelo:
+            return {tipo: self._selecionar_categoria(estado, mood, tipo, 3, historico, _rng_categoria(semente, tipo),
+                                                     perfil)
+                    for tipo, historico in historicos.items()}
+
+        executor = _executor_categorias()
+        futuros = {tipo: executor.submit(self._selecionar_categoria, estado, mood, tipo, 3, historico,
+                                         _rng_categoria(semente, tipo), perfil)
+                   for tipo, historico in historicos.items()}
+        prazo = time.monotonic() + timeout if timeout else None
+        resultados = {}
+        for tipo, futuro in futuros.items():
+            try:
+                resultados[tipo] = futuro.result(None if prazo is None else max(0.0, prazo - time.monotonic()))
+            except FuturesTimeout:
+                resultados[tipo] = None
+        return resultados
+
+    def _preparar_historicos(self, estado: EstadoCatalogo, session_data: Dict,
+                             janela: int) -> Dict[str, HistoricoCompacto]:
+        return {tipo: _historico_compacto(session_data.get(f'historico_{tipo}'), janela)
+                for tipo in estado.categorias}
+
+    def _montar_resultado(self, estado: EstadoCatalogo, mood: PesosMood, session_data: Dict,
+                          historicos: Dict[str, HistoricoCompacto],
+                          resultados: Dict[str, Optional[List[Tuple[int, int]]]],
+                          campos: Optional[Tuple[str, ...]], fonte_link: Optional[str]) -> Dict:
+        """Junta as categorias na ordem fixa e atualiza o histórico e o perfil com as que responderam"""
+        resultado = {'mood': mood_resposta(mood)}
+        if campos is not None:
+            resultado['catalogo'] = estado.etag
+        incompletos = []
+        perfil = _perfil_sessao(session_data)
+        for tipo, historico in historicos.items():
+            selecionados = resultados[tipo]
+            if selecionados is None:
+                incompletos.append(tipo)
+                selecionados = []
+            historico.estender(item_id for _, item_id in selecionados)
+            session_data[f'historico_{tipo}'] = historico
+            self._registrar_exibidos(estado, perfil, tipo, selecionados)
+            if campos is None:
+                resultado[tipo] = [estado.payloads.resposta(tipo, item_id, score, fonte_link)
+                                   for score, item_id in selecionados]
+            else:
+                resultado[tipo] = self._lista_compacta(estado, tipo, selecionados, campos, fonte_link)
+        if incompletos:
+            resultado['incompletos'] = incompletos
+        resultado['session_data'] = session_data
+        return resultado
+
+    def recomendar_tudo_com_variedade(self, mood: Union[str, Mapping[str, float]], session_data: Dict = None,
+                                      janela: int = None, paralelo: bool = None,
+                                      timeout: Optional[float] = None, semente: Optional[int] = None,
+                                      campos: Optional[Tuple[str, ...]] = None,
+                                      fonte_link: Optional[str] = None) -> Dict:
+        """Recomenda tudo com histórico; a mesma `semente` reproduz o mesmo resultado
+
+        O perfil de moods da sessão (itens exibidos e clicados, em
+        session_data['perfil_mood']) puxa o sorteio das três categorias.
+        Com `campos` (mesmo vazio) as categorias saem no formato compacto, já em JSON.
+        `timeout` padrão é TIMEOUT_CATEGORIA; 0 espera todas as categorias sem limite.
+        `fonte_link` troca o link_url pelo de outra fonte (ex.: 'youtube').
+        """
+        mood = normalizar_mood(mood)
+        session_data = {} if session_data is None else session_data
+        janela = janela or JANELA_HISTORICO
+        paralelo = PARALELO_CATEGORIAS if paralelo is None else paralelo
+        timeout = TIMEOUT_CATEGORIA if timeout is None else timeout
 
+        # Todas as categorias usam a mesma versão do catálogo, mesmo se houver recarga no meio
+        estado = self._estado
+        historicos = self._preparar_historicos(estado, session_data, janela)
+        resultados = self._recomendar_categorias(estado, mood, historicos, paralelo, timeout, semente,
+                                                 session_data.get('perfil_mood'))
+        with metricas.etapa('serializacao'):
+            return self._montar_resultado(estado, mood, session_data, historicos, resultados, campos, fonte_link)
 
-recommender = MoodRecommenderWithMedia()
+
+def observar_catalogo(recommender: MoodRecommenderWithMedia, caminho: str,
+                      intervalo: float = 2.0) -> threading.Thread:
+    """Recarrega o catálogo quando o arquivo muda (mtime/tamanho), checando a cada `intervalo` s"""
+    def assinatura():
+        try:
+            info = os.stat(caminho)
+        except OSError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    def observar():
+        ultima = assinatura()
+        while True:
+            time.sleep(intervalo)
+            atual = assinatura()
+            if atual is None or atual == ultima:
+                continue
+            ultima = atual
+            try:
+                estado = recommender.recarregar_catalogo(caminho)
+                print(f"🔄 Catálogo recarregado: versão {estado.versao} em {estado.duracao_carga * 1000:.1f} ms")
+            except Exception as e:
+                # Arquivo inválido: segue servindo a versão anterior
+                print(f"Erro ao recarregar catálogo: {e}")
+
+    thread = threading.Thread(target=observar, name='observador-catalogo', daemon=True)
+    thread.start()
+    return thread
+
+
+recommender = MoodRecommenderWithMedia(os.environ.get('MOOD_CATALOGO'))
+historicos = criar_armazem(os.environ.get('MOOD_HISTORICO'))
+# Sem MOOD_EVENTOS os eventos só ajustam o perfil da sessão e não são gravados
+fila_eventos = criar_fila(os.environ.get('MOOD_EVENTOS'))
+ADMIN_TOKEN = os.environ.get('MOOD_ADMIN_TOKEN', '')
+if os.environ.get('MOOD_CATALOGO') and os.environ.get('MOOD_CATALOGO_OBSERVAR'):
+    observar_catalogo(recommender, os.environ['MOOD_CATALOGO'], float(os.environ['MOOD_CATALOGO_OBSERVAR']))
+
+
+def _sessao_id() -> str:
+    """Id opaco da sessão; é a única coisa guardada no cookie"""
+    sid = session.get('sid')
+    if not sid:
+        sid = session['sid'] = secrets.token_urlsafe(16)
+    return sid
 
 # Rotas (mesmas do anterior)
 @app.route('/')
 def index():
     return render_template('index.html', moods=Mood)
 
+def _validar_mood(valor) -> Tuple[Optional[str], Optional[PesosMood]]:
+    """(erro, mood): um nome de MOODS ou um vetor de pesos, ex.: {"ansioso": 0.6, "relaxado": 0.4}"""
+    if isinstance(valor, dict):
+        try:
+            return None, normalizar_mood(valor)
+        except (ValueError, AttributeError):
+            return 'Pesos de mood inválidos', None
+    if not isinstance(valor, str):
+        return 'Mood inválido', None
+    mood = valor.lower()
+    if not mood:
+        return 'Mood não especificado', None
+    if mood not in MOODS:
+        return 'Mood inválido', None
+    return None, mood
+
+def _validar_formato(data: Dict) -> Tuple[Optional[str], Optional[Tuple[str, ...]], Optional[str]]:
+    """(erro, campos, fonte_link); campos é None no formato completo"""
+    formato = data.get('formato', 'completo')
+    if formato not in ('completo', 'compacto'):
+        return 'Formato inválido', None, None
+    campos = None
+    if formato == 'compacto':
+        pedidos = data.get('campos') or []
+        if not isinstance(pedidos, list) or not all(isinstance(c, str) and c in CAMPOS_ITEM for c in pedidos):
+            return 'Campos inválidos', None, None
+        campos = tuple(sorted(set(pedidos)))
+    fonte_link = data.get('fonte_link')
+    if fonte_link is not None and fonte_link not in FONTES_LINK:
+        return 'Fonte de link inválida', None, None
+    return None, campos, fonte_link
+
+def _texto_mood(mood: PesosMood) -> str:
+    return mood if isinstance(mood, str) else codificar_json(dict(mood))
+
+# Cursores de paginação: assinados e presos à sessão, mas sem estado no servidor
+_cursores = URLSafeSerializer(app.secret_key, salt='cursor-recomendacao')
+
+def _cursor(sid: str, mood: PesosMood, tipo: str, catalogo: str, semente: int,
+            posicao: Optional[int]) -> Optional[str]:
+    if posicao is None:
+        return None
+    return _cursores.dumps([sid, mood, tipo, catalogo, semente, posicao])
+
+def processar_recomendacao(data: Optional[Dict], sid: str) -> Tuple[object, int]:
+    """Valida o pedido e recomenda; compartilhado pelos modos WSGI e ASGI"""
+    if not data or not isinstance(data, dict):
+        return {'erro': 'Nenhum dado enviado'}, 400
+    
+    tipo = data.get('tipo', 'tudo')
+    if not isinstance(tipo, str):
+        return {'erro': 'Tipo inválido'}, 400
+    erro, mood = _validar_mood(data.get('mood', ''))
+    if erro:
+        return {'erro': erro}, 400
+    erro, campos, fonte_link = _validar_formato(data)
+    if erro:
+        return {'erro': erro}, 400
+    
+    metricas.contar_requisicao(mood if isinstance(mood, str) else 'combinado',
+                               tipo if tipo == 'tudo' or tipo in recommender.categorias else 'outro',
+                               'completo' if campos is None else 'compacto')
+    with metricas.etapa('sessao_carregar'):
+        session_data = historicos.carregar(sid)
+    contador = session_data.get('contador', 0) + 1
+    session_data['contador'] = contador
+    semente = semente_requisicao(sid, _texto_mood(mood), contador)
+    if tipo == 'tudo':
+        resultado = recommender.recomendar_tudo_com_variedade(mood, session_data, semente=semente, campos=campos,
+                                                              fonte_link=fonte_link)
+        session_data = resultado.pop('session_data')
+    elif campos is not None:
+        historico = session_data.get(f'historico_{tipo}', [])
+        resultado = recommender.recomendar_compacto(mood, tipo, 3, historico, random.Random(semente), campos,
+                                                    fonte_link, _perfil_sessao(session_data))
+    else:
+        historico = session_data.get(f'historico_{tipo}', [])
+        resultado = recommender.recomendar_com_variedade(mood, tipo, 3, historico, random.Random(semente),
+                                                         fonte_link, _perfil_sessao(session_data))
+    with metricas.etapa('sessao_salvar'):
+        historicos.salvar(sid, session_data)
+
+    if data.get('paginar') and isinstance(resultado, dict):
+        # Um cursor por categoria para /api/recomendar/mais; os itens já vistos estão no histórico
+        catalogo = resultado.get('catalogo') or recommender.estado.etag
+        resultado['cursores'] = {t: _cursor(sid, mood, t, catalogo, semente, 0)
+                                 for t in recommender.categorias if t in resultado}
+
+    if campos is not None:
+        # Itens já vêm como fragmentos JSON; só as chaves externas são codificadas
+        with metricas.etapa('json'):
+            return JSONBruto(codificar_json(resultado)), 200
+    return resultado, 200
+
+def processar_pagina(data: Optional[Dict], sid: str) -> Tuple[object, int]:
+    """Página seguinte de um cursor, ou a primeira para {mood, tipo}; só lê o histórico"""
+    if not data or not isinstance(data, dict):
+        return {'erro': 'Nenhum dado enviado'}, 400
+    erro, campos, fonte_link = _validar_formato(data)
+    if erro:
+        return {'erro': erro}, 400
+    try:
+        limite = int(data.get('limite', 3))
+    except (TypeError, ValueError):
+        return {'erro': 'Limite inválido'}, 400
+    if not 1 <= limite <= LIMITE_ITENS_PEDIDO:
+        return {'erro': f'Limite deve ficar entre 1 e {LIMITE_ITENS_PEDIDO}'}, 400
+
+    if data.get('cursor'):
+        try:
+            dono, mood, tipo, catalogo, semente, posicao = _cursores.loads(data['cursor'])
+        except (BadSignature, TypeError, ValueError):
+            return {'erro': 'Cursor inválido'}, 400
+        if dono != sid:
+            return {'erro': 'Cursor inválido'}, 400
+        if not isinstance(mood, str):
+            mood = tuple((nome, partes) for nome, partes in mood)
+        with metricas.etapa('sessao_carregar'):
+            session_data = historicos.carregar(sid)
+    else:
+        erro, mood = _validar_mood(data.get('mood', ''))
+        if erro:
+            return {'erro': erro}, 400
+        tipo = data.get('tipo')
+        if not isinstance(tipo, str) or tipo not in recommender.categorias:
+            return {'erro': 'Tipo inválido'}, 400
+        catalogo, posicao = None, 0
+        with metricas.etapa('sessao_carregar'):
+            session_data = historicos.carregar(sid)
+        contador = session_data.get('contador', 0) + 1
+        session_data['contador'] = contador
+        semente = semente_requisicao(sid, _texto_mood(mood), contador)
+        with metricas.etapa('sessao_salvar'):
+            historicos.salvar(sid, session_data)
+
+    try:
+        resultado = recommender.recomendar_pagina(mood, tipo, semente, posicao, limite,
+                                                  session_data.get(f'historico_{tipo}'), catalogo, campos,
+                                                  fonte_link)
+    except CursorExpirado:
+        return {'erro': 'Cursor expirado: o catálogo mudou'}, 410
+    resultado['cursor'] = _cursor(sid, mood, tipo, resultado['catalogo'], semente, resultado.pop('posicao'))
+
+    if campos is not None:
+        with metricas.etapa('json'):
+            return JSONBruto(codificar_json(resultado)), 200
+    return resultado, 200
+
+LIMITE_EVENTOS = 100
+
+def _sessao_anonima(sid: str) -> str:
+    """Id estável da sessão para os logs, sem gravar o sid"""
+    return hashlib.blake2b(sid.encode('utf-8'), digest_size=8, key=app.secret_key.encode('utf-8')[:64]).hexdigest()
+
+def processar_eventos(data: Optional[Dict], sid: str) -> Tuple[object, int]:
+    """Impressões e cliques do cliente: vão para a fila de gravação e os cliques, para o perfil da sessão"""
+    if not isinstance(data, dict) or not isinstance(data.get('eventos'), list):
+        return {'erro': 'Lista de eventos não enviada'}, 400
+    if len(data['eventos']) > LIMITE_EVENTOS:
+        return {'erro': f'Máximo de {LIMITE_EVENTOS} eventos por envio'}, 400
+
+    estado = recommender.estado
+    agora = time.time()
+    sessao = _sessao_anonima(sid)
+    registros, cliques = [], []
+    for i, evento in enumerate(data['eventos']):
+        if not isinstance(evento, dict) or evento.get('evento') not in TIPOS_EVENTO:
+            return {'erro': f'Evento {i} inválido'}, 400
+        tipo, item_id, posicao = evento.get('tipo'), evento.get('id'), evento.get('posicao')
+        if not isinstance(tipo, str) or tipo not in estado.categorias:
+            return {'erro': f'Tipo inválido no evento {i}'}, 400
+        if isinstance(item_id, bool) or not isinstance(item_id, int):
+            return {'erro': f'Id inválido no evento {i}'}, 400
+        if posicao is not None and (isinstance(posicao, bool) or not isinstance(posicao, int) or posicao < 0):
+            return {'erro': f'Posição inválida no evento {i}'}, 400
+        mood = None
+        if evento.get('mood') is not None:
+            erro, mood = _validar_mood(evento['mood'])
+            if erro:
+                return {'erro': f'{erro} no evento {i}'}, 400
+        if not estado.indice.contem(tipo, item_id):
+            continue  # item saiu do catálogo depois de exibido
+        registros.append({'ts': agora, 'sessao': sessao, 'evento': evento['evento'], 'tipo': tipo,
+                          'item': item_id, 'mood': None if mood is None else _texto_mood(mood),
+                          'posicao': posicao})
+        if evento['evento'] == 'clique':
+            cliques.append((tipo, item_id))
+
+    if cliques:
+        with metricas.etapa('sessao_carregar'):
+            session_data = historicos.carregar(sid)
+        perfil = _perfil_sessao(session_data)
+        for tipo, item_id in cliques:
+            recommender.registrar_clique(perfil, tipo, item_id)
+        with metricas.etapa('sessao_salvar'):
+            historicos.salvar(sid, session_data)
+    aceitos = fila_eventos.publicar(registros) if fila_eventos is not None else 0
+    return {'aceitos': aceitos}, 202
+
+def dados_moods() -> List[Dict]:
+    return [{'id': m.name.lower(), 'nome': m.value, 'emoji': m.value.split()[0]} for m in Mood]
+
+def dados_health() -> Dict:
+    estado = recommender.estado
+    return {
+        'status': 'ok',
+        'musicas': len(estado.categorias.get('musicas', [])),
+        'filmes': len(estado.categorias.get('filmes', [])),
+        'jogos': len(estado.categorias.get('jogos', [])),
+        'versao': 'com_imagens_e_links',
+        'catalogo': estado.info(),
+        'cache': recommender.cache_buckets.estatisticas()
+    }
+
+def texto_metricas() -> str:
+    """Métricas no formato do Prometheus, com o estado do catálogo, do cache de buckets e da fila de eventos"""
+    cache = recommender.cache_buckets.estatisticas()
+    extras = {
+        'mood_catalogo_versao': ('gauge', 'Versão do catálogo publicada', recommender.versao_catalogo),
+        'mood_cache_buckets_entradas': ('gauge', 'Entradas no cache de buckets combinados', cache['entradas']),
+        'mood_cache_buckets_acertos_total': ('counter', 'Acertos no cache de buckets combinados', cache['acertos']),
+        'mood_cache_buckets_falhas_total': ('counter', 'Falhas no cache de buckets combinados', cache['falhas']),
+        'mood_cache_buckets_remocoes_total': ('counter', 'Remoções do cache de buckets combinados', cache['remocoes']),
+    }
+    if fila_eventos is not None:
+        fila = fila_eventos.estatisticas()
+        extras.update({
+            'mood_eventos_pendentes': ('gauge', 'Eventos na fila aguardando gravação', fila['pendentes']),
+            'mood_eventos_recebidos_total': ('counter', 'Eventos aceitos na fila', fila['recebidos']),
+            'mood_eventos_descartados_total': ('counter', 'Eventos descartados com a fila cheia', fila['descartados']),
+            'mood_eventos_gravados_total': ('counter', 'Eventos gravados no destino', fila['gravados']),
+            'mood_eventos_falhas_total': ('counter', 'Eventos perdidos em falhas de gravação', fila['falhas']),
+        })
+    return metricas.prometheus(extras)
+
 @app.route('/api/recomendar', methods=['POST'])
 def api_recomendar():
+    perfil = amostrador_pedido(request.headers.get('X-Mood-Perfil'))
     try:
-        if 'session_data' not in session:
-            session['session_data'] = {}
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'erro': 'Nenhum dado enviado'}), 400
-        
-        mood = data.get('mood', '').lower()
-        tipo = data.get('tipo', 'tudo')
-        
-        if not mood:
-            return jsonify({'erro': 'Mood não especificado'}), 400
-        
-        moods_validos = ['feliz', 'triste', 'relaxado', 'energizado', 'ansioso', 'pensativo']
-        if mood not in moods_validos:
-            return jsonify({'erro': 'Mood inválido'}), 400
-        
-        if tipo == 'tudo':
-            resultado = recommender.recomendar_tudo_com_variedade(mood, session['session_data'])
-            session['session_data'] = resultado.pop('session_data')
-        else:
-            historico = session['session_data'].get(f'historico_{tipo}', [])
-            resultado = recommender.recomendar_com_variedade(mood, tipo, 3, historico)
-        
-        return jsonify(resultado)
+        with metricas.etapa('requisicao'), perfil:
+            corpo, status = processar_recomendacao(request.get_json(), _sessao_id())
+            if isinstance(corpo, JSONBruto):
+                resposta = Response(corpo, status, mimetype='application/json')
+            else:
+                with metricas.etapa('json'):
+                    resposta = jsonify(corpo)
+                resposta.status_code = status
         
     except Exception as e:
+        metricas.contar_erro('/api/recomendar', 500)
         print(f"Erro: {e}")
         print(traceback.format_exc())
         return jsonify({'erro': 'Erro interno', 'mensagem': str(e)}), 500
 
+    if status >= 400:
+        metricas.contar_erro('/api/recomendar', status)
+    if isinstance(perfil, AmostradorPilhas):
+        resposta.headers['X-Mood-Perfil'] = gravar_perfil(perfil, '/api/recomendar')
+    return resposta
+
+@app.route('/api/recomendar/mais', methods=['POST'])
+def api_recomendar_mais():
+    """Carregar mais: próxima página de uma categoria a partir do cursor"""
+    try:
+        corpo, status = processar_pagina(request.get_json(silent=True), _sessao_id())
+    except Exception:
+        metricas.contar_erro('/api/recomendar/mais', 500)
+        app.logger.exception('Erro em /api/recomendar/mais')
+        return jsonify({'erro': 'Erro interno'}), 500
+    if status >= 400:
+        metricas.contar_erro('/api/recomendar/mais', status)
+    if isinstance(corpo, JSONBruto):
+        return Response(corpo, status, mimetype='application/json')
+    return jsonify(corpo), status
+
+@app.route('/api/eventos', methods=['POST'])
+def api_eventos():
+    """Impressões e cliques em lote; aceita o corpo do sendBeacon mesmo sem Content-Type JSON"""
+    corpo, status = processar_eventos(request.get_json(force=True, silent=True), _sessao_id())
+    if status >= 400:
+        metricas.contar_erro('/api/eventos', status)
+    return jsonify(corpo), status
+
+LIMITE_LOTE = 1000
+LIMITE_ITENS_PEDIDO = 50
+
+@app.route('/api/recomendar-lote', methods=['POST'])
+def api_recomendar_lote():
+    """Vários pedidos em uma chamada; resposta em NDJSON, uma linha por pedido"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('pedidos'), list):
+        return jsonify({'erro': 'Lista de pedidos não enviada'}), 400
+
+    pedidos = data['pedidos']
+    if len(pedidos) > LIMITE_LOTE:
+        return jsonify({'erro': f'Máximo de {LIMITE_LOTE} pedidos por lote'}), 400
+
+    sid = _sessao_id()
+    contador = None
+    tuplas = []
+    for i, pedido in enumerate(pedidos):
+        if not isinstance(pedido, dict):
+            return jsonify({'erro': f'Pedido {i} inválido'}), 400
+        erro, mood = _validar_mood(pedido.get('mood', ''))
+        if erro:
+            return jsonify({'erro': f'{erro} no pedido {i}'}), 400
+        tipo = pedido.get('tipo', 'musicas')
+        if not isinstance(tipo, str) or tipo not in recommender.categorias:
+            return jsonify({'erro': f'Tipo inválido no pedido {i}'}), 400
+        try:
+            limite = int(pedido.get('limite', 3))
+        except (TypeError, ValueError):
+            return jsonify({'erro': f'Limite inválido no pedido {i}'}), 400
+        historico = pedido.get('historico') or []
+        if not isinstance(historico, list) or any(isinstance(item_id, bool) or not isinstance(item_id, int)
+                                                  for item_id in historico):
+            return jsonify({'erro': f'Histórico deve ser uma lista de ids no pedido {i}'}), 400
+        if not 1 <= limite <= LIMITE_ITENS_PEDIDO:
+            return jsonify({'erro': f'Limite deve ficar entre 1 e {LIMITE_ITENS_PEDIDO} no pedido {i}'}), 400
+        semente = pedido.get('semente')
+        if semente is not None and (isinstance(semente, bool) or not isinstance(semente, int) or semente < 0):
+            return jsonify({'erro': f'Semente inválida no pedido {i}'}), 400
+        if semente is None:
+            # Como em /api/recomendar: (sessão, mood, contador), com o índice do pedido no lote
+            if contador is None:
+                session_data = historicos.carregar(sid)
+                contador = session_data['contador'] = session_data.get('contador', 0) + 1
+                historicos.salvar(sid, session_data)
+            semente = semente_requisicao(sid, f'{_texto_mood(mood)}|{i}', contador)
+        tuplas.append((mood, tipo, limite, historico, semente))
+
+    return Response(recommender.recomendar_lote_ndjson(tuplas), mimetype='application/x-ndjson')
+
+@app.route('/api/catalogo/<tipo>')
+def api_catalogo(tipo):
+    """Itens da categoria por id, para o formato compacto; cacheável até a próxima versão"""
+    estado = recommender.estado
+    if tipo not in estado.categorias:
+        return jsonify({'erro': 'Tipo inválido'}), 404
+    campos = None
+    if request.args.get('campos'):
+        campos = tuple(sorted(set(request.args['campos'].split(','))))
+        if not set(campos) <= CAMPOS_ITEM:
+            return jsonify({'erro': 'Campos inválidos'}), 400
+    fonte = request.args.get('fonte_link') or None
+    if fonte is not None and fonte not in FONTES_LINK:
+        return jsonify({'erro': 'Fonte de link inválida'}), 400
+    itens = estado.payloads.json_catalogo(tipo, campos, fonte)
+    corpo = f'{{"catalogo":"{estado.etag}","tipo":{json.dumps(tipo)},"itens":{itens}}}'
+    resposta = Response(corpo, mimetype='application/json')
+    resposta.set_etag(f'{estado.etag}-{tipo}-{".".join(campos or ("*",))}-{fonte or ""}')
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = 300
+    return resposta.make_conditional(request)
+
+@app.route('/api/similares/<tipo>/<int:item_id>')
+def api_similares(tipo, item_id):
+    """Mais como este: vizinhos do item por moods, gênero e autor; cacheável até a próxima versão"""
+    try:
+        limite = int(request.args.get('limite', 5))
+    except ValueError:
+        return jsonify({'erro': 'Limite inválido'}), 400
+    if not 1 <= limite <= N_VIZINHOS:
+        return jsonify({'erro': f'Limite deve estar entre 1 e {N_VIZINHOS}'}), 400
+    fonte = request.args.get('fonte_link') or None
+    if fonte is not None and fonte not in FONTES_LINK:
+        return jsonify({'erro': 'Fonte de link inválida'}), 400
+    corpo = recommender.similares(tipo, item_id, limite, fonte)
+    if corpo is None:
+        metricas.contar_erro('/api/similares', 404)
+        return jsonify({'erro': 'Item não encontrado'}), 404
+    resposta = jsonify(corpo)
+    resposta.set_etag(f'{corpo["catalogo"]}-sim-{tipo}-{item_id}-{limite}-{fonte or ""}')
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = 300
+    return resposta.make_conditional(request)
+
 @app.route('/api/moods')
 def api_moods():
     try:
-        moods = [{'id': m.name.lower(), 'nome': m.value, 'emoji': m.value.split()[0]} for m in Mood]
-        return jsonify(moods)
+        return jsonify(dados_moods())
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 @app.route('/health')
 def health():
-    return jsonify({
-        'status': 'ok',
-        'musicas': len(recommender.musicas),
-        'filmes': len(recommender.filmes),
-        'jogos': len(recommender.jogos),
-        'versao': 'com_imagens_e_links'
-    })
+    return jsonify(dados_health())
+
+@app.route('/metrics')
+def metrics():
+    """Exposição para o Prometheus; só existe com MOOD_METRICAS=1"""
+    if not metricas.ativo:
+        return jsonify({'erro': 'Rota não encontrada'}), 404
+    return Response(texto_metricas(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/recarregar', methods=['POST'])
+def admin_recarregar():
+    """Recarrega o catálogo em segundo plano; exige o cabeçalho X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        return jsonify({'erro': 'Rota não encontrada'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'erro': 'Não autorizado'}), 403
+    recommender.recarregar_em_segundo_plano()
+    return jsonify({'sucesso': True, 'versao_atual': recommender.versao_catalogo}), 202
 
 @app.route('/api/limpar-historico', methods=['POST'])
 def limpar_historico():
-    session['session_data'] = {}
+    historicos.remover(_sessao_id())
     return jsonify({'sucesso': True, 'mensagem': 'Histórico limpo'})
 
 if __name__ == '__main__':
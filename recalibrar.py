@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Recalibração offline dos mood_scores a partir dos eventos registrados
+
+Lê as impressões e cliques gravados por eventos.py, agrega por
+(categoria, item, mood) e grava um novo arquivo de catálogo, com versão
+nova, para o servidor carregar com MOOD_CATALOGO (ou pegar sozinho com
+MOOD_CATALOGO_OBSERVAR).
+
+Agregação: os arquivos JSONL são divididos em blocos de TAMANHO_BLOCO bytes
+e a tabela do SQLite, em faixas de rowid; cada bloco é lido em streaming
+num processo do pool e devolve só as somas por chave. A memória depende do
+número de pares (item, mood) vistos, não do tamanho dos logs. Impressões
+contam com o desconto de posição 1/log2(posição + 2) (um card no fim da
+lista é menos visto) e eventos com humores combinados são divididos pelos
+pesos.
+
+Recalibração, por categoria e mood:
+
+    taxa   = (cliques + PRIOR · taxa_base) / (exposição + PRIOR)
+    ajuste = ESCALA_AJUSTE · log2(taxa / taxa_base), limitado a ±AJUSTE_MAXIMO
+    novo   = score + ajuste, arredondado, entre 1 e 10
+
+Só scores existentes mudam: um item nunca exibido para um mood não tem
+evidência para ganhar score nele.
+
+    python recalibrar.py eventos/ catalogo-novo.bin --catalogo catalogo.bin
+    python recalibrar.py sqlite:///eventos.db catalogo-novo.bin
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from catalogo import SCORE_MAXIMO, ArquivoCatalogo, EscritorCatalogo
+from eventos import TIPOS_EVENTO
+
+TAMANHO_BLOCO = 64 << 20
+LINHAS_BLOCO_SQLITE = 1_000_000
+
+# Impressões "virtuais" na taxa de cliques da categoria, para itens com pouco tráfego
+PRIOR = 100.0
+# Dobrar a taxa de cliques em relação à categoria vale +2 no score
+ESCALA_AJUSTE = 2.0
+AJUSTE_MAXIMO = 2
+
+# (categoria, item, mood) -> [exposição, cliques]
+Contagem = Dict[Tuple[str, int, str], List[float]]
+
+
+def _exame(posicao: Optional[int]) -> float:
+    return 1.0 if posicao is None else 1.0 / math.log2(posicao + 2)
+
+
+def _inteiro(valor) -> bool:
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _peso_valido(peso) -> bool:
+    return (isinstance(peso, (int, float)) and not isinstance(peso, bool)
+            and 0 <= peso <= sys.float_info.max)
+
+
+class _Agregador:
+    """Somas de exposição e cliques por (categoria, item, mood) de um bloco"""
+
+    def __init__(self):
+        self.contagem: Contagem = {}
+        self.linhas = 0
+        self.invalidas = 0
+        self.sem_mood = 0
+        self._moods: Dict[str, List[Tuple[str, float]]] = {}
+
+    def _pesos(self, mood: str) -> List[Tuple[str, float]]:
+        """Pesos do mood somando 1; ValueError se o JSON dos combinados não for um vetor válido"""
+        pesos = self._moods.get(mood)
+        if pesos is None:
+            if mood.startswith('{'):
+                partes = json.loads(mood)
+                if not isinstance(partes, dict) or not all(_peso_valido(parte) for parte in partes.values()):
+                    raise ValueError(f'pesos inválidos: {mood}')
+                total = sum(partes.values())
+                if not 0 < total < math.inf:
+                    raise ValueError(f'soma dos pesos inválida: {mood}')
+                pesos = [(nome, parte / total) for nome, parte in partes.items()]
+            else:
+                pesos = [(mood, 1.0)]
+            self._moods[mood] = pesos
+        return pesos
+
+    def adicionar(self, evento: str, tipo: str, item: int, mood: Optional[str],
+                  posicao: Optional[int], vezes: int = 1):
+        """Soma `vezes` eventos iguais; com algum campo fora do formato, contam como inválidos"""
+        if (evento not in TIPOS_EVENTO or not isinstance(tipo, str) or not _inteiro(item)
+                or not (mood is None or isinstance(mood, str))
+                or not (posicao is None or _inteiro(posicao) and posicao >= 0)):
+            self.invalidas += vezes
+            return
+        try:
+            pesos = self._pesos(mood) if mood else None
+        except ValueError:
+            self.invalidas += vezes
+            return
+        self.linhas += vezes
+        if pesos is None:
+            self.sem_mood += vezes
+            return
+        clique = evento == 'clique'
+        valor = vezes if clique else vezes * _exame(posicao)
+        contagem = self.contagem
+        for nome, peso in pesos:
+            chave = (tipo, item, nome)
+            somas = contagem.get(chave)
+            if somas is None:
+                somas = contagem[chave] = [0.0, 0.0]
+            somas[clique] += peso * valor
+
+    def resultado(self) -> Tuple[Contagem, int, int, int]:
+        return self.contagem, self.linhas, self.invalidas, self.sem_mood
+
+
+def _agregar_bloco(caminho: str, inicio: int, fim: int) -> Tuple[Contagem, int, int, int]:
+    """Agrega as linhas que começam em [inicio, fim) de um arquivo JSONL"""
+    agregador = _Agregador()
+    # Como no GROUP BY do SQLite: linhas iguais são contadas antes de aplicar pesos e descontos
+    grupos: Dict[Tuple, int] = {}
+    loads = json.loads
+    with open(caminho, 'rb') as arquivo:
+        if inicio:
+            # A linha que cruza `inicio` pertence ao bloco anterior
+            arquivo.seek(inicio - 1)
+            arquivo.readline()
+        posicao = arquivo.tell()
+        while posicao < fim:
+            linha = arquivo.readline()
+            if not linha:
+                break
+            posicao += len(linha)
+            try:
+                evento = loads(linha)
+                chave = (evento['evento'], evento['tipo'], evento['item'], evento.get('mood'), evento.get('posicao'))
+                grupos[chave] = grupos.get(chave, 0) + 1
+            except (ValueError, KeyError, TypeError):
+                # Linha truncada por um processo que morreu no meio da gravação
+                agregador.invalidas += 1
+    for chave, vezes in grupos.items():
+        agregador.adicionar(*chave, vezes)
+    return agregador.resultado()
+
+
+def _agregar_faixa_sqlite(caminho: str, inicio: int, fim: int) -> Tuple[Contagem, int, int, int]:
+    """Agrega as linhas com rowid em [inicio, fim); o GROUP BY fica com o SQLite"""
+    agregador = _Agregador()
+    conexao = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+    try:
+        cursor = conexao.execute(
+            'SELECT evento, tipo, item, mood, posicao, COUNT(*) FROM eventos '
+            'WHERE rowid >= ? AND rowid < ? GROUP BY evento, tipo, item, mood, posicao',
+            (inicio, fim)
+        )
+        for evento, tipo, item, mood, posicao, vezes in cursor:
+            agregador.adicionar(evento, tipo, item, mood, posicao, vezes)
+    finally:
+        conexao.close()
+    return agregador.resultado()
+
+
+def tarefas(entradas: Iterable[str], tamanho_bloco: int = TAMANHO_BLOCO) -> List[Tuple]:
+    """(função, caminho, início, fim) de cada bloco das entradas: diretórios, arquivos ou sqlite:///"""
+    resultado = []
+    for entrada in entradas:
+        if entrada.startswith('sqlite:///'):
+            caminho = entrada[len('sqlite:///'):]
+            conexao = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+            try:
+                minimo, maximo = conexao.execute('SELECT MIN(rowid), MAX(rowid) FROM eventos').fetchone()
+            finally:
+                conexao.close()
+            if minimo is None:
+                continue
+            for inicio in range(minimo, maximo + 1, LINHAS_BLOCO_SQLITE):
+                resultado.append((_agregar_faixa_sqlite, caminho, inicio, inicio + LINHAS_BLOCO_SQLITE))
+            continue
+        if os.path.isdir(entrada):
+            arquivos = sorted(glob.glob(os.path.join(entrada, 'eventos-*.jsonl')))
+        else:
+            arquivos = [entrada]
+        for caminho in arquivos:
+            tamanho = os.path.getsize(caminho)
+            for inicio in range(0, tamanho, tamanho_bloco):
+                resultado.append((_agregar_bloco, caminho, inicio, min(inicio + tamanho_bloco, tamanho)))
+    return resultado
+
+
+def agregar(entradas: Iterable[str], processos: Optional[int] = None) -> Tuple[Contagem, Dict[str, int]]:
+    """Soma os blocos num pool de processos; devolve a contagem e totais de linhas"""
+    contagem: Contagem = {}
+    totais = {'blocos': 0, 'linhas': 0, 'invalidas': 0, 'sem_mood': 0}
+    lista = tarefas(entradas)
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = [executor.submit(funcao, caminho, inicio, fim) for funcao, caminho, inicio, fim in lista]
+        for futuro in as_completed(futuros):
+            parcial, linhas, invalidas, sem_mood = futuro.result()
+            for chave, (exposicao, cliques) in parcial.items():
+                somas = contagem.get(chave)
+                if somas is None:
+                    contagem[chave] = [exposicao, cliques]
+                else:
+                    somas[0] += exposicao
+                    somas[1] += cliques
+            totais['blocos'] += 1
+            totais['linhas'] += linhas
+            totais['invalidas'] += invalidas
+            totais['sem_mood'] += sem_mood
+    return contagem, totais
+
+
+def taxas_base(contagem: Contagem) -> Dict[Tuple[str, str], float]:
+    """Taxa de cliques por exposição de cada (categoria, mood)"""
+    somas: Dict[Tuple[str, str], List[float]] = {}
+    for (tipo, _, mood), (exposicao, cliques) in contagem.items():
+        total = somas.setdefault((tipo, mood), [0.0, 0.0])
+        total[0] += exposicao
+        total[1] += cliques
+    return {chave: cliques / exposicao for chave, (exposicao, cliques) in somas.items() if exposicao and cliques}
+
+
+def recalibrar_score(score: int, exposicao: float, cliques: float, taxa_base: float) -> int:
+    taxa = (cliques + PRIOR * taxa_base) / (exposicao + PRIOR)
+    ajuste = max(-AJUSTE_MAXIMO, min(AJUSTE_MAXIMO, ESCALA_AJUSTE * math.log2(taxa / taxa_base)))
+    return max(1, min(SCORE_MAXIMO, round(score + ajuste)))
+
+
+def recalibrar(categorias: Dict[str, Iterable], contagem: Contagem, caminho: str, moods: List[str],
+               versao: Optional[str] = None) -> Dict[str, int]:
+    """Grava o catálogo com os scores recalibrados, item a item; devolve quantos itens mudaram por categoria"""
+    bases = taxas_base(contagem)
+    alterados = {}
+    with EscritorCatalogo(caminho, moods, versao) as escritor:
+        for tipo, itens in categorias.items():
+            alterados[tipo] = 0
+            for item in itens:
+                scores = dict(item.mood_scores.items())
+                novos = {}
+                for mood, score in scores.items():
+                    somas = contagem.get((tipo, item.id, mood))
+                    base = bases.get((tipo, mood))
+                    novos[mood] = score if somas is None or base is None else recalibrar_score(score, *somas, base)
+                if novos != scores:
+                    item = replace(item, mood_scores=novos)
+                    alterados[tipo] += 1
+                escritor.adicionar(tipo, item)
+    return alterados
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entradas', nargs='+',
+                        help='diretórios ou arquivos eventos-*.jsonl, ou sqlite:///caminho (o último é a saída)')
+    parser.add_argument('--catalogo', help='catálogo em disco de origem (padrão: catálogo embutido)')
+    parser.add_argument('--versao', help='versão do catálogo gerado (padrão: data e hora)')
+    parser.add_argument('--processos', type=int, help='processos do pool (padrão: um por núcleo)')
+    args = parser.parse_args(argv)
+    if len(args.entradas) < 2:
+        parser.error('informe ao menos uma entrada de eventos e o arquivo de saída')
+    *entradas, saida = args.entradas
+
+    inicio = time.perf_counter()
+    contagem, totais = agregar(entradas, args.processos)
+    print(f"📥 {totais['linhas']} eventos em {totais['blocos']} blocos "
+          f"({totais['invalidas']} linhas inválidas, {totais['sem_mood']} sem mood) "
+          f"em {time.perf_counter() - inicio:.1f}s")
+
+    from mood_recommender import CLASSES_CONTEUDO, MOODS
+    if args.catalogo:
+        arquivo = ArquivoCatalogo(args.catalogo, CLASSES_CONTEUDO)
+        categorias, moods = arquivo.categorias, arquivo.moods
+    else:
+        from mood_recommender import MoodRecommenderWithMedia
+        categorias, moods = MoodRecommenderWithMedia().categorias, MOODS
+    alterados = recalibrar(categorias, contagem, saida, moods, args.versao)
+    for tipo, total in alterados.items():
+        print(f"  {tipo}: {total} de {len(categorias[tipo])} itens recalibrados")
+    print(f"✅ Catálogo recalibrado em {saida} ({time.perf_counter() - inicio:.1f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
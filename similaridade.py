@@ -0,0 +1,150 @@
+"""
+Índice de similaridade entre itens ("mais como este")
+
+A similaridade combina o cosseno dos vetores de mood com atributos
+categóricos (gênero e autor/diretor/plataforma):
+
+    sim = PESO_MOOD · cos(moods) + PESO_GENERO · [mesmo gênero] + PESO_AUTOR · [mesmo autor]
+
+Comparar todos os pares é O(n²); os candidatos de cada item vêm de uma
+janela em quatro blocos (mesmo gênero, mesmo autor, mesmos dois moods
+dominantes e o catálogo todo), cada bloco ordenado pelo vetor de moods; o
+bloco global garante vizinhos aos itens sem par nos outros três. Os N
+vizinhos de um item são calculados na primeira consulta e guardados em
+arrays de tamanho fixo (N por item); `construir()` calcula todos de uma vez.
+"""
+
+import heapq
+import math
+from array import array
+from operator import mul
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PESO_MOOD = 0.6
+PESO_GENERO = 0.25
+PESO_AUTOR = 0.15
+
+N_VIZINHOS = 10
+# Itens de cada lado da posição do item, em cada bloco
+JANELA_BLOCO = 32
+# Gênero, autor, moods dominantes e o bloco global com todos os itens
+TIPOS_BLOCO = 'gamt'
+
+
+class IndiceSimilaridade:
+    """Top-N vizinhos por item, sob demanda, sobre vetores de mood e atributos categóricos"""
+
+    def __init__(self, itens: Iterable, atributos: Tuple[str, str], n_vizinhos: int = N_VIZINHOS,
+                 janela: int = JANELA_BLOCO):
+        self.n_vizinhos = n_vizinhos
+        self.janela = janela
+        atributo_genero, atributo_autor = atributos
+        codigos: Dict[Tuple[str, object], int] = {}
+
+        self._ids = array('q')
+        self._vetores: List[bytes] = []
+        self._normas = array('d')
+        self._generos = array('i')
+        self._autores = array('i')
+        blocos: Dict[Tuple, List[int]] = {}
+        for pos, item in enumerate(itens):
+            vetor = item.mood_scores.valores
+            genero = codigos.setdefault(('g', getattr(item, atributo_genero)), len(codigos))
+            autor = codigos.setdefault(('a', getattr(item, atributo_autor)), len(codigos))
+            self._ids.append(item.id)
+            self._vetores.append(vetor)
+            self._normas.append(math.sqrt(sum(v * v for v in vetor)))
+            self._generos.append(genero)
+            self._autores.append(autor)
+            dominantes = tuple(sorted(range(len(vetor)), key=vetor.__getitem__, reverse=True)[:2])
+            for chave in (('g', genero), ('a', autor), ('m', dominantes), ('t', None)):
+                blocos.setdefault(chave, []).append(pos)
+
+        total = len(self._ids)
+        self._posicao = {item_id: pos for pos, item_id in enumerate(self._ids)}
+        # Cada item está em exatamente um bloco de cada tipo: guarda o bloco e a posição nele
+        n_tipos = len(TIPOS_BLOCO)
+        self._blocos: List[array] = []
+        self._membros = array('i', bytes(4 * n_tipos * total))
+        self._ordens = array('i', bytes(4 * n_tipos * total))
+        for chave in sorted(blocos, key=lambda c: (TIPOS_BLOCO.index(c[0]), c[1])):
+            membros = blocos[chave]
+            membros.sort(key=self._vetores.__getitem__)
+            indice_bloco = len(self._blocos)
+            self._blocos.append(array('i', membros))
+            tipo_bloco = TIPOS_BLOCO.index(chave[0])
+            for ordem, pos in enumerate(membros):
+                self._membros[n_tipos * pos + tipo_bloco] = indice_bloco
+                self._ordens[n_tipos * pos + tipo_bloco] = ordem
+
+        # Itens com menos de N candidatos ficam com -1 no fim da sua faixa
+        self._calculado = bytearray(total)
+        self._vizinhos = array('i', [-1]) * (total * n_vizinhos)
+        self._similaridades = array('f', bytes(4 * total * n_vizinhos))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._posicao
+
+    def similaridade(self, a: int, b: int) -> float:
+        """Similaridade entre as posições `a` e `b`"""
+        normas = (self._normas[a] or 1.0) * (self._normas[b] or 1.0)
+        cosseno = sum(map(mul, self._vetores[a], self._vetores[b])) / normas
+        return (PESO_MOOD * cosseno
+                + PESO_GENERO * (self._generos[a] == self._generos[b])
+                + PESO_AUTOR * (self._autores[a] == self._autores[b]))
+
+    def _candidatos(self, pos: int) -> set:
+        candidatos = set()
+        n_tipos = len(TIPOS_BLOCO)
+        for tipo_bloco in range(n_tipos):
+            membros = self._blocos[self._membros[n_tipos * pos + tipo_bloco]]
+            ordem = self._ordens[n_tipos * pos + tipo_bloco]
+            candidatos.update(membros[max(0, ordem - self.janela):ordem + self.janela + 1])
+        candidatos.discard(pos)
+        return candidatos
+
+    def _calcular(self, pos: int):
+        # Mesma conta de similaridade(), com as colunas em variáveis locais
+        vetores, normas, generos, autores = self._vetores, self._normas, self._generos, self._autores
+        vetor, norma, genero, autor = vetores[pos], normas[pos] or 1.0, generos[pos], autores[pos]
+        pontuados = []
+        for outro in self._candidatos(pos):
+            cosseno = sum(map(mul, vetor, vetores[outro])) / (norma * (normas[outro] or 1.0))
+            pontuados.append((PESO_MOOD * cosseno + PESO_GENERO * (genero == generos[outro])
+                              + PESO_AUTOR * (autor == autores[outro]), outro))
+        melhores = heapq.nlargest(self.n_vizinhos, pontuados)
+        base = pos * self.n_vizinhos
+        for i, (sim, outro) in enumerate(melhores):
+            self._vizinhos[base + i] = outro
+            self._similaridades[base + i] = sim
+        self._calculado[pos] = 1
+
+    def construir(self) -> 'IndiceSimilaridade':
+        """Calcula os vizinhos de todos os itens (aquecimento ou uso offline)"""
+        for pos in range(len(self._ids)):
+            if not self._calculado[pos]:
+                self._calcular(pos)
+        return self
+
+    def vizinhos(self, item_id: int, limite: Optional[int] = None) -> List[Tuple[float, int]]:
+        """(similaridade, id) dos itens mais parecidos, do maior para o menor; KeyError se não existir"""
+        pos = self._posicao[item_id]
+        if not self._calculado[pos]:
+            self._calcular(pos)
+        limite = self.n_vizinhos if limite is None else min(limite, self.n_vizinhos)
+        base = pos * self.n_vizinhos
+        resultado = []
+        for i in range(base, base + limite):
+            outro = self._vizinhos[i]
+            if outro < 0:
+                break
+            resultado.append((self._similaridades[i], self._ids[outro]))
+        return resultado
+
+    def memoria(self) -> int:
+        """Bytes das estruturas de vizinhos (fixas em N por item)"""
+        return (self._vizinhos.itemsize * len(self._vizinhos)
+                + self._similaridades.itemsize * len(self._similaridades) + len(self._calculado))
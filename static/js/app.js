@@ -7,6 +7,19 @@ class MoodRecommenderWithMedia {
         this.loadingSection = document.getElementById('loading');
         this.backBtn = document.getElementById('backBtn');
         
+        // Estado do "carregar mais" por categoria: cursor e próxima página já buscada
+        this.categories = {
+            musicas: { containerId: 'musicResults', buttonId: 'musicMore', tipo: 'musica' },
+            filmes: { containerId: 'movieResults', buttonId: 'movieMore', tipo: 'filme' },
+            jogos: { containerId: 'gameResults', buttonId: 'gameMore', tipo: 'jogo' }
+        };
+        this.pages = {};
+        
+        // Impressões e cliques acumulados até o próximo envio para /api/eventos
+        this.currentMood = null;
+        this.events = [];
+        this.eventsTimer = null;
+        
         this.init();
     }
     
@@ -21,9 +34,24 @@ class MoodRecommenderWithMedia {
         this.backBtn.addEventListener('click', () => {
             this.showMoodSelector();
         });
+        
+        Object.entries(this.categories).forEach(([categoria, config]) => {
+            document.getElementById(config.buttonId).addEventListener('click', () => {
+                this.loadMore(categoria);
+            });
+        });
+        
+        // Envia o que sobrou quando a aba some ou a página é fechada
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.flushEvents();
+            }
+        });
+        window.addEventListener('pagehide', () => this.flushEvents());
     }
     
     async handleMoodSelection(mood) {
+        this.currentMood = mood;
         this.showLoading();
         
         try {
@@ -34,7 +62,8 @@ class MoodRecommenderWithMedia {
                 },
                 body: JSON.stringify({
                     mood: mood,
-                    tipo: 'tudo'
+                    tipo: 'tudo',
+                    paginar: true
                 })
             });
             
@@ -79,9 +108,67 @@ class MoodRecommenderWithMedia {
         this.renderContentWithMedia(data.filmes, 'movieResults', 'filme');
         this.renderContentWithMedia(data.jogos, 'gameResults', 'jogo');
         
+        this.setupPagination(data.cursores || {});
         this.showResults();
     }
     
+    setupPagination(cursores) {
+        this.pages = {};
+        Object.keys(this.categories).forEach(categoria => {
+            this.pages[categoria] = { cursor: cursores[categoria] || null, prefetch: null };
+            this.prefetchPage(categoria);
+        });
+    }
+    
+    async fetchPage(cursor) {
+        const response = await fetch('/api/recomendar/mais', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ cursor: cursor, limite: 3 })
+        });
+        
+        // 410: o catálogo mudou e o cursor expirou
+        return response.ok ? response.json() : null;
+    }
+    
+    prefetchPage(categoria) {
+        // Busca a próxima página em segundo plano; o botão só aparece se ela tiver itens
+        const page = this.pages[categoria];
+        const button = document.getElementById(this.categories[categoria].buttonId);
+        page.prefetch = page.cursor ? this.fetchPage(page.cursor).catch(() => null) : Promise.resolve(null);
+        page.prefetch.then(data => {
+            if (this.pages[categoria] === page) {
+                button.style.display = data && data[categoria].length ? 'block' : 'none';
+            }
+        });
+    }
+    
+    async loadMore(categoria) {
+        const page = this.pages[categoria];
+        const config = this.categories[categoria];
+        const button = document.getElementById(config.buttonId);
+        
+        button.disabled = true;
+        const data = await page.prefetch;
+        button.disabled = false;
+        
+        // Outro humor foi escolhido enquanto a página chegava
+        if (this.pages[categoria] !== page || !data) {
+            return;
+        }
+        
+        const container = document.getElementById(config.containerId);
+        const offset = container.children.length;
+        data[categoria].forEach((item, index) => {
+            container.appendChild(this.createMediaCard(item, config.tipo, index, offset + index));
+        });
+        
+        page.cursor = data.cursor;
+        this.prefetchPage(categoria);
+    }
+    
     renderContentWithMedia(items, containerId, tipo) {
         const container = document.getElementById(containerId);
         container.innerHTML = '';
@@ -92,18 +179,20 @@ class MoodRecommenderWithMedia {
         }
         
         items.forEach((item, index) => {
-            const card = this.createMediaCard(item, tipo, index);
+            const card = this.createMediaCard(item, tipo, index, index);
             container.appendChild(card);
         });
     }
     
-    createMediaCard(item, tipo, index) {
+    createMediaCard(item, tipo, index, posicao) {
         // Container principal (agora é um link!)
         const card = document.createElement('a');
         card.href = item.link_url;
         card.target = '_blank';  // Abre em nova aba
         card.className = 'content-card media-card';
         card.rel = 'noopener noreferrer';  // Segurança
+        card.addEventListener('click', () => this.trackEvent('clique', tipo, item.id, posicao));
+        this.trackEvent('impressao', tipo, item.id, posicao);
         
         // Wrapper da imagem
         const imageWrapper = document.createElement('div');
@@ -111,7 +200,7 @@ class MoodRecommenderWithMedia {
         
         // Imagem de capa
         const img = document.createElement('img');
-        img.src = item.imagem_url;
+        img.src = item.imagem_url || this.getPlaceholderImage(tipo);
         img.alt = item.titulo;
         img.className = 'media-image';
         img.loading = 'lazy';  // Lazy loading
@@ -209,6 +298,41 @@ class MoodRecommenderWithMedia {
         return card;
     }
     
+    trackEvent(evento, tipo, id, posicao) {
+        const categoria = Object.keys(this.categories).find(c => this.categories[c].tipo === tipo);
+        this.events.push({ evento: evento, tipo: categoria, id: id, posicao: posicao, mood: this.currentMood });
+        
+        // Cliques vão logo (ajustam o perfil da sessão); impressões esperam juntar um lote
+        if (evento === 'clique' || this.events.length >= 50) {
+            this.flushEvents();
+        } else if (!this.eventsTimer) {
+            this.eventsTimer = setTimeout(() => this.flushEvents(), 5000);
+        }
+    }
+    
+    flushEvents() {
+        clearTimeout(this.eventsTimer);
+        this.eventsTimer = null;
+        if (this.events.length === 0) {
+            return;
+        }
+        const body = JSON.stringify({ eventos: this.events });
+        this.events = [];
+        
+        // sendBeacon não bloqueia e sobrevive ao fechamento da página
+        const blob = new Blob([body], { type: 'application/json' });
+        if (!navigator.sendBeacon || !navigator.sendBeacon('/api/eventos', blob)) {
+            fetch('/api/eventos', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: body,
+                keepalive: true
+            }).catch(() => {});
+        }
+    }
+    
     getPlaceholderImage(tipo) {
         // Imagens placeholder caso não carregue
         const placeholders = {
@@ -236,6 +360,7 @@ class MoodRecommenderWithMedia {
     }
     
     showMoodSelector() {
+        this.pages = {};
         this.resultsSection.style.display = 'none';
         this.loadingSection.style.display = 'none';
         this.moodSelector.style.display = 'block';
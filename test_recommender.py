@@ -3,8 +3,10 @@
 Script de teste para demonstrar o uso da API do Mood Recommender
 """
 
-from mood_recommender import MoodRecommender
+from mood_recommender import MoodRecommenderWithMedia
 import json
+import os
+import tempfile
 
 def test_recommender():
     """Testa o sistema de recomendação"""
@@ -15,7 +17,7 @@ def test_recommender():
     print()
     
     # Inicializa o recommender
-    recommender = MoodRecommender()
+    recommender = MoodRecommenderWithMedia()
     
     # Lista de moods para testar
     moods = ["feliz", "triste", "relaxado", "energizado", "ansioso", "pensativo"]
@@ -27,7 +29,12 @@ def test_recommender():
         print('='*60)
         
         # Busca recomendações
-        resultado = recommender.recomendar_tudo(mood)
+        resultado = recommender.recomendar_tudo_com_variedade(mood)
+        assert resultado['mood'] == mood
+        for tipo in ('musicas', 'filmes', 'jogos'):
+            assert 1 <= len(resultado[tipo]) <= 3
+            assert all(item['relevancia'] >= 5 for item in resultado[tipo])
+            assert len({item['id'] for item in resultado[tipo]}) == len(resultado[tipo])
         
         # Exibe músicas
         print("\n🎵 MÚSICAS:")
@@ -59,51 +66,67 @@ def test_individual_categories():
     print("📊 TESTE DE CATEGORIAS INDIVIDUAIS")
     print("=" * 60)
     
-    recommender = MoodRecommender()
+    recommender = MoodRecommenderWithMedia()
     
     # Teste: Músicas para humor feliz
     print("\n🎵 Top 5 Músicas para Humor FELIZ:")
     print("-" * 60)
-    musicas = recommender.recomendar("feliz", "musicas", 5)
+    musicas = recommender.recomendar_com_variedade("feliz", "musicas", 5)
+    assert 1 <= len(musicas) <= 5
     for i, musica in enumerate(musicas, 1):
         print(f"{i}. {musica['titulo']} - {musica['artista']} [{musica['relevancia']}/10]")
     
     # Teste: Filmes para humor pensativo
     print("\n🎬 Top 5 Filmes para Humor PENSATIVO:")
     print("-" * 60)
-    filmes = recommender.recomendar("pensativo", "filmes", 5)
+    filmes = recommender.recomendar_com_variedade("pensativo", "filmes", 5)
+    assert 1 <= len(filmes) <= 5
     for i, filme in enumerate(filmes, 1):
         print(f"{i}. {filme['titulo']} ({filme['ano']}) [{filme['relevancia']}/10]")
     
     # Teste: Jogos para humor energizado
     print("\n🎮 Top 5 Jogos para Humor ENERGIZADO:")
     print("-" * 60)
-    jogos = recommender.recomendar("energizado", "jogos", 5)
+    jogos = recommender.recomendar_com_variedade("energizado", "jogos", 5)
+    assert 1 <= len(jogos) <= 5
     for i, jogo in enumerate(jogos, 1):
         print(f"{i}. {jogo['titulo']} - {jogo['genero']} [{jogo['relevancia']}/10]")
 
 
-def export_to_json():
-    """Exporta todas as recomendações para JSON"""
+def export_to_json(diretorio=None):
+    """Exporta todas as recomendações para JSON, num diretório temporário se nenhum for dado"""
     
     print("\n\n" + "=" * 60)
     print("💾 EXPORTANDO DADOS PARA JSON")
     print("=" * 60)
     
-    recommender = MoodRecommender()
+    recommender = MoodRecommenderWithMedia()
     moods = ["feliz", "triste", "relaxado", "energizado", "ansioso", "pensativo"]
     
     export_data = {}
     for mood in moods:
-        export_data[mood] = recommender.recomendar_tudo(mood)
+        resultado = recommender.recomendar_tudo_com_variedade(mood)
+        resultado.pop('session_data')  # histórico da sessão, não faz parte da recomendação
+        export_data[mood] = resultado
     
-    # Salva em arquivo
-    filename = "recomendacoes_export.json"
+    # Salva em arquivo, fora da árvore do projeto
+    filename = os.path.join(diretorio or tempfile.mkdtemp(prefix='mood-'), "recomendacoes_export.json")
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(export_data, f, ensure_ascii=False, indent=2)
     
     print(f"\n✅ Dados exportados para: {filename}")
     print(f"📦 Total de {len(moods)} humores exportados")
+    return filename
+
+
+def test_export_to_json(tmp_path):
+    """Exportação grava um JSON por humor no diretório pedido"""
+    filename = export_to_json(str(tmp_path))
+    assert os.path.dirname(filename) == str(tmp_path)
+    with open(filename, encoding='utf-8') as f:
+        dados = json.load(f)
+    assert set(dados) == {"feliz", "triste", "relaxado", "energizado", "ansioso", "pensativo"}
+    assert all('session_data' not in resultado for resultado in dados.values())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,27 @@
+"""Fixtures compartilhadas pelos testes"""
+
+import pytest
+
+from mood_recommender import MoodRecommenderWithMedia, Musica, app
+
+
+def _musica(item_id, genero='rock', artista='a', **scores):
+    return Musica(id=item_id, titulo=f'm{item_id}', mood_scores=scores or {'feliz': 7}, imagem_url=None,
+                  link_url=None, artista=artista, duracao='3:00', genero=genero)
+
+
+@pytest.fixture
+def musica():
+    """Fábrica de Musica: só id, gênero, artista e scores importam nos testes"""
+    return _musica
+
+
+@pytest.fixture(scope='session')
+def motor():
+    """Engine com o catálogo embutido, compartilhada pelos testes que só leem dela"""
+    return MoodRecommenderWithMedia()
+
+
+@pytest.fixture
+def cliente():
+    return app.test_client()
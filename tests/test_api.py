@@ -0,0 +1,86 @@
+"""Testes das rotas HTTP (Flask)"""
+
+import json
+
+import pytest
+
+
+def _linhas_ndjson(resposta):
+    return [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('limite', [0, -1, 51, 'x'])
+def test_lote_rejeita_limite_fora_do_intervalo(cliente, limite):
+    resposta = cliente.post('/api/recomendar-lote', json={'pedidos': [{'mood': 'feliz', 'limite': limite}]})
+    assert resposta.status_code == 400
+
+
+def test_lote_aceita_moods_combinados(cliente):
+    pedidos = [{'mood': {'ansioso': 0.6, 'relaxado': 0.4}, 'tipo': 'musicas', 'limite': 2}]
+    resposta = cliente.post('/api/recomendar-lote', json={'pedidos': pedidos})
+    assert resposta.status_code == 200
+    (linha,) = _linhas_ndjson(resposta)
+    assert linha['mood'] == {'ansioso': 0.6, 'relaxado': 0.4}
+    assert 1 <= len(linha['itens']) <= 2
+
+
+def test_lote_com_semente_e_reproduzivel(cliente):
+    pedidos = [{'mood': 'feliz', 'tipo': 'filmes', 'limite': 3, 'semente': semente} for semente in (7, 7, 8)]
+    resultados = []
+    for _ in range(2):
+        linhas = _linhas_ndjson(cliente.post('/api/recomendar-lote', json={'pedidos': pedidos}))
+        resultados.append([[item['id'] for item in linha['itens']] for linha in linhas])
+    assert resultados[0] == resultados[1]
+    assert resultados[0][0] == resultados[0][1]
+
+
+def test_lote_rejeita_semente_invalida(cliente):
+    resposta = cliente.post('/api/recomendar-lote', json={'pedidos': [{'mood': 'feliz', 'semente': -1}]})
+    assert resposta.status_code == 400
+
+
+@pytest.mark.parametrize('rota', ['/api/recomendar', '/api/recomendar/mais', '/api/eventos', '/api/recomendar-lote'])
+def test_corpo_que_nao_e_objeto(cliente, rota):
+    resposta = cliente.post(rota, json=[1, 2, 3])
+    assert resposta.status_code == 400
+
+
+@pytest.mark.parametrize('rota', ['/api/recomendar', '/api/recomendar/mais'])
+def test_pesos_que_estouram_a_soma(cliente, rota):
+    resposta = cliente.post(rota, json={'mood': {'feliz': 1e308, 'triste': 1e308}})
+    assert resposta.status_code == 400
+    assert 'erro' in resposta.get_json()
+
+
+@pytest.mark.parametrize('rota, corpo', [
+    ('/api/recomendar', {'mood': 'feliz', 'tipo': ['musicas']}),
+    ('/api/recomendar/mais', {'mood': 'feliz', 'tipo': ['musicas']}),
+    ('/api/recomendar-lote', {'pedidos': [{'mood': 'feliz', 'tipo': ['musicas']}]}),
+    ('/api/eventos', {'eventos': [{'evento': 'clique', 'tipo': ['musicas'], 'id': 1}]}),
+])
+def test_tipo_que_nao_e_texto(cliente, rota, corpo):
+    resposta = cliente.post(rota, json=corpo)
+    assert resposta.status_code == 400
+    assert 'Tipo inválido' in resposta.get_json()['erro']
+
+
+def test_tipo_desconhecido_continua_vazio(cliente):
+    resposta = cliente.post('/api/recomendar', json={'mood': 'feliz', 'tipo': 'podcasts'})
+    assert resposta.status_code == 200
+    assert resposta.get_json() == []
+
+
+@pytest.mark.parametrize('historico', ['12', [1, '2'], [True], {'1': 2}, 7])
+def test_lote_rejeita_historico_que_nao_e_lista_de_ids(cliente, historico):
+    pedido = {'mood': 'feliz', 'tipo': 'musicas', 'historico': historico}
+    resposta = cliente.post('/api/recomendar-lote', json={'pedidos': [pedido]})
+    assert resposta.status_code == 400
+
+
+def test_lote_pula_o_historico(cliente):
+    pedido = {'mood': 'feliz', 'tipo': 'musicas', 'limite': 5, 'semente': 1}
+    (linha,) = _linhas_ndjson(cliente.post('/api/recomendar-lote', json={'pedidos': [pedido]}))
+    vistos = [item['id'] for item in linha['itens']]
+    (linha,) = _linhas_ndjson(cliente.post('/api/recomendar-lote',
+                                           json={'pedidos': [dict(pedido, historico=vistos[:2])]}))
+    assert not {item['id'] for item in linha['itens']} & set(vistos[:2])
@@ -0,0 +1,66 @@
+"""Testes do modo ASGI, chamando a aplicação direto com mensagens do protocolo"""
+
+import asyncio
+import json
+
+import asgi
+
+
+def _chamar(metodo, caminho, corpo=b'', partes=1):
+    tamanho = -(-len(corpo) // partes) if corpo else 1
+    mensagens = [{'type': 'http.request', 'body': corpo[i:i + tamanho], 'more_body': True}
+                 for i in range(0, max(len(corpo), 1), tamanho)]
+    mensagens[-1]['more_body'] = False
+    enviadas = []
+
+    async def receive():
+        return mensagens.pop(0)
+
+    async def send(mensagem):
+        enviadas.append(mensagem)
+
+    scope = {'type': 'http', 'method': metodo, 'path': caminho, 'headers': []}
+    asyncio.run(asgi.app(scope, receive, send))
+    inicio, corpo_resposta = enviadas
+    return inicio['status'], json.loads(corpo_resposta['body'])
+
+
+def test_recomendar():
+    status, corpo = _chamar('POST', '/api/recomendar', json.dumps({'mood': 'feliz', 'tipo': 'musicas'}).encode())
+    assert status == 200
+    assert corpo and all('id' in item for item in corpo)
+
+
+def test_json_invalido():
+    status, corpo = _chamar('POST', '/api/recomendar', b'{nao e json')
+    assert status == 400
+    assert corpo == {'erro': 'JSON inválido'}
+
+
+def test_corpo_que_nao_e_objeto():
+    for rota in ('/api/recomendar', '/api/recomendar/mais', '/api/eventos'):
+        status, corpo = _chamar('POST', rota, b'[1, 2, 3]')
+        assert status == 400, rota
+        assert 'erro' in corpo
+
+
+def test_corpo_grande_demais():
+    corpo = json.dumps({'mood': 'feliz', 'extra': 'x' * asgi.TAMANHO_MAXIMO_CORPO}).encode()
+    status, resposta = _chamar('POST', '/api/recomendar', corpo, partes=4)
+    assert status == 413
+    assert 'erro' in resposta
+
+
+def test_erro_interno_nao_expoe_excecao(monkeypatch, caplog):
+    def falhar(data, sid):
+        raise RuntimeError('detalhe interno')
+    monkeypatch.setattr(asgi, 'processar_recomendacao', falhar)
+    status, corpo = _chamar('POST', '/api/recomendar', b'{"mood": "feliz"}')
+    assert status == 500
+    assert corpo == {'erro': 'Erro interno'}
+    assert 'detalhe interno' in caplog.text
+
+
+def test_rota_inexistente_e_metodo():
+    assert _chamar('GET', '/nada')[0] == 404
+    assert _chamar('GET', '/api/recomendar')[0] == 405
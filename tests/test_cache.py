@@ -0,0 +1,86 @@
+"""Testes dos caches: LRU de buckets e payloads congelados por item"""
+
+import copy
+import json
+
+import pytest
+
+from mood_recommender import CacheLRU, CachePayloads, MoodRecommenderWithMedia, PayloadCongelado
+
+
+def test_lru_por_entradas():
+    cache = CacheLRU(max_entradas=2, max_tamanho=100)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    assert cache.obter('a') == 1  # 'a' passa a ser o mais recente
+    cache.guardar('c', 3)
+    assert cache.obter('b') is None
+    assert cache.obter('a') == 1 and cache.obter('c') == 3
+    assert cache.estatisticas() == {'entradas': 2, 'tamanho': 2, 'acertos': 3, 'falhas': 1, 'remocoes': 1}
+
+
+def test_lru_por_tamanho():
+    cache = CacheLRU(max_entradas=10, max_tamanho=10)
+    cache.guardar('a', 'x', 6)
+    cache.guardar('b', 'y', 3)
+    cache.guardar('c', 'z', 4)  # 13 > 10: sai 'a'
+    assert cache.obter('a') is None
+    assert cache.estatisticas()['tamanho'] == 7
+    cache.guardar('b', 'y2', 1)  # substituir desconta o tamanho anterior
+    assert cache.estatisticas()['tamanho'] == 5
+    cache.guardar('grande', 'w', 11)  # maior que o limite: não entra nem expulsa ninguém
+    assert cache.obter('grande') is None and cache.obter('c') == 'z'
+    cache.limpar()
+    assert cache.estatisticas()['entradas'] == 0 and cache.estatisticas()['tamanho'] == 0
+
+
+def test_payload_congelado_e_compartilhado(motor):
+    payloads = motor.payloads
+    payload = payloads.payload('musicas', 1)
+    assert isinstance(payload, PayloadCongelado)
+    assert payloads.payload('musicas', 1) is payload
+    with pytest.raises(TypeError):
+        payload['titulo'] = 'outro'
+    with pytest.raises(TypeError):
+        payload.update(titulo='outro')
+    assert type(copy.copy(payload)) is dict and type(copy.deepcopy(payload)) is dict
+
+
+def test_resposta_e_copia_com_relevancia(motor):
+    payloads = motor.payloads
+    resposta = payloads.resposta('filmes', 2, 8)
+    resposta['titulo'] = 'alterado'
+    assert payloads.payload('filmes', 2)['titulo'] != 'alterado'
+    assert resposta['relevancia'] == 8 and 'relevancia' not in payloads.payload('filmes', 2)
+    assert payloads.resposta('filmes', 2, 8, 'youtube')['link_url'].startswith('https://www.youtube.com/')
+
+
+def test_fragmentos_json_iguais_ao_dict(motor):
+    payloads = motor.payloads
+    for tipo in ('musicas', 'filmes', 'jogos'):
+        assert json.loads(payloads.json_resposta(tipo, 3, 7)) == payloads.resposta(tipo, 3, 7)
+        compacto = json.loads(payloads.json_compacto(tipo, 3, 7, ('titulo',)))
+        assert compacto == {'id': 3, 'relevancia': 7, 'titulo': payloads.payload(tipo, 3)['titulo']}
+    assert json.loads(payloads.json_compacto('jogos', 3, 7, ())) == {'id': 3, 'relevancia': 7}
+
+
+def test_derivar_descarta_so_os_alterados(motor):
+    payloads = motor.payloads
+    intacto = payloads.payload('musicas', 1)
+    alterado = payloads.payload('musicas', 2)
+    outro = payloads.payload('filmes', 2)
+    novo = payloads.derivar(motor.indice, 'musicas', {2})
+    assert isinstance(novo, CachePayloads)
+    assert novo.payload('musicas', 1) is intacto
+    assert novo.payload('filmes', 2) is outro
+    assert novo.payload('musicas', 2) is not alterado
+
+
+def test_cache_de_buckets_limpo_na_troca_de_versao():
+    motor = MoodRecommenderWithMedia()
+    mood = (('feliz', 10), ('relaxado', 10))
+    motor.recomendar_com_variedade(dict(mood), 'musicas')
+    motor.recomendar_com_variedade(dict(mood), 'musicas')
+    assert motor.cache_buckets.estatisticas()['acertos'] >= 1
+    motor.reconstruir_indice()
+    assert motor.cache_buckets.estatisticas()['entradas'] == 0
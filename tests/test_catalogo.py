@@ -0,0 +1,96 @@
+"""Testes do catálogo em disco (formato colunar via mmap)"""
+
+import json
+import random
+
+import pytest
+
+import catalogo
+from catalogo import ArquivoCatalogo, CatalogoInvalido, salvar_catalogo
+from mood_recommender import CLASSES_CONTEUDO, MOODS, MoodRecommenderWithMedia
+
+
+@pytest.fixture
+def embutido(motor):
+    return motor.categorias
+
+
+def test_ida_e_volta(tmp_path, embutido):
+    caminho = str(tmp_path / 'catalogo.bin')
+    salvar_catalogo(caminho, embutido, MOODS, versao='v1')
+    arquivo = ArquivoCatalogo(caminho, CLASSES_CONTEUDO)
+    assert arquivo.versao == 'v1'
+    for tipo, itens in embutido.items():
+        mapeado = arquivo.categorias[tipo]
+        assert list(mapeado) == list(itens)
+        assert mapeado.por_id[itens[-1].id] == itens[-1]
+        for mood in MOODS:
+            esperado = {}
+            for item in itens:
+                score = item.mood_scores.get(mood, 0)
+                if score >= 5:
+                    esperado.setdefault(score, []).append(item.id)
+            assert {score: list(ids) for score, ids in mapeado.buckets(mood).items()} == esperado
+
+
+@pytest.mark.parametrize('linhas_run', [3, 7, catalogo.LINHAS_RUN])
+def test_ordem_com_ids_fora_de_ordem(tmp_path, monkeypatch, musica, linhas_run):
+    """Com mais de uma run, `ordem` sai da ordenação externa; com uma só, do sort em memória"""
+    monkeypatch.setattr(catalogo, 'LINHAS_RUN', linhas_run)
+    ids = random.Random(1).sample(range(1, 1000), 50)
+    caminho = str(tmp_path / 'catalogo.bin')
+    salvar_catalogo(caminho, {'musicas': [musica(item_id) for item_id in ids]}, MOODS)
+    mapeado = ArquivoCatalogo(caminho, CLASSES_CONTEUDO).categorias['musicas']
+    assert [mapeado.id_em(pos) for pos in mapeado._ordem] == sorted(ids)
+    for pos, item_id in enumerate(ids):
+        assert mapeado.posicao(item_id) == pos
+    assert mapeado.posicao(1000) is None and mapeado.posicao(0) is None
+
+
+def test_ordem_com_ids_em_ordem(tmp_path, monkeypatch, musica):
+    monkeypatch.setattr(catalogo, 'LINHAS_RUN', 4)
+    caminho = str(tmp_path / 'catalogo.bin')
+    salvar_catalogo(caminho, {'musicas': [musica(item_id) for item_id in range(10, 20)]}, MOODS)
+    mapeado = ArquivoCatalogo(caminho, CLASSES_CONTEUDO).categorias['musicas']
+    assert list(mapeado._ordem) == list(range(10))
+    assert mapeado.posicao(15) == 5
+
+
+def test_escritor_rejeita_score_fora_do_intervalo(tmp_path, musica):
+    item = musica(1)
+    object.__setattr__(item, 'mood_scores', {'feliz': 12})
+    with pytest.raises(ValueError):
+        salvar_catalogo(str(tmp_path / 'catalogo.bin'), {'musicas': [item]}, MOODS)
+    assert not list(tmp_path.iterdir())
+
+
+def test_arquivo_com_score_acima_do_maximo_e_invalido(tmp_path, musica):
+    caminho = tmp_path / 'catalogo.bin'
+    salvar_catalogo(str(caminho), {'musicas': [musica(1, feliz=9)]}, MOODS)
+    bruto = bytearray(caminho.read_bytes())
+    inicio, comprimento = catalogo.RODAPE.unpack_from(bruto, len(bruto) - len(catalogo.MAGIC) - catalogo.RODAPE.size)
+    cabecalho = json.loads(bruto[inicio:inicio + comprimento])
+    posicao, _ = cabecalho['categorias']['musicas']['secoes']['scores']
+    assert bruto[posicao + MOODS.index('feliz')] == 9
+    bruto[posicao + MOODS.index('feliz')] = 200
+    caminho.write_bytes(bytes(bruto))
+    with pytest.raises(CatalogoInvalido):
+        ArquivoCatalogo(str(caminho), CLASSES_CONTEUDO)
+
+
+def test_arquivo_truncado_e_invalido(tmp_path, musica):
+    caminho = tmp_path / 'catalogo.bin'
+    salvar_catalogo(str(caminho), {'musicas': [musica(1)]}, MOODS)
+    caminho.write_bytes(caminho.read_bytes()[:-3])
+    with pytest.raises(CatalogoInvalido):
+        ArquivoCatalogo(str(caminho), CLASSES_CONTEUDO)
+
+
+def test_recomendacoes_iguais_em_memoria_e_em_disco(tmp_path, embutido):
+    caminho = str(tmp_path / 'catalogo.bin')
+    salvar_catalogo(caminho, embutido, MOODS)
+    memoria, disco = MoodRecommenderWithMedia(), MoodRecommenderWithMedia(caminho)
+    for tipo in embutido:
+        for mood in ('feliz', {'triste': 0.5, 'pensativo': 0.5}):
+            paginas = [motor.recomendar_pagina(mood, tipo, 5, 0, 20) for motor in (memoria, disco)]
+            assert [item['id'] for item in paginas[0][tipo]] == [item['id'] for item in paginas[1][tipo]]
@@ -0,0 +1,156 @@
+"""Testes do registro de eventos (fila, escritores em arquivo e SQLite, rota /api/eventos)"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import mood_recommender
+from eventos import EscritorArquivo, EscritorEventos, EscritorSQLite, FilaEventos, criar_fila
+from metricas import metricas
+
+
+def _evento(item, evento='impressao', posicao=0):
+    return {'ts': time.time(), 'sessao': 's1', 'evento': evento, 'tipo': 'filmes', 'item': item,
+            'mood': 'feliz', 'posicao': posicao}
+
+
+class EscritorMemoria(EscritorEventos):
+    def __init__(self, falhar: bool = False, liberar: threading.Event = None):
+        self.lotes = []
+        self.falhar = falhar
+        self.liberar = liberar
+        self.fechado = False
+
+    def gravar(self, eventos):
+        if self.liberar is not None:
+            self.liberar.wait(5)
+        if self.falhar:
+            raise OSError('disco cheio')
+        self.lotes.append(list(eventos))
+
+    def fechar(self):
+        self.fechado = True
+
+
+def test_escritor_e_abstrato():
+    with pytest.raises(TypeError):
+        EscritorEventos()
+
+    class SemFechar(EscritorEventos):
+        def gravar(self, eventos):
+            pass
+
+    with pytest.raises(TypeError):
+        SemFechar()
+
+
+def test_fila_grava_em_lotes_e_fecha():
+    escritor = EscritorMemoria()
+    fila = FilaEventos(escritor, lote=3, intervalo=0.01)
+    assert fila.publicar(_evento(i) for i in range(7)) == 7
+    fila.fechar()
+    assert escritor.fechado
+    assert [evento['item'] for lote in escritor.lotes for evento in lote] == list(range(7))
+    assert all(len(lote) <= 3 for lote in escritor.lotes)
+    assert fila.estatisticas() == {'pendentes': 0, 'recebidos': 7, 'descartados': 0, 'gravados': 7, 'falhas': 0}
+
+
+def test_fila_cheia_descarta_e_conta():
+    liberar = threading.Event()
+    escritor = EscritorMemoria(liberar=liberar)
+    fila = FilaEventos(escritor, capacidade=2, lote=1, intervalo=0.01)
+    fila.publicar([_evento(0)])
+    while fila.pendentes():
+        time.sleep(0.001)  # a thread pegou o primeiro e está presa em gravar()
+    assert fila.publicar(_evento(i) for i in range(1, 6)) == 2
+    liberar.set()
+    fila.fechar()
+    estatisticas = fila.estatisticas()
+    assert estatisticas['descartados'] == 3
+    assert estatisticas['recebidos'] == estatisticas['gravados'] == 3
+
+
+def test_falha_do_escritor_nao_mata_a_thread():
+    escritor = EscritorMemoria(falhar=True)
+    fila = FilaEventos(escritor, intervalo=0.01)
+    fila.publicar([_evento(1), _evento(2)])
+    fila.fechar()
+    assert fila.falhas == 2 and fila.gravados == 0
+    assert escritor.fechado
+
+
+def test_escritor_arquivo(tmp_path):
+    fila = criar_fila(f'arquivo://{tmp_path}')
+    assert isinstance(fila.escritor, EscritorArquivo)
+    fila.publicar([_evento(1), _evento(2, 'clique', None)])
+    fila.fechar()
+    (nome,) = os.listdir(tmp_path)
+    assert nome.startswith('eventos-') and nome.endswith(f'-{os.getpid()}.jsonl')
+    with open(tmp_path / nome, encoding='utf-8') as arquivo:
+        linhas = [json.loads(linha) for linha in arquivo]
+    assert [(linha['evento'], linha['item'], linha['posicao']) for linha in linhas] == \
+        [('impressao', 1, 0), ('clique', 2, None)]
+
+
+def test_escritor_sqlite(tmp_path):
+    caminho = tmp_path / 'eventos.db'
+    fila = criar_fila(f'sqlite:///{caminho}')
+    assert isinstance(fila.escritor, EscritorSQLite)
+    fila.publicar(_evento(i, posicao=i) for i in range(4))
+    fila.fechar()
+    with sqlite3.connect(caminho) as conexao:
+        linhas = conexao.execute('SELECT evento, tipo, item, mood, posicao FROM eventos ORDER BY rowid').fetchall()
+    assert linhas == [('impressao', 'filmes', i, 'feliz', i) for i in range(4)]
+
+
+def test_criar_fila():
+    assert criar_fila(None) is None
+    assert criar_fila('') is None
+    with pytest.raises(ValueError):
+        criar_fila('kafka://localhost')
+
+
+def test_rota_publica_na_fila(cliente, monkeypatch):
+    escritor = EscritorMemoria()
+    fila = FilaEventos(escritor, intervalo=0.01)
+    monkeypatch.setattr(mood_recommender, 'fila_eventos', fila)
+    eventos = [{'evento': 'impressao', 'tipo': 'filmes', 'id': 2, 'mood': 'feliz', 'posicao': 0},
+               {'evento': 'clique', 'tipo': 'filmes', 'id': 2, 'mood': {'feliz': 1, 'triste': 1}},
+               {'evento': 'clique', 'tipo': 'filmes', 'id': 9999}]  # fora do catálogo: ignorado
+    resposta = cliente.post('/api/eventos', json={'eventos': eventos})
+    assert resposta.status_code == 202 and resposta.get_json() == {'aceitos': 2}
+    fila.fechar()
+    impressao, clique = [evento for lote in escritor.lotes for evento in lote]
+    assert (impressao['evento'], impressao['item'], impressao['mood'], impressao['posicao']) == \
+        ('impressao', 2, 'feliz', 0)
+    assert (clique['evento'], clique['mood'], clique['posicao']) == ('clique', '{"feliz":10,"triste":10}', None)
+    assert impressao['sessao'] == clique['sessao'] and len(impressao['sessao']) == 16
+
+
+def test_rota_com_a_fila_cheia(cliente, monkeypatch):
+    monkeypatch.setattr(metricas, 'ativo', True)
+    liberar = threading.Event()
+    fila = FilaEventos(EscritorMemoria(liberar=liberar), capacidade=2, lote=1, intervalo=0.01)
+    monkeypatch.setattr(mood_recommender, 'fila_eventos', fila)
+    evento = {'evento': 'impressao', 'tipo': 'jogos', 'id': 1, 'mood': 'feliz', 'posicao': 0}
+    assert cliente.post('/api/eventos', json={'eventos': [evento]}).get_json() == {'aceitos': 1}
+    while fila.pendentes():
+        time.sleep(0.001)
+    resposta = cliente.post('/api/eventos', json={'eventos': [evento] * 5})
+    assert resposta.status_code == 202 and resposta.get_json() == {'aceitos': 2}
+    texto = cliente.get('/metrics').get_data(as_text=True)
+    assert 'mood_eventos_descartados_total 3' in texto
+    assert 'mood_eventos_recebidos_total 3' in texto
+    liberar.set()
+    fila.fechar()
+    assert fila.estatisticas()['gravados'] == 3
+
+
+def test_rota_sem_fila_so_atualiza_o_perfil(cliente, monkeypatch):
+    monkeypatch.setattr(mood_recommender, 'fila_eventos', None)
+    resposta = cliente.post('/api/eventos', json={'eventos': [{'evento': 'clique', 'tipo': 'musicas', 'id': 1}]})
+    assert resposta.status_code == 202 and resposta.get_json() == {'aceitos': 0}
@@ -0,0 +1,100 @@
+"""Testes do armazém de sessões e das estruturas guardadas nele"""
+
+import pytest
+
+from historico import (ArmazemHistorico, HistoricoCompacto, HistoricoMemoria, HistoricoSQLite, PerfilMood,
+                       criar_armazem, desserializar_sessao, serializar_sessao)
+
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def armazem(request, tmp_path):
+    if request.param == 'memoria':
+        return HistoricoMemoria()
+    return HistoricoSQLite(str(tmp_path / 'historico.db'))
+
+
+def _sessao():
+    perfil = PerfilMood(6)
+    perfil.registrar(bytes([9, 0, 3, 0, 0, 7]))
+    return {'contador': 3, 'historico_musicas': HistoricoCompacto([1, 2, 3], janela=5), 'perfil_mood': perfil}
+
+
+def test_interface_e_abstrata():
+    with pytest.raises(TypeError):
+        ArmazemHistorico()
+
+
+def test_sessao_inexistente_vem_vazia(armazem):
+    assert armazem.carregar('nada') == {}
+
+
+def test_ida_e_volta(armazem):
+    armazem.salvar('s', _sessao())
+    assert armazem.carregar('s') == _sessao()
+
+
+def test_alterar_o_carregado_nao_muda_o_armazem(armazem):
+    armazem.salvar('s', _sessao())
+    dados = armazem.carregar('s')
+    dados['contador'] = 99
+    dados['historico_musicas'].adicionar(42)
+    dados['perfil_mood'].registrar(bytes(6), alfa=1.0)
+    assert armazem.carregar('s') == _sessao()
+
+
+def test_remover(armazem):
+    armazem.salvar('s', _sessao())
+    armazem.remover('s')
+    assert armazem.carregar('s') == {}
+
+
+def test_memoria_expira_por_ttl():
+    armazem = HistoricoMemoria(ttl=-1)
+    armazem.salvar('s', {'contador': 1})
+    assert armazem.carregar('s') == {}
+
+
+def test_memoria_descarta_a_sessao_menos_recente():
+    armazem = HistoricoMemoria(capacidade=2)
+    armazem.salvar('a', {'contador': 1})
+    armazem.salvar('b', {'contador': 2})
+    armazem.carregar('a')
+    armazem.salvar('c', {'contador': 3})
+    assert armazem.carregar('b') == {}
+    assert armazem.carregar('a') == {'contador': 1}
+    assert len(armazem) == 2
+
+
+def test_criar_armazem(tmp_path):
+    assert isinstance(criar_armazem(None), HistoricoMemoria)
+    assert isinstance(criar_armazem(f'sqlite:///{tmp_path / "h.db"}'), HistoricoSQLite)
+    with pytest.raises(ValueError):
+        criar_armazem('redis://localhost')
+
+
+def test_historico_compacto_janela_circular():
+    historico = HistoricoCompacto(range(1, 6), janela=3)
+    assert list(historico) == [3, 4, 5]
+    assert 2 not in historico and 3 in historico
+    historico.adicionar(3)
+    historico.adicionar(6)
+    assert list(historico) == [5, 3, 6]
+    assert 3 in historico and 4 not in historico
+    historico.estender([7, 8])
+    # Com a contagem, o 3 que saiu da janela deixa de valer
+    assert list(historico) == [6, 7, 8] and 3 not in historico
+
+
+def test_serializacao_binaria():
+    dados = _sessao()
+    bruto = serializar_sessao(dados)
+    assert isinstance(bruto, bytes)
+    assert desserializar_sessao(bruto) == dados
+
+
+def test_perfil_primeiro_evento_define_o_vetor():
+    perfil = PerfilMood(6)
+    assert perfil.afinidade(bytes([10, 0, 0, 0, 0, 0])) == 0.0
+    perfil.registrar(bytes([10, 0, 0, 0, 0, 0]))
+    assert perfil.afinidade(bytes([5, 0, 0, 0, 0, 0])) == pytest.approx(1.0)
+    assert perfil.afinidade(bytes([0, 5, 0, 0, 0, 0])) == pytest.approx(0.0)
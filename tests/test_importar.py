@@ -0,0 +1,112 @@
+"""Testes da importação em lote de CSV/JSONL para o catálogo em disco"""
+
+import gzip
+import json
+
+import pytest
+
+from catalogo import ArquivoCatalogo
+from importar import ErroImportacao, IdsVistos, importar, main
+from mood_recommender import CATEGORIAS_CONTEUDO, CLASSES_CONTEUDO, MOODS
+
+CSV = """tipo,id,titulo,artista,duracao,genero,imagem_url,link_url,feliz,relaxado
+musicas,20,Canção B,Banda,3:10,pop,,,9,
+musicas,10,Canção A,Banda,4:00,rock,http://img,,7,6
+musicas,30,Sem Mood,Banda,4:00,rock,,,,
+musicas,10,Repetida,Banda,4:00,rock,,,8,
+musicas,40,Score Alto,Banda,4:00,rock,,,11,
+"""
+
+JSONL = [
+    {'tipo': 'filmes', 'id': 5, 'titulo': 'Filme', 'diretor': 'D', 'ano': '1999', 'genero': 'drama',
+     'duracao': '2h', 'mood_scores': {'pensativo': 9, 'triste': 6}},
+    {'tipo': 'jogos', 'id': 7, 'titulo': 'Jogo', 'plataforma': 'PC', 'genero': 'rpg', 'multiplayer': 'sim',
+     'mood_scores': {'energizado': 8}},
+    {'tipo': 'jogos', 'id': 8, 'titulo': 'Jogo', 'plataforma': 'PC', 'genero': 'rpg', 'multiplayer': 'talvez',
+     'mood_scores': {'energizado': 8}},
+    {'tipo': 'jogos', 'id': 9, 'titulo': 'Jogo', 'mood_scores': {'eufórico': 8}},
+]
+
+
+@pytest.fixture
+def entradas(tmp_path):
+    csv_caminho = tmp_path / 'musicas.csv'
+    csv_caminho.write_text(CSV, encoding='utf-8')
+    jsonl_caminho = tmp_path / 'outros.jsonl.gz'
+    with gzip.open(jsonl_caminho, 'wt', encoding='utf-8') as arquivo:
+        for registro in JSONL:
+            arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        arquivo.write('{"tipo": "jogos", "id": \n')  # linha truncada
+    return [str(csv_caminho), str(jsonl_caminho)]
+
+
+@pytest.mark.parametrize('processos', [1, 2])
+def test_importa_valida_e_descarta_repetidos(tmp_path, entradas, processos):
+    saida = str(tmp_path / 'catalogo.bin')
+    relatorio = importar(entradas, saida, CATEGORIAS_CONTEUDO, MOODS, versao='imp', processos=processos)
+    assert relatorio['importados'] == {'musicas': 2, 'filmes': 1, 'jogos': 1}
+    assert relatorio['linhas'] == 10
+    assert relatorio['rejeitados'] == 6 and relatorio['duplicados'] == 1
+    mensagens = [mensagem for _, _, mensagem in relatorio['erros']]
+    assert 'nenhum mood com score' in mensagens
+    assert 'id 10 repetido em musicas' in mensagens
+    assert 'score fora do intervalo em feliz: 11' in mensagens
+    assert "valor inválido em multiplayer: 'talvez'" in mensagens
+    assert "mood desconhecido: 'eufórico'" in mensagens
+    assert 'JSON inválido' in mensagens
+
+    arquivo = ArquivoCatalogo(saida, CLASSES_CONTEUDO)
+    assert arquivo.versao == 'imp'
+    musicas = arquivo.categorias['musicas']
+    # Em ids repetidos vale a primeira linha; a ordem de gravação é a de leitura
+    assert [item.id for item in musicas] == [20, 10]
+    assert musicas.por_id[10].titulo == 'Canção A' and musicas.por_id[10].imagem_url == 'http://img'
+    assert dict(musicas.por_id[10].mood_scores) == {'feliz': 7, 'relaxado': 6}
+    filme = arquivo.categorias['filmes'].por_id[5]
+    assert filme.ano == 1999 and filme.imdb_id is None
+    assert arquivo.categorias['jogos'].por_id[7].multiplayer is True
+
+
+def test_estrito_aborta_sem_gravar(tmp_path, entradas):
+    saida = tmp_path / 'catalogo.bin'
+    with pytest.raises(ErroImportacao):
+        importar(entradas, str(saida), CATEGORIAS_CONTEUDO, MOODS, processos=1, estrito=True)
+    assert not saida.exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['musicas.csv', 'outros.jsonl.gz']
+
+
+def test_cabecalho_csv_invalido(tmp_path):
+    entrada = tmp_path / 'ruim.csv'
+    entrada.write_text('tipo,id,titulo,cor\nmusicas,1,x,azul\n', encoding='utf-8')
+    with pytest.raises(ErroImportacao, match='colunas desconhecidas: cor'):
+        importar([str(entrada)], str(tmp_path / 'c.bin'), CATEGORIAS_CONTEUDO, MOODS, processos=1)
+    entrada.write_text('id,titulo\n1,x\n', encoding='utf-8')
+    with pytest.raises(ErroImportacao, match='--tipo'):
+        importar([str(entrada)], str(tmp_path / 'c.bin'), CATEGORIAS_CONTEUDO, MOODS, processos=1)
+
+
+def test_tipo_padrao_e_formato(tmp_path):
+    entrada = tmp_path / 'jogos.ndjson'
+    entrada.write_text(json.dumps({'id': 3, 'titulo': 'J', 'plataforma': 'PS', 'genero': 'luta',
+                                   'multiplayer': False, 'mood_scores': {'energizado': 10}}) + '\n',
+                       encoding='utf-8')
+    relatorio = importar([str(entrada)], str(tmp_path / 'c.bin'), CATEGORIAS_CONTEUDO, MOODS,
+                         tipo='jogos', processos=1)
+    assert relatorio['importados']['jogos'] == 1
+    with pytest.raises(ErroImportacao, match='formato desconhecido'):
+        importar([str(tmp_path / 'dados.xml')], str(tmp_path / 'c.bin'), CATEGORIAS_CONTEUDO, MOODS)
+
+
+def test_main(tmp_path, entradas, capsys):
+    saida = tmp_path / 'catalogo.bin'
+    assert main([*entradas, str(saida), '--processos', '1']) == 0
+    assert saida.exists()
+    assert 'rejeitadas' in capsys.readouterr().out
+
+
+def test_ids_vistos():
+    vistos = IdsVistos()
+    assert vistos.adicionar(1) and vistos.adicionar((1 << 31) - 1) and vistos.adicionar(65536)
+    assert not vistos.adicionar(1) and not vistos.adicionar(65536)
+    assert vistos.adicionar(2)
+    assert vistos.memoria() == 3 * (1 << (IdsVistos.BITS_PAGINA - 3))
@@ -0,0 +1,75 @@
+"""Testes do índice invertido de moods (IndiceMood) e das atualizações incrementais"""
+
+import pytest
+
+from mood_recommender import SCORE_FALLBACK, IndiceMood, MoodRecommenderWithMedia
+
+
+def _postings(itens, mood):
+    esperado = {}
+    for item in itens:
+        score = item.mood_scores.get(mood, 0)
+        if score >= SCORE_FALLBACK:
+            esperado.setdefault(score, []).append(item.id)
+    return {score: sorted(ids) for score, ids in esperado.items()}
+
+
+@pytest.fixture
+def indice(musica):
+    indice = IndiceMood()
+    indice.definir_categoria('musicas', [musica(3, feliz=9, triste=2), musica(1, feliz=9, relaxado=6),
+                                         musica(2, feliz=5, relaxado=10), musica(4, triste=4)])
+    return indice
+
+
+def test_buckets_ordenados_por_id_e_so_a_partir_do_fallback(indice):
+    assert indice.buckets('musicas', 'feliz') == {9: [1, 3], 5: [2]}
+    assert indice.buckets('musicas', 'relaxado') == {10: [2], 6: [1]}
+    assert indice.buckets('musicas', 'triste') == {}
+    assert indice.buckets('filmes', 'feliz') == {}
+
+
+def test_adicionar_substituir_e_remover(indice, musica):
+    indice.adicionar('musicas', musica(0, feliz=9))
+    indice.adicionar('musicas', musica(2, feliz=8))  # substitui: sai de feliz=5 e relaxado=10
+    assert indice.buckets('musicas', 'feliz') == {9: [0, 1, 3], 8: [2]}
+    assert indice.buckets('musicas', 'relaxado') == {6: [1]}
+    assert indice.remover('musicas', 3).id == 3
+    assert indice.remover('musicas', 3) is None
+    assert indice.buckets('musicas', 'feliz') == {9: [0, 1], 8: [2]}
+    assert not indice.contem('musicas', 3) and indice.contem('musicas', 0)
+
+
+def test_vetores_e_colunas(indice):
+    assert indice.vetor('musicas', 1) == bytes([9, 0, 6, 0, 0, 0])
+    assert indice.vetor('musicas', 99) is None
+    ids, colunas = indice.colunas('musicas')
+    assert list(ids) == [3, 1, 2, 4]
+    assert colunas['feliz'].to_bytes(len(ids), 'little') == bytes([9, 9, 5, 0])
+
+
+def test_derivar_nao_altera_o_original(indice):
+    novo = indice.derivar('musicas')
+    novo.remover('musicas', 1)
+    assert indice.buckets('musicas', 'feliz') == {9: [1, 3], 5: [2]}
+    assert novo.buckets('musicas', 'feliz') == {9: [3], 5: [2]}
+
+
+def test_indice_do_catalogo_embutido(motor):
+    for tipo, itens in motor.categorias.items():
+        for mood in ('feliz', 'triste', 'relaxado', 'energizado', 'ansioso', 'pensativo'):
+            buckets = {score: list(ids) for score, ids in motor.indice.buckets(tipo, mood).items()}
+            assert buckets == _postings(itens, mood)
+
+
+def test_atualizar_itens_publica_nova_versao(musica):
+    motor = MoodRecommenderWithMedia()
+    anterior = motor.estado
+    motor.adicionar_item('musicas', musica(500, feliz=10))
+    assert motor.versao_catalogo == anterior.versao + 1
+    assert 500 in motor.indice.buckets('musicas', 'feliz')[10]
+    assert 500 not in anterior.indice.buckets('musicas', 'feliz').get(10, [])
+    assert motor.estado.categorias['filmes'] is anterior.categorias['filmes']
+    assert motor.remover_item('musicas', 500)
+    assert not motor.remover_item('musicas', 500)
+    assert 500 not in motor.indice.buckets('musicas', 'feliz').get(10, [])
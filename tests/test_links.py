@@ -0,0 +1,98 @@
+"""Testes da resolução de links e imagens a partir dos ids das lojas"""
+
+from dataclasses import replace
+
+import pytest
+
+from mood_recommender import Filme, Jogo, resolver_imagem, resolver_link
+
+# Links que a versão com URLs gravadas servia para os itens que hoje só guardam o id da loja
+LINKS_GRAVADOS = {
+    ('musicas', 1): 'https://open.spotify.com/track/7hQJA50XrCWABAu5v6QZ4i',
+    ('musicas', 2): 'https://open.spotify.com/track/60nZcImufyMA1MKQY3dcCH',
+    ('musicas', 3): 'https://open.spotify.com/track/32OlwWuMpZ6b0aN2RZOeMS',
+    ('filmes', 1): 'https://www.imdb.com/title/tt2278388/',
+    ('filmes', 2): 'https://www.imdb.com/title/tt0211915/',
+    ('filmes', 3): 'https://www.imdb.com/title/tt2015381/',
+    ('filmes', 4): 'https://www.imdb.com/title/tt0454921/',
+    ('filmes', 5): 'https://www.imdb.com/title/tt0338013/',
+    ('filmes', 6): 'https://www.imdb.com/title/tt1856101/',
+    ('filmes', 7): 'https://www.imdb.com/title/tt2543164/',
+    ('filmes', 8): 'https://www.imdb.com/title/tt1392190/',
+    ('filmes', 9): 'https://www.imdb.com/title/tt2911666/',
+    ('filmes', 10): 'https://www.imdb.com/title/tt0096283/',
+    ('jogos', 1): 'https://store.steampowered.com/app/413150/Stardew_Valley/',
+    ('jogos', 3): 'https://store.steampowered.com/app/638230/Journey/',
+    ('jogos', 4): 'https://store.steampowered.com/app/782330/DOOM_Eternal/',
+    ('jogos', 5): 'https://store.steampowered.com/app/1145360/Hades/',
+    ('jogos', 7): 'https://store.steampowered.com/app/1097150/Fall_Guys/',
+    ('jogos', 8): 'https://store.steampowered.com/app/753640/Outer_Wilds/',
+    ('jogos', 9): 'https://store.steampowered.com/app/501300/What_Remains_of_Edith_Finch/',
+    ('jogos', 10): 'https://store.steampowered.com/app/504230/Celeste/',
+}
+
+
+def _filme(**campos):
+    return Filme(**{'id': 1, 'titulo': 'Filme', 'mood_scores': {'feliz': 7}, 'imagem_url': None, 'link_url': None,
+                    'diretor': 'd', 'ano': 2001, 'genero': 'drama', 'duracao': '2h', **campos})
+
+
+def _jogo(**campos):
+    return Jogo(**{'id': 1, 'titulo': 'Jogo', 'mood_scores': {'feliz': 7}, 'imagem_url': None, 'link_url': None,
+                   'plataforma': 'PC', 'genero': 'rpg', 'multiplayer': False, **campos})
+
+
+def test_link_servido_igual_ao_gravado(motor):
+    for (tipo, item_id), link in LINKS_GRAVADOS.items():
+        assert motor.estado.categorias[tipo][item_id - 1].link_url is None
+        assert motor.payloads.payload(tipo, item_id)['link_url'] == link
+
+
+def test_itens_com_link_gravado_servem_o_gravado(motor):
+    for tipo, itens in motor.categorias.items():
+        for item in itens:
+            if item.link_url:
+                assert motor.payloads.payload(tipo, item.id)['link_url'] == item.link_url
+
+
+def test_sem_link_nem_id_cai_na_busca_da_loja(musica):
+    assert resolver_link(musica(1)) == 'https://open.spotify.com/search/a%20m1'
+    assert resolver_link(_filme()) == 'https://www.imdb.com/find?q=Filme%202001'
+    assert resolver_link(_jogo(titulo='Jogo: Edição')) == \
+        'https://store.steampowered.com/search/?term=Jogo%3A%20Edi%C3%A7%C3%A3o'
+
+
+def test_link_montado_pelo_id(musica):
+    assert resolver_link(replace(musica(1), spotify_id='abc')) == 'https://open.spotify.com/track/abc'
+    assert resolver_link(_filme(imdb_id='tt1')) == 'https://www.imdb.com/title/tt1/'
+    assert resolver_link(_jogo(titulo="Baldur's Gate 3", steam_id='9')) == \
+        'https://store.steampowered.com/app/9/Baldur_s_Gate_3/'
+    assert resolver_link(_jogo(titulo='東方', steam_id='9')) == 'https://store.steampowered.com/app/9/'
+
+
+def test_link_gravado_vence_o_id():
+    assert resolver_link(_filme(link_url='https://exemplo/filme', imdb_id='tt1')) == 'https://exemplo/filme'
+
+
+@pytest.mark.parametrize('item, esperado', [
+    (_filme(), 'https://www.youtube.com/results?search_query=Filme%202001%20trailer'),
+    (_jogo(link_url='https://exemplo/jogo'), 'https://www.youtube.com/results?search_query=Jogo%20gameplay'),
+])
+def test_fonte_youtube(item, esperado):
+    assert resolver_link(item, 'youtube') == esperado
+    # Fontes de outras categorias não mudam o link
+    assert resolver_link(item, 'spotify') == resolver_link(item)
+
+
+def test_fonte_youtube_da_musica(musica, motor):
+    assert resolver_link(musica(1), 'youtube') == 'https://www.youtube.com/results?search_query=a%20m1'
+    resposta = motor.payloads.resposta('musicas', 1, 9, 'youtube')
+    assert resposta['link_url'].startswith('https://www.youtube.com/')
+    assert motor.payloads.payload('musicas', 1)['link_url'] == LINKS_GRAVADOS[('musicas', 1)]
+
+
+def test_imagem_da_steam():
+    assert resolver_imagem(_jogo(steam_id='413150')) == \
+        'https://cdn.cloudflare.steamstatic.com/steam/apps/413150/header.jpg'
+    assert resolver_imagem(_jogo(steam_id='413150', imagem_url='https://exemplo/capa')) == 'https://exemplo/capa'
+    assert resolver_imagem(_jogo()) is None
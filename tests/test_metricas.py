@@ -0,0 +1,75 @@
+"""Testes das métricas do caminho quente e da rota /metrics"""
+
+import re
+
+import pytest
+
+from metricas import Metricas, metricas
+
+
+@pytest.fixture
+def ligadas(monkeypatch):
+    monkeypatch.setattr(metricas, 'ativo', True)
+    metricas.limpar()
+    yield metricas
+    metricas.limpar()
+
+
+def _valores(texto):
+    """Amostras da exposição: 'nome{rótulos}' -> valor"""
+    return {nome: float(valor) for nome, valor in re.findall(r'^([a-z_]+(?:\{.*\})?) (\S+)$', texto, re.M)}
+
+
+def test_histograma_acumula_na_exportacao():
+    local = Metricas(True, limites=(0.1, 1.0))
+    for segundos in (0.05, 0.5, 0.7, 5.0):
+        local.observar('selecao', segundos)
+    local.contar_requisicao('feliz', 'musicas', 'completo')
+    local.contar_erro('/api/recomendar', 400)
+    local.contar_erro('/api/recomendar', 400)
+    valores = _valores(local.prometheus({'mood_extra': ('gauge', 'Valor avulso', 3)}))
+    assert valores['mood_etapa_segundos_bucket{etapa="selecao",le="0.1"}'] == 1
+    assert valores['mood_etapa_segundos_bucket{etapa="selecao",le="1.0"}'] == 3
+    assert valores['mood_etapa_segundos_bucket{etapa="selecao",le="+Inf"}'] == 4
+    assert valores['mood_etapa_segundos_sum{etapa="selecao"}'] == pytest.approx(6.25)
+    assert valores['mood_etapa_segundos_count{etapa="selecao"}'] == 4
+    assert valores['mood_requisicoes_total{mood="feliz",tipo="musicas",formato="completo"}'] == 1
+    assert valores['mood_erros_total{rota="/api/recomendar",status="400"}'] == 2
+    assert valores['mood_extra'] == 3
+
+
+def test_desligadas_nao_registram_nada():
+    local = Metricas(False)
+    with local.etapa('selecao'):
+        pass
+    local.contar_requisicao('feliz', 'musicas', 'completo')
+    local.contar_erro('/api/recomendar', 400)
+    assert _valores(local.prometheus()) == {}
+
+
+def test_rota_metrics_so_existe_ligada(cliente, monkeypatch):
+    monkeypatch.setattr(metricas, 'ativo', False)
+    assert cliente.get('/metrics').status_code == 404
+
+
+def test_rota_metrics(cliente, ligadas):
+    cliente.post('/api/recomendar', json={'mood': 'feliz', 'tipo': 'musicas'})
+    cliente.post('/api/recomendar', json={'mood': {'feliz': 1, 'triste': 1}, 'formato': 'compacto'})
+    cliente.post('/api/recomendar', json={'mood': 'eufórico'})
+    resposta = cliente.get('/metrics')
+    assert resposta.status_code == 200 and resposta.mimetype == 'text/plain'
+    texto = resposta.get_data(as_text=True)
+    for tipo in ('# TYPE mood_etapa_segundos histogram', '# TYPE mood_requisicoes_total counter',
+                 '# TYPE mood_erros_total counter', '# TYPE mood_catalogo_versao gauge',
+                 '# TYPE mood_cache_buckets_acertos_total counter'):
+        assert tipo in texto
+    valores = _valores(texto)
+    assert valores['mood_requisicoes_total{mood="feliz",tipo="musicas",formato="completo"}'] == 1
+    assert valores['mood_requisicoes_total{mood="combinado",tipo="tudo",formato="compacto"}'] == 1
+    assert valores['mood_erros_total{rota="/api/recomendar",status="400"}'] == 1
+    assert valores['mood_etapa_segundos_count{etapa="requisicao"}'] == 3
+    for etapa in ('candidatos', 'sorteio', 'combinar', 'sessao_carregar', 'sessao_salvar', 'json'):
+        assert valores[f'mood_etapa_segundos_count{{etapa="{etapa}"}}'] >= 1
+    buckets = [valor for nome, valor in valores.items()
+               if nome.startswith('mood_etapa_segundos_bucket{etapa="requisicao"')]
+    assert buckets == sorted(buckets) and buckets[-1] == 3
@@ -0,0 +1,152 @@
+"""Testes da recalibração offline dos mood_scores"""
+
+import json
+import math
+import sqlite3
+
+import pytest
+
+import recalibrar
+from catalogo import ArquivoCatalogo
+from mood_recommender import CLASSES_CONTEUDO, MOODS, MoodRecommenderWithMedia
+from recalibrar import (AJUSTE_MAXIMO, agregar, recalibrar as gravar_recalibrado, recalibrar_score, taxas_base,
+                        tarefas)
+
+
+def _evento(evento, item, mood='feliz', posicao=0, tipo='musicas'):
+    return {'ts': 0.0, 'sessao': 's', 'evento': evento, 'tipo': tipo, 'item': item, 'mood': mood,
+            'posicao': posicao}
+
+
+EVENTOS = (
+    [_evento('impressao', 1, posicao=p % 3) for p in range(30)]
+    + [_evento('clique', 1)] * 12
+    + [_evento('impressao', 2, posicao=p % 3) for p in range(30)]
+    + [_evento('impressao', 3, mood=json.dumps({'feliz': 0.5, 'triste': 0.5})), _evento('clique', 3, mood=None)]
+)
+
+
+@pytest.fixture
+def jsonl(tmp_path):
+    diretorio = tmp_path / 'eventos'
+    diretorio.mkdir()
+    with open(diretorio / 'eventos-20260101-1.jsonl', 'w', encoding='utf-8') as arquivo:
+        for evento in EVENTOS:
+            arquivo.write(json.dumps(evento) + '\n')
+        arquivo.write('{"evento": "clique", "tipo": "mus')  # processo morreu no meio da linha
+    return str(diretorio)
+
+
+def _somar(lista):
+    contagem, totais = {}, [0, 0, 0]
+    for funcao, caminho, inicio, fim in lista:
+        parcial, *numeros = funcao(caminho, inicio, fim)
+        for chave, (exposicao, cliques) in parcial.items():
+            somas = contagem.setdefault(chave, [0.0, 0.0])
+            somas[0] += exposicao
+            somas[1] += cliques
+        totais = [a + b for a, b in zip(totais, numeros)]
+    return contagem, totais
+
+
+def test_agregacao_com_desconto_de_posicao_e_pesos(jsonl):
+    contagem, (linhas, invalidas, sem_mood) = _somar(tarefas([jsonl]))
+    assert (linhas, invalidas, sem_mood) == (len(EVENTOS), 1, 1)
+    exposicao = 10 * (1 + 1 / math.log2(3) + 1 / math.log2(4))
+    assert contagem[('musicas', 1, 'feliz')] == [pytest.approx(exposicao), 12.0]
+    assert contagem[('musicas', 2, 'feliz')] == [pytest.approx(exposicao), 0.0]
+    assert contagem[('musicas', 3, 'triste')] == [pytest.approx(0.5), 0.0]
+
+
+@pytest.mark.parametrize('tamanho_bloco', [1, 7, 100])
+def test_blocos_pequenos_dao_o_mesmo_resultado(jsonl, tamanho_bloco):
+    """Cada linha é contada por um bloco só, mesmo cortada no meio pelos limites"""
+    inteiro = _somar(tarefas([jsonl]))
+    em_blocos = _somar(tarefas([jsonl], tamanho_bloco))
+    assert em_blocos[1] == inteiro[1]
+    assert em_blocos[0].keys() == inteiro[0].keys()
+    for chave, somas in inteiro[0].items():
+        assert em_blocos[0][chave] == pytest.approx(somas)
+
+
+def test_sqlite_igual_ao_jsonl(tmp_path, jsonl, monkeypatch):
+    monkeypatch.setattr(recalibrar, 'LINHAS_BLOCO_SQLITE', 10)
+    caminho = tmp_path / 'eventos.db'
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute('CREATE TABLE eventos (ts REAL, sessao TEXT, evento TEXT, tipo TEXT, item INTEGER, '
+                        'mood TEXT, posicao INTEGER)')
+        conexao.executemany('INSERT INTO eventos VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            [tuple(evento.values()) for evento in EVENTOS])
+    lista = tarefas([f'sqlite:///{caminho}'])
+    assert len(lista) == math.ceil(len(EVENTOS) / 10)
+    contagem, (linhas, invalidas, sem_mood) = _somar(lista)
+    esperado, _ = _somar(tarefas([jsonl]))
+    assert (linhas, invalidas, sem_mood) == (len(EVENTOS), 0, 1)
+    assert contagem.keys() == esperado.keys()
+    for chave, somas in esperado.items():
+        assert contagem[chave] == pytest.approx(somas)
+
+
+def test_recalibrar_score():
+    assert recalibrar_score(7, 0.0, 0.0, 0.1) == 7
+    assert recalibrar_score(7, 1000.0, 400.0, 0.1) == 7 + AJUSTE_MAXIMO
+    assert recalibrar_score(7, 1000.0, 0.0, 0.1) == 7 - AJUSTE_MAXIMO
+    assert recalibrar_score(10, 1000.0, 400.0, 0.1) == 10
+    assert recalibrar_score(1, 1000.0, 0.0, 0.1) == 1
+
+
+def test_recalibrar_grava_catalogo(tmp_path):
+    motor = MoodRecommenderWithMedia()
+    musicas = list(motor.categorias['musicas'])
+    bom, ruim = [item for item in musicas if 3 <= item.mood_scores.get('feliz', 0) <= 8][:2]
+    contagem = {('musicas', bom.id, 'feliz'): [1000.0, 300.0], ('musicas', ruim.id, 'feliz'): [1000.0, 0.0]}
+    assert taxas_base(contagem) == {('musicas', 'feliz'): pytest.approx(0.15)}
+    saida = str(tmp_path / 'recalibrado.bin')
+    alterados = gravar_recalibrado({'musicas': musicas}, contagem, saida, MOODS, 'r1')
+    assert alterados == {'musicas': 2}
+    novas = ArquivoCatalogo(saida, CLASSES_CONTEUDO).categorias['musicas']
+    assert novas.por_id[bom.id].mood_scores['feliz'] == bom.mood_scores['feliz'] + AJUSTE_MAXIMO
+    assert novas.por_id[ruim.id].mood_scores['feliz'] == ruim.mood_scores['feliz'] - AJUSTE_MAXIMO
+    assert dict(novas.por_id[bom.id].mood_scores, feliz=0) == dict(bom.mood_scores, feliz=0)
+    outro = next(item for item in musicas if item.id not in (bom.id, ruim.id))
+    assert novas.por_id[outro.id] == outro
+
+
+def test_agregar_com_pool(jsonl):
+    contagem, totais = agregar([jsonl], processos=1)
+    assert totais == {'blocos': 1, 'linhas': len(EVENTOS), 'invalidas': 1, 'sem_mood': 1}
+    assert contagem[('musicas', 1, 'feliz')][1] == 12.0
+
+
+INVALIDOS = [
+    _evento('clique', 1, mood=7),
+    _evento('clique', 1, mood='{"feliz": '),
+    _evento('clique', 1, mood='{"feliz": 0, "triste": 0}'),
+    _evento('clique', 1, mood='{"feliz": 1e308, "triste": 1e308}'),
+    _evento('clique', 1, mood='{"feliz": "1"}'),
+    _evento('impressao', 1, posicao='2'),
+    _evento('impressao', 1, posicao=-1),
+    _evento('impressao', '1'),
+    _evento('visita', 1),
+]
+
+
+def test_linhas_com_campos_invalidos_sao_contadas(tmp_path):
+    caminho = tmp_path / 'eventos-20260101-1.jsonl'
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        for evento in [_evento('clique', 1)] + INVALIDOS + [{'evento': 'clique'}, [1, 2], _evento('clique', [1])]:
+            arquivo.write(json.dumps(evento) + '\n')
+    contagem, (linhas, invalidas, sem_mood) = _somar(tarefas([str(caminho)]))
+    assert (linhas, invalidas, sem_mood) == (1, len(INVALIDOS) + 3, 0)
+    assert contagem == {('musicas', 1, 'feliz'): [0.0, 1.0]}
+
+
+def test_sqlite_com_campos_invalidos(tmp_path):
+    caminho = tmp_path / 'eventos.db'
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute('CREATE TABLE eventos (ts, sessao, evento, tipo, item, mood, posicao)')
+        conexao.executemany('INSERT INTO eventos VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            [tuple(evento.values()) for evento in [_evento('clique', 1)] + INVALIDOS])
+    contagem, (linhas, invalidas, sem_mood) = _somar(tarefas([f'sqlite:///{caminho}']))
+    assert (linhas, invalidas, sem_mood) == (1, len(INVALIDOS), 0)
+    assert contagem == {('musicas', 1, 'feliz'): [0.0, 1.0]}
@@ -0,0 +1,100 @@
+"""Testes da recarga do catálogo sem reiniciar o processo"""
+
+import os
+import time
+
+import pytest
+
+import mood_recommender
+from catalogo import CatalogoInvalido, salvar_catalogo
+from mood_recommender import MOODS, MoodRecommenderWithMedia, observar_catalogo
+
+
+def _esperar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, 'a recarga não aconteceu a tempo'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def caminho(tmp_path, motor):
+    caminho = str(tmp_path / 'catalogo.bin')
+    salvar_catalogo(caminho, motor.categorias, MOODS, versao='v1')
+    return caminho
+
+
+@pytest.fixture
+def mapeado(caminho, monkeypatch):
+    """Engine sobre o arquivo, servida pelas rotas no lugar da global"""
+    motor = MoodRecommenderWithMedia(caminho)
+    monkeypatch.setattr(mood_recommender, 'recommender', motor)
+    return motor
+
+
+def _regravar(caminho, motor, versao):
+    musicas = [item for item in motor.categorias['musicas'] if item.id != 1]
+    salvar_catalogo(caminho, dict(motor.categorias, musicas=musicas), MOODS, versao=versao)
+
+
+def test_recarga_troca_tudo_de_uma_vez(caminho, mapeado, motor):
+    anterior = mapeado.estado
+    mapeado.recomendar_com_variedade('feliz', 'musicas')
+    _regravar(caminho, motor, 'v2')
+    atual = mapeado.recarregar_catalogo()
+    assert mapeado.estado is atual
+    assert (atual.versao, atual.arquivo.versao) == (anterior.versao + 1, 'v2')
+    assert atual.etag != anterior.etag
+    assert mapeado.cache_buckets.estatisticas()['entradas'] == 0
+    assert not atual.indice.contem('musicas', 1)
+    # Quem já pegou o estado anterior continua lendo a versão antiga, inteira
+    assert anterior.arquivo.versao == 'v1'
+    assert anterior.indice.contem('musicas', 1)
+    assert anterior.categorias['musicas'].por_id[1] == motor.categorias['musicas'][0]
+
+
+def test_cursor_em_andamento_expira(caminho, mapeado, motor, cliente):
+    resposta = cliente.post('/api/recomendar/mais', json={'mood': 'feliz', 'tipo': 'musicas'})
+    assert resposta.status_code == 200
+    cursor = resposta.get_json()['cursor']
+    assert cliente.post('/api/recomendar/mais', json={'cursor': cursor}).status_code == 200
+    _regravar(caminho, motor, 'v2')
+    mapeado.recarregar_catalogo()
+    resposta = cliente.post('/api/recomendar/mais', json={'cursor': cursor})
+    assert resposta.status_code == 410
+    assert 'erro' in resposta.get_json()
+
+
+def test_recarga_com_arquivo_invalido_mantem_o_estado(tmp_path, caminho, mapeado):
+    anterior = mapeado.estado
+    invalido = tmp_path / 'invalido.bin'
+    invalido.write_bytes(b'nao e um catalogo')
+    with pytest.raises(CatalogoInvalido):
+        mapeado.recarregar_catalogo(str(invalido))
+    assert mapeado.estado is anterior
+    assert mapeado.caminho_catalogo == caminho
+    assert mapeado.recarregar_catalogo().versao == anterior.versao + 1
+
+
+def test_admin_recarregar(caminho, mapeado, motor, cliente, monkeypatch):
+    monkeypatch.setattr(mood_recommender, 'ADMIN_TOKEN', '')
+    assert cliente.post('/api/admin/recarregar').status_code == 404
+    monkeypatch.setattr(mood_recommender, 'ADMIN_TOKEN', 'segredo')
+    assert cliente.post('/api/admin/recarregar', headers={'X-Admin-Token': 'errado'}).status_code == 403
+    _regravar(caminho, motor, 'v2')
+    resposta = cliente.post('/api/admin/recarregar', headers={'X-Admin-Token': 'segredo'})
+    assert resposta.status_code == 202
+    _esperar(lambda: mapeado.estado.arquivo.versao == 'v2')
+
+
+def test_observador_recarrega_quando_o_arquivo_muda(caminho, mapeado, motor):
+    observar_catalogo(mapeado, caminho, intervalo=0.01)
+    _regravar(caminho, motor, 'v2')
+    _esperar(lambda: mapeado.estado.arquivo.versao == 'v2')
+    # Troca o arquivo, como o EscritorCatalogo: truncar o que está mapeado derrubaria o processo
+    corrompido = caminho + '.tmp'
+    with open(corrompido, 'wb') as arquivo:
+        arquivo.write(b'corrompido')
+    os.replace(corrompido, caminho)
+    time.sleep(0.1)  # várias voltas do observador com o arquivo inválido
+    assert mapeado.estado.arquivo.versao == 'v2'
@@ -0,0 +1,170 @@
+"""Testes da engine de recomendação (MoodRecommenderWithMedia) e do formato das respostas"""
+
+import json
+
+import pytest
+
+from mood_recommender import (PARTES_PESO, SCORE_FALLBACK, SCORE_MINIMO, CursorExpirado, JSONBruto, ScoresMood,
+                              codificar_json, mood_resposta, normalizar_mood)
+
+
+def _ids(resultado):
+    return {tipo: [item['id'] for item in resultado[tipo]] for tipo in ('musicas', 'filmes', 'jogos')}
+
+
+@pytest.mark.parametrize('timeout', [None, 0, 5.0])
+def test_paralelo_igual_ao_sequencial(motor, timeout):
+    sequencial = motor.recomendar_tudo_com_variedade('feliz', semente=42)
+    paralelo = motor.recomendar_tudo_com_variedade('feliz', paralelo=True, timeout=timeout, semente=42)
+    assert 'incompletos' not in paralelo
+    assert list(paralelo) == list(sequencial)
+    assert _ids(paralelo) == _ids(sequencial)
+
+
+def test_scores_mood_internado_e_mapping():
+    scores = ScoresMood({'feliz': 9, 'pensativo': 4})
+    assert scores is ScoresMood({'pensativo': 4, 'feliz': 9})
+    assert scores is ScoresMood(scores.valores)
+    assert dict(scores) == {'feliz': 9, 'pensativo': 4}
+    assert 'triste' not in scores and len(scores) == 2
+
+
+@pytest.mark.parametrize('scores', [{'feliz': 11}, {'feliz': -1}, bytes([0, 0, 0, 0, 0, 13]), bytes([1, 2]),
+                                    {'eufórico': 5}])
+def test_scores_mood_fora_do_intervalo(scores):
+    with pytest.raises(ValueError):
+        ScoresMood(scores)
+
+
+def test_normalizar_mood():
+    assert normalizar_mood('Feliz') == 'feliz'
+    assert normalizar_mood({'feliz': 1.0}) == 'feliz'
+    assert normalizar_mood({'ansioso': 0.6, 'relaxado': 0.4}) == (('relaxado', 8), ('ansioso', 12))
+    assert mood_resposta(normalizar_mood({'ansioso': 3, 'relaxado': 2})) == {'relaxado': 0.4, 'ansioso': 0.6}
+    for invalido in ({'eufórico': 1}, {'feliz': -1}, {'feliz': 0}, {'feliz': True}, {'feliz': float('nan')}):
+        with pytest.raises(ValueError):
+            normalizar_mood(invalido)
+
+
+def test_normalizar_mood_com_pesos_enormes():
+    for invalido in ({'feliz': 1e308, 'triste': 1e308}, {'feliz': 10 ** 400}):
+        with pytest.raises(ValueError):
+            normalizar_mood(invalido)
+
+
+@pytest.mark.parametrize('pesos', [{'feliz': 0.5, 'energizado': 0.5}, {'triste': 0.05, 'pensativo': 0.95},
+                                   {nome: 1 for nome in ('feliz', 'triste', 'relaxado', 'energizado',
+                                                         'ansioso', 'pensativo')}])
+def test_buckets_combinados_iguais_a_soma_ponderada(motor, pesos):
+    """As colunas empacotadas dão o mesmo score combinado que a conta item a item"""
+    mood = normalizar_mood(pesos)
+    assert sum(n for _, n in mood) <= PARTES_PESO
+    estado = motor.estado
+    for tipo, itens in estado.categorias.items():
+        esperado = {}
+        for item in itens:
+            total = sum(n * item.mood_scores.get(nome, 0) for nome, n in mood)
+            score = round(total / sum(n for _, n in mood))
+            if score >= 5:
+                esperado.setdefault(score, []).append(item.id)
+        obtido = motor._buckets_combinados(estado, tipo, mood)
+        assert {score: list(ids) for score, ids in obtido} == {s: sorted(ids) for s, ids in esperado.items()}
+
+
+def _paginas(motor, mood, tipo, semente, historico_ids=None, limite=4):
+    posicao, vistos = 0, []
+    while posicao is not None:
+        pagina = motor.recomendar_pagina(mood, tipo, semente, posicao, limite, historico_ids)
+        vistos.extend(item['id'] for item in pagina[tipo])
+        posicao = pagina['posicao']
+    return vistos
+
+
+def test_paginas_cobrem_a_ordem_sem_repetir(motor):
+    vistos = _paginas(motor, 'feliz', 'musicas', 7)
+    esperados = {item.id for item in motor.estado.categorias['musicas']
+                 if item.mood_scores.get('feliz', 0) >= SCORE_MINIMO}
+    assert len(vistos) == len(set(vistos))
+    assert set(vistos) == esperados
+    assert vistos == _paginas(motor, 'feliz', 'musicas', 7)
+    assert vistos != _paginas(motor, 'feliz', 'musicas', 8)
+
+
+def test_paginas_pulam_o_historico(motor):
+    todos = _paginas(motor, 'feliz', 'filmes', 3)
+    historico = todos[:2]
+    assert _paginas(motor, 'feliz', 'filmes', 3, historico) == todos[2:]
+
+
+def test_pagina_com_historico_cobrindo_os_tiers_usa_fallback(motor):
+    """Mesma regra de _selecionar: sem nada >= 6 fora do histórico, ignora o histórico e aceita >= 5"""
+    for tipo, itens in motor.estado.categorias.items():
+        historico = [item.id for item in itens if item.mood_scores.get('triste', 0) >= SCORE_MINIMO]
+        fallback = {item.id for item in itens if item.mood_scores.get('triste', 0) >= SCORE_FALLBACK}
+        pagina = motor.recomendar_pagina('triste', tipo, 1, 0, 3, historico)
+        assert pagina[tipo]
+        assert {item['id'] for item in pagina[tipo]} <= fallback
+        assert set(_paginas(motor, 'triste', tipo, 1, historico)) == fallback
+        assert motor.recomendar_com_variedade('triste', tipo, 3, historico)
+
+
+def test_cursor_expira_com_outro_catalogo(motor):
+    with pytest.raises(CursorExpirado):
+        motor.recomendar_pagina('feliz', 'jogos', 1, 0, 3, catalogo='"outra-versao"')
+
+
+def test_codificar_json_emenda_trechos_prontos():
+    valor = {'mood': 'feliz', 'itens': [1, 'ação'], 'pronto': JSONBruto('{"id":1}'), 3: None}
+    texto = codificar_json(valor)
+    assert texto == '{"mood":"feliz","itens":[1,"ação"],"pronto":{"id":1},"3":null}'
+    assert json.loads(texto) == {'mood': 'feliz', 'itens': [1, 'ação'], 'pronto': {'id': 1}, '3': None}
+
+
+def test_formato_compacto_so_traz_os_campos_pedidos(cliente, motor):
+    resposta = cliente.post('/api/recomendar', json={'mood': 'feliz', 'tipo': 'musicas', 'formato': 'compacto',
+                                                     'campos': ['titulo', 'genero']})
+    assert resposta.status_code == 200 and resposta.mimetype == 'application/json'
+    corpo = resposta.get_json()
+    assert set(corpo) == {'mood', 'catalogo', 'musicas'}
+    assert len(corpo['musicas']) == 3
+    for item in corpo['musicas']:
+        assert set(item) == {'id', 'relevancia', 'titulo', 'genero'}
+        completo = motor.payloads.payload('musicas', item['id'])
+        assert (item['titulo'], item['genero']) == (completo['titulo'], completo['genero'])
+        assert item['relevancia'] == completo['mood_scores']['feliz']
+
+
+def test_formato_compacto_em_todas_as_categorias(cliente):
+    corpo = cliente.post('/api/recomendar', json={'mood': 'feliz', 'formato': 'compacto'}).get_json()
+    assert set(corpo) == {'mood', 'catalogo', 'musicas', 'filmes', 'jogos'}
+    assert all(set(item) == {'id', 'relevancia'} for tipo in ('musicas', 'filmes', 'jogos') for item in corpo[tipo])
+
+
+@pytest.mark.parametrize('corpo', [{'formato': 'xml'}, {'formato': 'compacto', 'campos': ['cor']},
+                                   {'formato': 'compacto', 'campos': 'titulo'}, {'fonte_link': 'deezer'}])
+def test_formato_invalido(cliente, corpo):
+    assert cliente.post('/api/recomendar', json={'mood': 'feliz', **corpo}).status_code == 400
+
+
+def test_rota_do_catalogo(cliente, motor):
+    resposta = cliente.get('/api/catalogo/jogos?campos=titulo,genero')
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert corpo['tipo'] == 'jogos'
+    assert corpo['catalogo'] == cliente.post('/api/recomendar', json={'mood': 'feliz', 'formato': 'compacto'}
+                                             ).get_json()['catalogo']
+    assert set(corpo['itens']) == {str(item.id) for item in motor.categorias['jogos']}
+    for item in motor.categorias['jogos']:
+        assert corpo['itens'][str(item.id)] == {'titulo': item.titulo, 'genero': item.genero}
+    assert resposta.cache_control.public and resposta.cache_control.max_age == 300
+    condicional = {'If-None-Match': resposta.headers['ETag']}
+    assert cliente.get('/api/catalogo/jogos?campos=titulo,genero', headers=condicional).status_code == 304
+    assert cliente.get('/api/catalogo/jogos?campos=titulo', headers=condicional).status_code == 200
+
+
+def test_rota_do_catalogo_completo_e_erros(cliente, motor):
+    itens = cliente.get('/api/catalogo/filmes').get_json()['itens']
+    assert itens['2'] == json.loads(json.dumps(motor.payloads.payload('filmes', 2)))
+    assert cliente.get('/api/catalogo/podcasts').status_code == 404
+    assert cliente.get('/api/catalogo/filmes?campos=cor').status_code == 400
+    assert cliente.get('/api/catalogo/filmes?fonte_link=deezer').status_code == 400
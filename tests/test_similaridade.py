@@ -0,0 +1,74 @@
+"""Testes do índice de similaridade ("mais como este")"""
+
+import pytest
+
+from catalogo import salvar_catalogo
+from mood_recommender import MOODS, MoodRecommenderWithMedia, Musica
+from similaridade import N_VIZINHOS, IndiceSimilaridade
+
+
+def test_todo_item_tem_vizinhos(motor):
+    for tipo, itens in motor.estado.categorias.items():
+        indice = motor.estado.similaridade(tipo)
+        for item in itens:
+            vizinhos = indice.vizinhos(item.id)
+            assert len(vizinhos) == min(N_VIZINHOS, len(itens) - 1), (tipo, item.id)
+            assert item.id not in {vizinho for _, vizinho in vizinhos}
+            similaridades = [sim for sim, _ in vizinhos]
+            assert similaridades == sorted(similaridades, reverse=True)
+
+
+def test_item_sem_par_nos_blocos_tem_vizinhos(musica):
+    itens = [musica(1, 'rock', 'a', feliz=9, energizado=8),
+             musica(2, 'rock', 'a', feliz=8, energizado=9),
+             musica(3, 'jazz', 'b', triste=7, pensativo=6)]
+    indice = IndiceSimilaridade(itens, Musica._SIMILARIDADE)
+    assert {vizinho for _, vizinho in indice.vizinhos(3)} == {1, 2}
+    assert indice.vizinhos(1)[0][1] == 2
+
+
+def test_similaridade_combina_moods_e_atributos(musica):
+    itens = [musica(1, 'rock', 'a', feliz=9), musica(2, 'rock', 'a', feliz=5), musica(3, 'pop', 'b', feliz=9)]
+    indice = IndiceSimilaridade(itens, Musica._SIMILARIDADE).construir()
+    assert indice.similaridade(0, 1) == pytest.approx(1.0)
+    assert indice.similaridade(0, 2) == pytest.approx(0.6)
+    assert indice.vizinhos(1, 1) == [(pytest.approx(1.0), 2)]
+    with pytest.raises(KeyError):
+        indice.vizinhos(99)
+
+
+def test_api_similares(cliente):
+    resposta = cliente.get('/api/similares/musicas/8?limite=3')
+    assert resposta.status_code == 200
+    itens = resposta.get_json()['musicas']
+    assert len(itens) == 3
+    assert all(0 <= item['similaridade'] <= 1 for item in itens)
+    assert cliente.get('/api/similares/musicas/9999').status_code == 404
+
+
+def test_indice_montado_no_primeiro_uso(musica):
+    motor = MoodRecommenderWithMedia()
+    anterior = motor.estado
+    assert not anterior._similaridade
+    filmes = anterior.similaridade('filmes')
+    assert anterior.similaridade('filmes') is filmes
+    assert set(anterior._similaridade) == {'filmes'}
+
+    atual = motor.atualizar_itens('musicas', [musica(500, 'rock', 'x', feliz=10, energizado=9)])
+    assert set(atual._similaridade) == {'filmes'}  # o índice de filmes não mudou e é reaproveitado
+    assert atual.similaridade('filmes') is filmes
+    assert 500 in atual.similaridade('musicas')
+    assert 'musicas' not in anterior._similaridade
+
+    recarregado = motor.recarregar_catalogo()
+    assert not recarregado._similaridade
+    assert recarregado.similaridade('nada') is None
+
+
+def test_catalogo_mapeado_nao_monta_o_indice_na_carga(tmp_path, motor):
+    caminho = str(tmp_path / 'catalogo.bin')
+    salvar_catalogo(caminho, motor.categorias, MOODS)
+    mapeado = MoodRecommenderWithMedia(caminho)
+    assert not mapeado.estado._similaridade
+    assert not mapeado.recarregar_catalogo()._similaridade
+    assert mapeado.similares('musicas', 8, 3)['musicas'] == motor.similares('musicas', 8, 3)['musicas']